@@ -1,39 +1,404 @@
+import time
+
+# Process start, for time-to-ready reporting on /ready
+BOOT_TIME = time.perf_counter()
+
 from flask import Flask, request, jsonify
-import joblib
 import numpy as np
 from flask_cors import CORS
-import pandas as pd
-import pickle
 import requests
 from datetime import datetime, timedelta
-import json
 import random
+import os
+import threading
+import base64
 
-app = Flask(__name__)
+from atlas import ATLAS_MODES, PredictionAtlas, booster_fingerprint
+from batching import MicroBatcher
+from cache import CACHE_BACKENDS, LRUCache, make_cache, quantize
+from codec import (
+    JSONProvider, Schema, ValidationError, any_value, boolean, choice, integer, iso_date, list_of, mapping, number,
+    optional, string
+)
+from compression import Precompressed, compress_response
+from features import FeatureAssembler, finite_float
+from http_client import UpstreamClient
+from model_store import LOAD_MODES, ModelStore
+from price_store import INTERVALS as PRICE_INTERVALS, PriceStore
+from static_site import StaticBuild
+from tree_compiler import (
+    CompiledForest, booster_split_points, fold_scaler_into_booster, fold_scalers_into_forest, forest_split_bounds,
+    random_inputs
+)
+from weather import (
+    DISTRICT_COORDS, OPEN_METEO_URL, WeatherError, WeatherService, get_current_season, load_reference_points
+)
+
+# No Flask static folder: /static/... belongs to the frontend build (FRONTEND_BUILD)
+app = Flask(__name__, static_folder=None)
+# Request decoding and jsonify() go through orjson when it is installed
+app.json = JSONProvider(app)
 
 # Enable CORS for all routes
 CORS(app)
 
-# Load the trained model and encoders
-model = joblib.load("model/xgboost_crop_yield_model.pkl")
-encoder_district = joblib.load("model/ordinal_encoder_district.pkl")
-encoder_season = joblib.load("model/ordinal_encoder_season.pkl")
-encoder_soil = joblib.load("model/ordinal_encoder_soil.pkl")
-scaler = joblib.load("model/scaler.pkl")
-
-try:
-    model_rec = pickle.load(open('model/modelrandclf.pkl', 'rb'))
-    sc_rec = pickle.load(open('model/standscaler.pkl', 'rb'))
-    mx_rec = pickle.load(open('model/minmaxscaler.pkl', 'rb'))
-except Exception as e:
-    print(f"Error loading crop recommendation model or scalers: {e}")
-    model_rec, sc_rec, mx_rec = None, None, None
-
 # Define all possible crops for encoding
 crop_categories = ["Crop_Barley", "Crop_Cotton", "Crop_Gram", "Crop_Groundnut",
                    "Crop_Maize", "Crop_Mustard", "Crop_Peas", "Crop_Pulses",
                    "Crop_Rice", "Crop_Soybean", "Crop_Sugarcane"]
 
+# Trained models and encoders, loaded through the model store. MODEL_LOAD_MODE picks when:
+#   eager      - everything at import, before serving (default)
+#   background - in a daemon thread; /ready answers 503 until done, early requests wait
+#   lazy       - each artifact on first use
+# The yield model is read from a native XGBoost file (see `python model_store.py
+# export-xgboost`) when one exists, else from the pickle. An artifact that fails to
+# load (e.g. the optional crop recommender) is retried at most every
+# MODEL_RETRY_INTERVAL seconds; requests in between fail fast.
+MODEL_LOAD_MODE = os.environ.get("MODEL_LOAD_MODE", "eager")
+if MODEL_LOAD_MODE not in LOAD_MODES:
+    raise ValueError(f"MODEL_LOAD_MODE must be one of {LOAD_MODES}")
+MODEL_RETRY_INTERVAL = float(os.environ.get("MODEL_RETRY_INTERVAL", 30))
+
+models = ModelStore("model", retry_interval=MODEL_RETRY_INTERVAL)
+models.register("yield_booster", lambda: models.load_xgboost_booster(
+    "xgboost_crop_yield_model.pkl", ["xgboost_crop_yield_model.ubj", "xgboost_crop_yield_model.json"]
+))
+models.register("encoder_district", lambda: models.load_joblib("ordinal_encoder_district.pkl", requires=["sklearn"]))
+models.register("encoder_season", lambda: models.load_joblib("ordinal_encoder_season.pkl", requires=["sklearn"]))
+models.register("encoder_soil", lambda: models.load_joblib("ordinal_encoder_soil.pkl", requires=["sklearn"]))
+models.register("scaler", lambda: models.load_joblib("scaler.pkl", requires=["sklearn"]))
+
+# When enabled, the StandardScaler is folded into the booster's split thresholds at
+# load time so the hot path feeds raw features straight to the model. The compiled
+# booster is checked against the original on YIELD_FOLD_VERIFY_ROWS random inputs
+# and only used if every prediction is identical.
+YIELD_MODEL_FOLD_SCALER = os.environ.get("YIELD_MODEL_FOLD_SCALER", "1") == "1"
+YIELD_FOLD_VERIFY_ROWS = int(os.environ.get("YIELD_FOLD_VERIFY_ROWS", 50000))
+
+
+def load_yield_pipeline():
+    """(assembler, booster) pair for the yield model, with the scaler folded in when possible"""
+    encoders = (models.get("encoder_district"), models.get("encoder_season"), models.get("encoder_soil"))
+    scaler = models.get("scaler")
+    booster = models.get("yield_booster")
+
+    # Precompiled encoders + scaler for the prediction hot path (no pandas/sklearn per request)
+    scaled_assembler = FeatureAssembler(*encoders, scaler, crop_categories)
+    if not YIELD_MODEL_FOLD_SCALER:
+        return scaled_assembler, booster
+
+    try:
+        compiled = fold_scaler_into_booster(
+            booster, scaled_assembler.mean, scaled_assembler.scale
+        )
+        raw_assembler = FeatureAssembler(*encoders, None, crop_categories)
+        inputs = raw_assembler.random_matrix(YIELD_FOLD_VERIFY_ROWS)
+        expected = booster.inplace_predict(scaled_assembler.transform(inputs), validate_features=False)
+        actual = compiled.inplace_predict(inputs, validate_features=False)
+        if not np.array_equal(expected, actual):
+            mismatched = int(np.count_nonzero(expected != actual))
+            raise ValueError(f"{mismatched}/{len(inputs)} predictions differ from the original model")
+    except Exception as e:
+        print(f"[Model Store] Not folding scaler into yield model: {e}")
+        return scaled_assembler, booster
+
+    print(f"[Model Store] Folded scaler into yield model (verified on {len(inputs)} inputs)")
+    return raw_assembler, compiled
+
+
+models.register("yield_pipeline", load_yield_pipeline)
+models.register("assembler", lambda: models.get("yield_pipeline")[0])
+models.register("yield_model", lambda: models.get("yield_pipeline")[1])
+models.register("yield_split_points", lambda: booster_split_points(models.get("yield_model")))
+
+# Crop recommendation model and its scalers are optional; /recommend_crop errors without them
+models.register("crop_recommender", lambda: models.load_pickle("modelrandclf.pkl", requires=["sklearn"]), required=False)
+models.register("crop_recommender_standard_scaler", lambda: models.load_pickle("standscaler.pkl", requires=["sklearn"]), required=False)
+models.register("crop_recommender_minmax_scaler", lambda: models.load_pickle("minmaxscaler.pkl", requires=["sklearn"]), required=False)
+
+# Likewise the recommender's MinMax + Standard scalers are composed into one affine
+# map per feature and folded into every tree's thresholds, so the forest runs on the
+# raw agronomic inputs. Verified against the original pipeline on random inputs
+# covering both the usual input ranges and the band the forest actually splits in.
+CROP_RECOMMENDER_FOLD_SCALERS = os.environ.get("CROP_RECOMMENDER_FOLD_SCALERS", "1") == "1"
+CROP_RECOMMENDER_FOLD_VERIFY_ROWS = int(os.environ.get("CROP_RECOMMENDER_FOLD_VERIFY_ROWS", 20000))
+# Once verified, the compiled forest replaces the sklearn forest and scalers, which
+# are released. It is far faster for small batches, but sklearn's Cython loop
+# overtakes it at about 1000 rows (`python tree_compiler.py benchmark-forest`).
+# CROP_RECOMMENDER_KEEP_SKLEARN=1 keeps the originals loaded alongside it (about
+# twice the recommender's memory) and scores batches of more than
+# CROP_RECOMMENDER_COMPILED_MAX_ROWS uncached rows with them.
+CROP_RECOMMENDER_KEEP_SKLEARN = os.environ.get("CROP_RECOMMENDER_KEEP_SKLEARN", "0") == "1"
+CROP_RECOMMENDER_COMPILED_MAX_ROWS = int(os.environ.get("CROP_RECOMMENDER_COMPILED_MAX_ROWS", 1000))
+CROP_RECOMMENDER_ORIGINALS = ("crop_recommender", "crop_recommender_minmax_scaler", "crop_recommender_standard_scaler")
+
+# N, P, K, temperature, humidity, pH, rainfall
+CROP_RECOMMENDER_INPUT_LOW = [0, 5, 5, 8, 14, 3.5, 20]
+CROP_RECOMMENDER_INPUT_HIGH = [140, 145, 205, 44, 100, 10, 300]
+
+
+def load_crop_recommender_pipeline():
+    """(scalers, forest) for /recommend_crop; scalers is empty once folded into the forest"""
+    forest = models.get("crop_recommender")
+    scalers = (models.get("crop_recommender_minmax_scaler"), models.get("crop_recommender_standard_scaler"))
+    if not CROP_RECOMMENDER_FOLD_SCALERS:
+        return scalers, forest
+
+    try:
+        compiled = fold_scalers_into_forest(forest, scalers)
+        split_low, split_high = forest_split_bounds(forest, scalers)
+        half = CROP_RECOMMENDER_FOLD_VERIFY_ROWS // 2
+        inputs = np.vstack([
+            random_inputs(CROP_RECOMMENDER_INPUT_LOW, CROP_RECOMMENDER_INPUT_HIGH, half, seed=0),
+            random_inputs(split_low - 1, split_high + 1, CROP_RECOMMENDER_FOLD_VERIFY_ROWS - half, seed=1),
+        ])
+        expected = forest.predict_proba(scale_crop_features(scalers, inputs))
+        actual = compiled.predict_proba(inputs)
+        if not np.array_equal(expected, actual):
+            mismatched = int(np.count_nonzero(np.any(expected != actual, axis=1)))
+            raise ValueError(f"{mismatched}/{len(inputs)} predictions differ from the original model")
+    except Exception as e:
+        print(f"[Model Store] Not folding scalers into crop recommender: {e}")
+        return scalers, forest
+
+    print(f"[Model Store] Folded scalers into crop recommender (verified on {len(inputs)} inputs)")
+    if not CROP_RECOMMENDER_KEEP_SKLEARN:
+        for name in CROP_RECOMMENDER_ORIGINALS:
+            models.release(name)
+    return (), compiled
+
+
+def crop_recommender_for(n_rows):
+    """(scalers, forest) to score n_rows with: the pipeline, or for large batches the kept sklearn one"""
+    scalers, forest = models.get("crop_recommender_pipeline")
+    if CROP_RECOMMENDER_KEEP_SKLEARN and n_rows > CROP_RECOMMENDER_COMPILED_MAX_ROWS \
+            and isinstance(forest, CompiledForest):
+        scalers = (models.get("crop_recommender_minmax_scaler"), models.get("crop_recommender_standard_scaler"))
+        forest = models.get("crop_recommender")
+    return scalers, forest
+
+
+def scale_crop_features(scalers, features):
+    for scaler in scalers:
+        features = scaler.transform(features)
+    return features
+
+
+models.register("crop_recommender_pipeline", load_crop_recommender_pipeline, required=False)
+
+
+def predict_production(input_features):
+    """Run the yield model directly on a matrix built by the "assembler" artifact"""
+    return models.get("yield_model").inplace_predict(input_features, validate_features=False)
+
+
+# Optional micro-batching for single-row /predict inferences: concurrent requests
+# are queued and run as one matrix once PREDICT_BATCH_MAX_SIZE rows are waiting or
+# the oldest has waited PREDICT_BATCH_MAX_WAIT_MS, so per-call model overhead is
+# paid once per batch instead of once per request. Stats at /scheduler/stats.
+PREDICT_MICRO_BATCHING = os.environ.get("PREDICT_MICRO_BATCHING", "0") == "1"
+PREDICT_BATCH_MAX_SIZE = int(os.environ.get("PREDICT_BATCH_MAX_SIZE", 64))
+PREDICT_BATCH_MAX_WAIT_MS = float(os.environ.get("PREDICT_BATCH_MAX_WAIT_MS", 2))
+
+yield_batcher = MicroBatcher(
+    predict_production, PREDICT_BATCH_MAX_SIZE, PREDICT_BATCH_MAX_WAIT_MS / 1000, name="yield-batcher"
+)
+
+
+def predict_row_production(input_row):
+    """Predicted production for one assembled row, through the micro-batcher when enabled"""
+    if PREDICT_MICRO_BATCHING:
+        return float(yield_batcher.submit(input_row))
+    return float(predict_production(input_row)[0])
+
+
+def raw_split_points():
+    """yield_split_points mapped back to raw feature units when the model runs on scaled features"""
+    assembler = models.get("assembler")
+    split_points = models.get("yield_split_points")
+    if assembler.mean is None and assembler.scale is None:
+        return split_points
+    mean = assembler.mean if assembler.mean is not None else np.zeros(assembler.n_features)
+    scale = assembler.scale if assembler.scale is not None else np.ones(assembler.n_features)
+    return {feature: values * scale[feature] + mean[feature] for feature, values in split_points.items()}
+
+
+def predict_grid_production(input_features, columns=(0, 1)):
+    """
+    predict_production() for rows that differ only in the given columns (e.g. a
+    rainfall x area grid). Rows whose values fall between the same pair of split
+    points in every such column take identical tree paths, so only one row per
+    distinct combination is run through the model.
+    """
+    split_points = models.get("yield_split_points")
+    key = np.zeros(len(input_features), dtype=np.int64)
+    for column in columns:
+        thresholds = split_points.get(column, np.empty(0, dtype=np.float32))
+        # XGBoost compares float32(x) < threshold
+        bucket = np.searchsorted(thresholds, input_features[:, column].astype(np.float32), side="right")
+        key = key * (len(thresholds) + 1) + bucket
+    _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+    return predict_production(input_features[first])[inverse.ravel()]
+
+
+# Cache backend shared by the prediction, recommendation, weather and market caches:
+#   memory                - per-worker in-process LRU (default)
+#   sqlite:///cache.db    - SQLite file shared by the workers on one host
+#   redis://host:6379/0   - Redis, shared by every worker on every host
+# Shared backends key entries by namespace and the same canonical key tuples as
+# memory, with model results namespaced by a hash of the model files.
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "memory")
+if CACHE_BACKEND.split("://")[0] not in CACHE_BACKENDS:
+    raise ValueError(f"CACHE_BACKEND must be one of {CACHE_BACKENDS} (sqlite:///path, redis://host:port/db)")
+
+
+def cache_namespace(name, *model_files):
+    """Namespace for cached model outputs; shared backends get a model-version suffix so a new model starts cold"""
+    if CACHE_BACKEND == "memory":
+        return name
+    return f"{name}-{models.fingerprint(*model_files)}"
+
+
+# Prediction cache in front of the yield model. Keys are the six /predict inputs;
+# with a non-zero bucket size, Rainfall/Area are snapped to the nearest bucket
+# before prediction, so inputs within step/2 of each other share one entry
+# (the model then sees a value at most step/2 away from the request's).
+PREDICTION_CACHE_SIZE = int(os.environ.get("PREDICTION_CACHE_SIZE", 4096))
+PREDICTION_CACHE_POLICY = os.environ.get("PREDICTION_CACHE_POLICY", "lru")
+PREDICTION_CACHE_TTL = float(os.environ.get("PREDICTION_CACHE_TTL", 0))  # seconds, 0 = never expire
+RAINFALL_BUCKET_MM = float(os.environ.get("RAINFALL_BUCKET_MM", 0))  # 0 = exact values
+AREA_BUCKET_HECTARES = float(os.environ.get("AREA_BUCKET_HECTARES", 0))  # 0 = exact values
+
+def prediction_key(data):
+    """Canonical cache key for a /predict request: (district, season, soil, crop, rainfall, area)"""
+    return (
+        data["District_Name"],
+        data["Season_Encoded"],
+        data["Soil_Quality_Encoded"],
+        str(data["Crop"]),
+        quantize(finite_float(data["Rainfall"], "Rainfall"), RAINFALL_BUCKET_MM),
+        quantize(finite_float(data["Area"], "Area"), AREA_BUCKET_HECTARES),
+    )
+
+
+# Optional precomputed prediction atlas (built with `python atlas.py build`). Modes:
+#   off         - always run the model (default)
+#   nearest     - value at the nearest rainfall x area lattice point
+#   interpolate - bilinear interpolation between the four surrounding lattice points
+# Atlas answers are approximate; `python atlas.py check` (also run at build time and
+# stored in the atlas metadata, see /cache/stats) reports their error against the
+# live model. Combinations outside the atlas (e.g. unknown crops) use the model.
+PREDICTION_ATLAS_MODE = os.environ.get("PREDICTION_ATLAS_MODE", "off")
+PREDICTION_ATLAS_PATH = os.environ.get("PREDICTION_ATLAS_PATH", "model/prediction_atlas.npy")
+if PREDICTION_ATLAS_MODE not in ATLAS_MODES:
+    raise ValueError(f"PREDICTION_ATLAS_MODE must be one of {ATLAS_MODES}")
+
+
+def load_prediction_atlas():
+    """The memory-mapped atlas, or None (logged) when it is missing or built for another model"""
+    if not os.path.exists(PREDICTION_ATLAS_PATH):
+        print(f"[Atlas] {PREDICTION_ATLAS_PATH} not found; run `python atlas.py build`. Using the model.")
+        return None
+    atlas = PredictionAtlas(PREDICTION_ATLAS_PATH)
+    if atlas.model_sha256 != booster_fingerprint(models.get("yield_booster")):
+        print(f"[Atlas] {PREDICTION_ATLAS_PATH} was built for a different yield model; rebuild it. Using the model.")
+        return None
+    print(f"[Atlas] Loaded {PREDICTION_ATLAS_PATH} {list(atlas.values.shape)} ({PREDICTION_ATLAS_MODE} lookups)")
+    return atlas
+
+
+if PREDICTION_ATLAS_MODE != "off":
+    models.register("prediction_atlas", load_prediction_atlas, required=False)
+
+
+def atlas_production(rainfall, area, district, season, soil, crop):
+    """Atlas prediction for one record, or None when the atlas is off, unavailable or lacks the combination"""
+    if PREDICTION_ATLAS_MODE == "off":
+        return None
+    atlas = models.get("prediction_atlas")
+    if atlas is None:
+        return None
+    return atlas.lookup(rainfall, area, district, season, soil, crop, mode=PREDICTION_ATLAS_MODE)
+
+
+prediction_cache = make_cache(
+    CACHE_BACKEND,
+    cache_namespace(
+        f"prediction-{PREDICTION_ATLAS_MODE}", "xgboost_crop_yield_model.pkl", "xgboost_crop_yield_model.ubj",
+        "xgboost_crop_yield_model.json", "ordinal_encoder_district.pkl", "ordinal_encoder_season.pkl",
+        "ordinal_encoder_soil.pkl", "scaler.pkl"
+    ),
+    max_size=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL, policy=PREDICTION_CACHE_POLICY
+)
+
+
+def cached_production(data):
+    """Predicted production for a /predict request, served from the prediction cache (or atlas) when possible"""
+    key = prediction_key(data)
+    production_value = prediction_cache.get(key)
+    if production_value is None:
+        district, season, soil, crop, rainfall, area = key
+        production_value = atlas_production(rainfall, area, district, season, soil, crop)
+        if production_value is None:
+            input_features = models.get("assembler").row(rainfall, area, district, season, soil, crop)
+            production_value = predict_row_production(input_features)
+        prediction_cache.set(key, production_value)
+    return production_value
+
+
+# Class probabilities per exact /recommend_crop input (the forest is deterministic),
+# so repeat readings skip inference entirely; top-k is then a 22-element selection.
+RECOMMENDATION_CACHE_SIZE = int(os.environ.get("RECOMMENDATION_CACHE_SIZE", 4096))
+RECOMMEND_TOP_K = int(os.environ.get("RECOMMEND_TOP_K", 3))  # default number of crops returned
+
+recommendation_cache = make_cache(
+    CACHE_BACKEND, cache_namespace("recommendation", "modelrandclf.pkl", "standscaler.pkl", "minmaxscaler.pkl"),
+    max_size=RECOMMENDATION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL, policy=PREDICTION_CACHE_POLICY
+)
+
+
+def recommend_crop_proba(features):
+    """
+    Class probabilities (rows of the forest's classes_) for raw N/P/K/temperature/
+    humidity/pH/rainfall rows; cached rows are reused, the rest scored in one pass.
+    """
+    keys = [tuple(row) for row in features.tolist()]
+    rows = recommendation_cache.get_many(keys)
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        scalers, forest = crop_recommender_for(len(missing))
+        computed = forest.predict_proba(scale_crop_features(scalers, features[missing]))
+        for i, row in zip(missing, computed):
+            rows[i] = row.copy()  # don't keep the whole batch alive through one cached row
+        recommendation_cache.set_many([(keys[i], rows[i]) for i in missing])
+    return np.array(rows, dtype=float)
+
+
+def top_k_classes(proba, k):
+    """
+    Column indices of the k highest probabilities in each row, best first. Uses a
+    partial sort (argpartition) to find the k-th best score; ties go to the lower
+    column, like argmax, so the first entry is always the predict() class.
+    """
+    k = min(k, proba.shape[1])
+    kth = -np.partition(-proba, k - 1, axis=1)[:, k - 1:k]
+    above = proba > kth
+    tied = proba == kth
+    # Fill the remaining slots with the lowest-index ties
+    tied &= np.cumsum(tied, axis=1) <= k - above.sum(axis=1, keepdims=True)
+    candidates = np.nonzero(above | tied)[1].reshape(len(proba), k)
+    scores = np.take_along_axis(proba, candidates, axis=1)
+    return np.take_along_axis(candidates, np.lexsort((candidates, -scores)), axis=1)
+
+
+def top_crops(proba_row, class_indices, classes):
+    return [
+        {"crop": RECOMMENDED_CROPS.get(classes[j]), "probability": round(float(proba_row[j]), 4)}
+        for j in class_indices
+    ]
+
+
 # Crop-specific farming guides
 CROP_GUIDES = {
     "Rice": {
@@ -678,89 +1043,220 @@ CROP_GUIDES = {
     }
 }
 
+def guide_crop(crop_name):
+    """Crop whose guide is used for crop_name (Rice if it has none)"""
+    return crop_name if crop_name in CROP_GUIDES else "Rice"
+
 def get_crop_guide(crop_name):
     """Return crop-specific guide or default"""
-    return CROP_GUIDES.get(crop_name, CROP_GUIDES["Rice"])  # Default to Rice if crop not found
+    return CROP_GUIDES[guide_crop(crop_name)]
+
+# Guides are static, so each is serialized and compressed once. /guides/<crop> serves
+# the precompressed bytes with strong ETags; /predict splices the serialized guide
+# into its response, or with "guide": "ref" only links to it (PREDICT_GUIDE_DEFAULT
+# sets the mode for requests that don't choose). GUIDE_MAX_AGE is how long clients
+# may reuse /guides/<crop> before revalidating; versioned URLs (?v=) never change.
+GUIDE_MODES = ("inline", "ref")
+PREDICT_GUIDE_DEFAULT = os.environ.get("PREDICT_GUIDE_DEFAULT", "inline")
+GUIDE_MAX_AGE = int(os.environ.get("GUIDE_MAX_AGE", 86400))
+if PREDICT_GUIDE_DEFAULT not in GUIDE_MODES:
+    raise ValueError(f"PREDICT_GUIDE_DEFAULT must be one of {GUIDE_MODES}")
+
+GUIDE_PAYLOADS = {
+    crop: Precompressed(app.json.encode(guide))
+    for crop, guide in CROP_GUIDES.items()
+}
+
+
+def guide_reference(crop_name):
+    crop = guide_crop(crop_name)
+    version = GUIDE_PAYLOADS[crop].version
+    return {"crop": crop, "version": version, "url": f"/guides/{crop}?v={version}"}
+
+
+def json_response_with_raw(data, name, raw_json):
+    """Like jsonify(data), plus a field whose value is already-serialized JSON (bytes)"""
+    body = app.json.encode(data)
+    field = app.json.encode(name)
+    return app.response_class(
+        body[:-1] + (b"," if data else b"") + field + b":" + raw_json + b"}\n", mimetype="application/json"
+    )
+
+# Upper bound on rows accepted by /predict/batch and /recommend_crop/batch in one request
+MAX_BATCH_ROWS = 10000
+
+# Sustainability scoring (shared by /predict and /predict/batch)
+SOIL_QUALITY_SCORES = {"Poor": 30, "Moderate": 65, "Good": 90}
+OPTIMAL_RAINFALL_MM = 800
+OPTIMAL_AREA_HECTARES = 50
+
+# Recommendation messages, in the same order as the flag columns of sustainability_metrics()
+RECOMMENDATION_RULES = [
+    "Rainfall is below optimal. Consider irrigation.",
+    "High rainfall detected. Ensure proper drainage.",
+    "Soil quality is poor. Consider soil amendments.",
+    "Small farm size. Focus on high-value crops.",
+    "Low predicted yield. Review farming practices.",
+]
+
+
+def sustainability_metrics(production, rainfall, area, soil_quality_score):
+    """
+    Compute yield, efficiency scores and recommendation flags for N rows at once.
+    All inputs are float arrays of shape (N,); returns
+    (yield_per_hectare, rainfall_efficiency, area_efficiency, overall_score, flags)
+    where flags is a boolean (N, len(RECOMMENDATION_RULES)) matrix.
+    """
+    yield_per_hectare = np.divide(production, area, out=np.zeros_like(production), where=area > 0)
+    rainfall_efficiency = np.minimum((rainfall / OPTIMAL_RAINFALL_MM) * 100, 100)
+    area_efficiency = np.minimum((area / OPTIMAL_AREA_HECTARES) * 100, 100)
+    overall_score = (soil_quality_score + rainfall_efficiency + area_efficiency) / 3
+    flags = np.column_stack([
+        rainfall < 600,
+        rainfall > 1000,
+        soil_quality_score < 50,
+        area < 5,
+        production < 10,
+    ])
+    return yield_per_hectare, rainfall_efficiency, area_efficiency, overall_score, flags
+
+
+def recommendation_messages(flag_row):
+    """Turn one row of recommendation flags into the list of messages"""
+    messages = [message for message, flag in zip(RECOMMENDATION_RULES, flag_row) if flag]
+    return messages if messages else ["Farming conditions are optimal!"]
+
+# FRONTEND_BUILD (e.g. ../frontend/build) serves the React build from this process:
+# loaded and precompressed once at startup, hashed bundles cached as immutable.
+# Unset, the frontend is served separately and / answers with the API status.
+FRONTEND_BUILD = os.environ.get("FRONTEND_BUILD", "")
+# API responses of at least API_COMPRESS_MIN_BYTES are compressed for clients that
+# accept it (0 disables); smaller ones aren't worth the CPU or the header bytes.
+API_COMPRESS_MIN_BYTES = int(os.environ.get("API_COMPRESS_MIN_BYTES", 1024))
+
+
+def load_frontend_build():
+    """The frontend build served from memory, or None when FRONTEND_BUILD is unset"""
+    if not FRONTEND_BUILD:
+        return None
+    build = StaticBuild(FRONTEND_BUILD)
+    print(f"[Static] Serving {len(build.files)} files from {FRONTEND_BUILD}: {build.sizes()} bytes")
+    return build
+
+
+models.register("frontend_build", load_frontend_build, required=bool(FRONTEND_BUILD))
+
+
+@app.after_request
+def compress_api_response(response):
+    if API_COMPRESS_MIN_BYTES > 0:
+        compress_response(response, request.accept_encodings, API_COMPRESS_MIN_BYTES)
+    return response
+
 
 @app.route("/")
 def home():
+    build = models.get("frontend_build")
+    if build is not None:
+        return build.response(request, "")
     return jsonify({"message": "Crop Yield Prediction API is running!"})
 
+def frontend_file(path):
+    """A file of the frontend build; app routes (/result, /about...) get index.html"""
+    response = models.get("frontend_build").response(request, path)
+    if response is None:
+        return jsonify({"error": "Not found"}), 404
+    return response
+
+# Only with a build, so unknown API paths otherwise keep their plain 404/405
+if FRONTEND_BUILD:
+    app.add_url_rule("/<path:path>", view_func=frontend_file)
+
+@app.route("/cache/stats")
+def cache_stats():
+    """Hit/miss/eviction counters for the caches (per worker; shared backends also report their size)"""
+    return jsonify({
+        "backend": CACHE_BACKEND.split("://")[0],
+        "prediction": prediction_cache.stats(),
+        "crop_recommendation": recommendation_cache.stats(),
+        "atlas": models.get("prediction_atlas").stats() if PREDICTION_ATLAS_MODE != "off" and models.get("prediction_atlas") else None,
+        "weather": weather_service.stats(),
+        "market": market_cache.stats()
+    })
+
+@app.route("/scheduler/stats")
+def scheduler_stats():
+    """Batch size, queue wait and inference time of the /predict micro-batcher"""
+    return jsonify({"enabled": PREDICT_MICRO_BATCHING, "yield": yield_batcher.stats()})
+
+@app.route("/upstream/stats")
+def upstream_stats():
+    """Latency, error and circuit breaker state per outbound upstream, plus requests coalesced onto in-flight fetches"""
+    return jsonify({"open-meteo": dict(open_meteo_client.stats(), single_flight=weather_service.cache.flights.stats())})
+
+@app.route("/guides")
+def list_guides():
+    """Crops with a farmer guide, with each guide's versioned URL and encoded sizes"""
+    return jsonify({
+        crop: dict(guide_reference(crop), bytes=payload.sizes())
+        for crop, payload in GUIDE_PAYLOADS.items()
+    })
+
+@app.route("/guides/<crop>")
+def get_guide(crop):
+    """A crop's farmer guide, precompressed; revalidate with If-None-Match"""
+    payload = GUIDE_PAYLOADS.get(crop)
+    if payload is None:
+        return jsonify({"error": f"No guide for {crop}"}), 404
+    if request.args.get("v") == payload.version:
+        cache_control = "public, max-age=31536000, immutable"
+    else:
+        cache_control = f"public, max-age={GUIDE_MAX_AGE}"
+    return payload.response(request, cache_control)
+
+# A field's conditions, shared by the yield routes; categorical inputs must be known
+# to the encoders
+FIELD_CONDITIONS = {
+    "Rainfall": number(),
+    "Area": number(),
+    "District_Name": choice(lambda: models.get("assembler").district_codes),
+    "Season_Encoded": choice(lambda: models.get("assembler").season_codes),
+    "Soil_Quality_Encoded": choice(lambda: models.get("assembler").soil_codes),
+}
+
+# Typed /predict body, also each /predict/batch record (which ignores guide)
+PREDICT_SCHEMA = Schema({
+    **FIELD_CONDITIONS,
+    "Crop": string(),
+    "guide": optional(choice(GUIDE_MODES), PREDICT_GUIDE_DEFAULT),
+})
+
+# Batch bodies: records are checked one by one, each failing record getting its own error
+PREDICT_BATCH_SCHEMA = Schema({"records": list_of(any_value, MAX_BATCH_ROWS)})
+
 @app.route("/predict", methods=["POST"])
 def predict():
     try:
-        # Get data from request
-        data = request.get_json()
-
-        # Validate input
-        required_fields = ["Rainfall", "Area", "District_Name", "Season_Encoded", "Soil_Quality_Encoded", "Crop"]
-        if not all(field in data for field in required_fields):
-            return jsonify({"error": "Missing fields in request"}), 400
-
-        # Encode categorical features
-        district_encoded = encoder_district.transform([[data["District_Name"]]])[0][0]
-        season_encoded = encoder_season.transform([[data["Season_Encoded"]]])[0][0]
-        soil_encoded = encoder_soil.transform([[data["Soil_Quality_Encoded"]]])[0][0]
-
-        # Initialize all crop columns with 0
-        crop_input = {crop: 0 for crop in crop_categories}
-        selected_crop = "Crop_" + data["Crop"]
-        if selected_crop in crop_input:
-            crop_input[selected_crop] = 1  # Set 1 for the present crop
-
-        # Create input feature array
-        input_features = np.array([
-            data["Rainfall"],
-            data["Area"],
-            district_encoded,
-            season_encoded,
-            soil_encoded
-        ] + list(crop_input.values())).reshape(1, -1)
-
-        # Apply scaling
-        feature_names = ["Rainfall", "Area", "District_Name", "Season_Encoded", "Soil_Quality_Encoded"] + crop_categories
-        input_df = pd.DataFrame(input_features, columns=feature_names)
-        input_features = scaler.transform(input_df)
-
-        # Predict Production
-        predicted_production = model.predict(input_features)
-        production_value = float(predicted_production[0])
-        
+        # Decode and validate the request
+        data = PREDICT_SCHEMA.load_request(request)
+
+        # Predict production (repeat inputs skip encoding, scaling and inference)
+        production_value = cached_production(data)
+
         # Calculate additional metrics
-        area = float(data["Area"])
-        rainfall = float(data["Rainfall"])
-        yield_per_hectare = production_value / area if area > 0 else 0
-        
-        # Calculate soil quality score (0-100)
-        soil_quality_map = {"Poor": 30, "Moderate": 65, "Good": 90}
-        soil_quality_score = soil_quality_map.get(data["Soil_Quality_Encoded"], 50)
-        
-        # Calculate rainfall efficiency (0-100)
-        rainfall_efficiency = min((rainfall / 800) * 100, 100)  # 800mm is optimal
-        
-        # Calculate area utilization score
-        area_efficiency = min((area / 50) * 100, 100)  # 50 hectares is optimal
-        
-        # Overall sustainability score
-        overall_score = (soil_quality_score + rainfall_efficiency + area_efficiency) / 3
-        
-        # Generate recommendations
-        recommendations = []
-        if rainfall < 600:
-            recommendations.append("Rainfall is below optimal. Consider irrigation.")
-        if rainfall > 1000:
-            recommendations.append("High rainfall detected. Ensure proper drainage.")
-        if soil_quality_score < 50:
-            recommendations.append("Soil quality is poor. Consider soil amendments.")
-        if area < 5:
-            recommendations.append("Small farm size. Focus on high-value crops.")
-        if production_value < 10:
-            recommendations.append("Low predicted yield. Review farming practices.")
-
-        # Get crop-specific guide
-        crop_guide = get_crop_guide(data["Crop"])
+        area = data["Area"]
+        rainfall = data["Rainfall"]
+        soil_quality_score = SOIL_QUALITY_SCORES.get(data["Soil_Quality_Encoded"], 50)
+        metrics = sustainability_metrics(
+            np.array([production_value]), np.array([rainfall]),
+            np.array([area]), np.array([soil_quality_score], dtype=float)
+        )
+        yield_per_hectare, rainfall_efficiency, area_efficiency, overall_score = (
+            float(column[0]) for column in metrics[:4]
+        )
+        recommendations = recommendation_messages(metrics[4][0])
 
-        return jsonify({
+        response_data = {
             "predicted_production": production_value,
             "yield_per_hectare": round(yield_per_hectare, 2),
             "area": area,
@@ -773,67 +1269,449 @@ def predict():
             "rainfall_efficiency": round(rainfall_efficiency, 2),
             "area_efficiency": round(area_efficiency, 2),
             "overall_sustainability_score": round(overall_score, 2),
-            "recommendations": recommendations if recommendations else ["Farming conditions are optimal!"],
-            "farmer_guide": crop_guide
+            "recommendations": recommendations
+        }
+        # Crop-specific guide: a link to /guides/<crop>, or the pre-serialized guide
+        if data["guide"] == "ref":
+            response_data["farmer_guide_ref"] = guide_reference(data["Crop"])
+            return jsonify(response_data)
+        return json_response_with_raw(response_data, "farmer_guide", GUIDE_PAYLOADS[guide_crop(data["Crop"])].body)
+
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/predict/batch", methods=["POST"])
+def predict_batch():
+    """
+    Predict production for many fields in a single model pass
+    Input: {
+        "records": [
+            {"Rainfall": 900, "Area": 12, "District_Name": "Pune",
+             "Season_Encoded": "Kharif", "Soil_Quality_Encoded": "Good", "Crop": "Rice"},
+            ...
+        ]
+    }
+    Returns one result per record, in order. Records that fail validation
+    carry an "error" instead of a prediction; the rest of the batch is still scored.
+    """
+    try:
+        records = PREDICT_BATCH_SCHEMA.load_request(request)["records"]
+        assembler = models.get("assembler")
+
+        # Validate each record; only valid rows go through the model
+        results = [None] * len(records)
+        valid_rows, rainfall, area, codes, soil_quality_score = [], [], [], [], []
+        for i, record in enumerate(records):
+            try:
+                record = records[i] = PREDICT_SCHEMA.load(record, "Record")
+            except ValidationError as e:
+                results[i] = {"index": i, **e.to_dict()}
+                continue
+
+            valid_rows.append(i)
+            rainfall.append(record["Rainfall"])
+            area.append(record["Area"])
+            codes.append(assembler.encode(
+                record["District_Name"], record["Season_Encoded"], record["Soil_Quality_Encoded"], record["Crop"]
+            ))
+            soil_quality_score.append(SOIL_QUALITY_SCORES.get(record["Soil_Quality_Encoded"], 50))
+
+        if valid_rows:
+            rainfall = np.array(rainfall)
+            area = np.array(area)
+            soil_quality_score = np.array(soil_quality_score, dtype=float)
+
+            # Encode, scale and predict the whole matrix at once
+            production = predict_production(assembler.matrix(rainfall, area, codes)).astype(float)
+
+            yield_per_hectare, rainfall_efficiency, area_efficiency, overall_score, flags = sustainability_metrics(
+                production, rainfall, area, soil_quality_score
+            )
+
+            for j, i in enumerate(valid_rows):
+                record = records[i]
+                results[i] = {
+                    "index": i,
+                    "predicted_production": float(production[j]),
+                    "yield_per_hectare": round(float(yield_per_hectare[j]), 2),
+                    "area": float(area[j]),
+                    "rainfall": float(rainfall[j]),
+                    "crop": record["Crop"],
+                    "district": record["District_Name"],
+                    "season": record["Season_Encoded"],
+                    "soil_quality": record["Soil_Quality_Encoded"],
+                    "soil_quality_score": int(soil_quality_score[j]),
+                    "rainfall_efficiency": round(float(rainfall_efficiency[j]), 2),
+                    "area_efficiency": round(float(area_efficiency[j]), 2),
+                    "overall_sustainability_score": round(float(overall_score[j]), 2),
+                    "recommendations": recommendation_messages(flags[j]),
+                }
+
+        return jsonify({
+            "count": len(records),
+            "succeeded": len(valid_rows),
+            "failed": len(records) - len(valid_rows),
+            "results": results
+        })
+
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+COMPARE_SORT_KEYS = ("estimated_revenue", "predicted_production")
+
+# Typed /predict/compare body: a field's conditions, without a crop
+COMPARE_SCHEMA = Schema({
+    **FIELD_CONDITIONS,
+    "sort_by": optional(choice(COMPARE_SORT_KEYS), "estimated_revenue"),
+})
+
+
+@app.route("/predict/compare", methods=["POST"])
+def predict_compare():
+    """
+    Predict every crop the yield model knows for one field, in a single model pass
+    Input: {
+        "Rainfall": 900, "Area": 12, "District_Name": "Pune",
+        "Season_Encoded": "Kharif", "Soil_Quality_Encoded": "Good",
+        "sort_by": "estimated_revenue"  (optional; or "predicted_production")
+    }
+    Returns the crops ranked by estimated revenue (production x average market
+    price); crops without market data are listed last.
+    """
+    try:
+        data = COMPARE_SCHEMA.load_request(request)
+        sort_by = data["sort_by"]
+        rainfall = data["Rainfall"]
+        area = data["Area"]
+        crops, features = models.get("assembler").crop_variants(
+            rainfall, area, data["District_Name"], data["Season_Encoded"], data["Soil_Quality_Encoded"]
+        )
+
+        # One inference for all crop variants of this field
+        production = predict_production(features).astype(float)
+        yield_per_hectare = production / area if area > 0 else np.zeros_like(production)
+
+        results = []
+        for crop, crop_production, crop_yield in zip(crops, production, yield_per_hectare):
+            market_data = CROP_MARKET_DATA.get(crop)
+            result = {
+                "crop": crop,
+                "predicted_production": float(crop_production),
+                "yield_per_hectare": round(float(crop_yield), 2),
+                "average_price": None,
+                "price_unit": None,
+                "estimated_revenue": None,
+            }
+            if market_data is not None:
+                result["average_price"] = market_data["avg_price"]
+                result["price_unit"] = market_data["unit"]
+                result["estimated_revenue"] = round(
+                    float(crop_production) / QUINTALS_PER_PRICE_UNIT[market_data["unit"]] * market_data["avg_price"], 2
+                )
+            results.append(result)
+        results.sort(key=lambda result: (result[sort_by] is None, -(result[sort_by] or 0)))
+
+        return jsonify({
+            "district": data["District_Name"],
+            "season": data["Season_Encoded"],
+            "soil_quality": data["Soil_Quality_Encoded"],
+            "rainfall": rainfall,
+            "area": area,
+            "sort_by": sort_by,
+            "best_crop": results[0]["crop"],
+            "crops": results
         })
 
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+MAX_SWEEP_STEPS = int(os.environ.get("MAX_SWEEP_STEPS", 200))  # per axis
+SWEEP_FORMATS = ("json", "base64")
+SWEEP_RANGE_SCHEMA = Schema({"min": number(), "max": number(), "steps": integer(1, MAX_SWEEP_STEPS)})
+
+
+def sweep_axis(spec):
+    """Converter: evenly spaced values from a {"min": .., "max": .., "steps": ..} range"""
+    try:
+        spec = SWEEP_RANGE_SCHEMA.load(spec, "Range")
+    except ValidationError as e:
+        if not e.fields:
+            raise ValueError("must be an object with min, max and steps") from None
+        raise ValueError(", ".join(f"{key} {problem}" for key, problem in e.fields.items())) from None
+    if spec["min"] > spec["max"]:
+        raise ValueError("min must not exceed max")
+    return np.linspace(spec["min"], spec["max"], spec["steps"])
+
+
+# Typed /predict/sweep body: a field's categorical conditions, a crop and the two ranges
+SWEEP_SCHEMA = Schema({
+    **{name: FIELD_CONDITIONS[name] for name in ("District_Name", "Season_Encoded", "Soil_Quality_Encoded")},
+    "Crop": string(),
+    "rainfall": sweep_axis,
+    "area": sweep_axis,
+    "format": optional(choice(SWEEP_FORMATS), "json"),
+})
+
+
+@app.route("/predict/sweep", methods=["POST"])
+def predict_sweep():
+    """
+    Predicted production over a rainfall x area grid for one field and crop,
+    evaluated in a single model pass
+    Input: {
+        "District_Name": "Pune", "Season_Encoded": "Kharif",
+        "Soil_Quality_Encoded": "Good", "Crop": "Rice",
+        "rainfall": {"min": 200, "max": 2000, "steps": 100},
+        "area": {"min": 1, "max": 100, "steps": 50},
+        "format": "json"  (optional; "base64" returns the matrix as little-endian float32 bytes)
+    }
+    production[i][j] is the prediction for rainfall[i] and area[j].
+    """
+    try:
+        data = SWEEP_SCHEMA.load_request(request)
+        response_format = data["format"]
+        rainfall = data["rainfall"]
+        area = data["area"]
+        features = models.get("assembler").grid(
+            rainfall, area, data["District_Name"], data["Season_Encoded"], data["Soil_Quality_Encoded"], data["Crop"]
+        )
+
+        # One inference over the grid's distinct tree paths
+        production = predict_grid_production(features).astype(np.float32).reshape(len(rainfall), len(area))
+
+        response = {
+            "district": data["District_Name"],
+            "season": data["Season_Encoded"],
+            "soil_quality": data["Soil_Quality_Encoded"],
+            "crop": data["Crop"],
+            "rainfall": rainfall.tolist(),
+            "area": area.tolist(),
+            "shape": [len(rainfall), len(area)],
+            "min_production": float(production.min()),
+            "max_production": float(production.max()),
+        }
+        if response_format == "base64":
+            response["dtype"] = "<f4"
+            response["production"] = base64.b64encode(production.astype("<f4").tobytes()).decode("ascii")
+        else:
+            response["production"] = production.tolist()
+        return jsonify(response)
+
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Crop recommender inputs, in model feature order, and its class labels
+RECOMMEND_REQUIRED_FIELDS = ["Nitrogen", "Phosporus", "Potassium", "Temperature", "Humidity", "pH", "Rainfall"]
+RECOMMENDED_CROPS = {
+    1: "Rice", 2: "Maize", 3: "Jute", 4: "Cotton", 5: "Coconut",
+    6: "Papaya", 7: "Orange", 8: "Apple", 9: "Muskmelon", 10: "Watermelon",
+    11: "Grapes", 12: "Mango", 13: "Banana", 14: "Pomegranate",
+    15: "Lentil", 16: "Blackgram", 17: "Mungbean", 18: "Mothbeans",
+    19: "Pigeonpeas", 20: "Kidneybeans", 21: "Chickpea", 22: "Coffee"
+}
+
+
+def recommendation_sentence(label):
+    """Map a predicted class to the message shown by the UI"""
+    if label in RECOMMENDED_CROPS:
+        return f"{RECOMMENDED_CROPS[label]} is the best crop to be cultivated."
+    return "Sorry, we could not determine the best crop to be cultivated with the provided data."
+
+
+# Number of crops returned, validated the same way by /recommend_crop and its batch route
+RECOMMEND_TOP_K_FIELD = optional(integer(1, len(RECOMMENDED_CROPS)), RECOMMEND_TOP_K)
+
+# One reading of the model's numeric features (each /recommend_crop/batch record)
+RECOMMEND_READING_SCHEMA = Schema({field: number() for field in RECOMMEND_REQUIRED_FIELDS})
+
+# Typed /recommend_crop body: a reading plus top_k
+RECOMMEND_SCHEMA = Schema({
+    **{field: number() for field in RECOMMEND_REQUIRED_FIELDS},
+    "top_k": RECOMMEND_TOP_K_FIELD,
+})
+
+# /recommend_crop/batch body; records are checked one by one, with per-record errors
+RECOMMEND_BATCH_SCHEMA = Schema({
+    "records": list_of(any_value, MAX_BATCH_ROWS),
+    "top_k": RECOMMEND_TOP_K_FIELD,
+})
+
+
 @app.route("/recommend_crop", methods=["POST"])
 def recommend_crop():
     try:
-        # Get data from request
-        data = request.get_json()
-
-        # Validate input for recommendation
-        required_fields = ["Nitrogen", "Phosporus", "Potassium", "Temperature", "Humidity", "pH", "Rainfall"]
-        if not all(field in data for field in required_fields):
-            return jsonify({"error": "Missing fields in request"}), 400
-
-        # Extract features from the JSON data
-        N = data.get('Nitrogen')
-        P = data.get('Phosporus')
-        K = data.get('Potassium')
-        temp = data.get('Temperature')
-        humidity = data.get('Humidity')
-        ph = data.get('pH')
-        rainfall = data.get('Rainfall')
+        # Decode and validate the request
+        data = RECOMMEND_SCHEMA.load_request(request)
+        top_k = data["top_k"]
 
         # Prepare the input for the recommendation model
-        feature_list = [float(N), float(P), float(K), float(temp), float(humidity), float(ph), float(rainfall)]
+        feature_list = [data[field] for field in RECOMMEND_REQUIRED_FIELDS]
         single_pred = np.array(feature_list).reshape(1, -1)
 
-        # Scale the input data
-        mx_features = mx_rec.transform(single_pred)
-        sc_mx_features = sc_rec.transform(mx_features)
+        # Class probabilities (cached per input), then the k most likely crops
+        proba = recommend_crop_proba(single_pred)
+        classes = models.get("crop_recommender_pipeline")[1].classes_
+        best = top_k_classes(proba, top_k)[0]
 
-        # Make recommendation prediction
-        prediction = model_rec.predict(sc_mx_features)
+        return jsonify({
+            "recommended_crop": recommendation_sentence(classes[best[0]]),
+            "top_crops": top_crops(proba[0], best, classes)
+        })
 
-        # Map prediction to crop names
-        crop_dict = {
-            1: "Rice", 2: "Maize", 3: "Jute", 4: "Cotton", 5: "Coconut", 
-            6: "Papaya", 7: "Orange", 8: "Apple", 9: "Muskmelon", 10: "Watermelon",
-            11: "Grapes", 12: "Mango", 13: "Banana", 14: "Pomegranate", 
-            15: "Lentil", 16: "Blackgram", 17: "Mungbean", 18: "Mothbeans", 
-            19: "Pigeonpeas", 20: "Kidneybeans", 21: "Chickpea", 22: "Coffee"
-        }
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        if prediction[0] in crop_dict:
-            crop = crop_dict[prediction[0]]
-            result = f"{crop} is the best crop to be cultivated."
-        else:
-            result = "Sorry, we could not determine the best crop to be cultivated with the provided data."
 
-        return jsonify({"recommended_crop": result})
+@app.route("/recommend_crop/batch", methods=["POST"])
+def recommend_crop_batch():
+    """
+    Recommend crops for many soil/climate readings in a single model pass
+    Input: {
+        "records": [
+            {"Nitrogen": 90, "Phosporus": 42, "Potassium": 43, "Temperature": 21,
+             "Humidity": 82, "pH": 6.5, "Rainfall": 203},
+            ...
+        ],
+        "top_k": 3  (optional)
+    }
+    Returns one result per record, in order; invalid records carry an "error".
+    """
+    try:
+        data = RECOMMEND_BATCH_SCHEMA.load_request(request)
+        records = data["records"]
+        top_k = data["top_k"]
+
+        results = [None] * len(records)
+        valid_rows, features = [], []
+        for i, record in enumerate(records):
+            try:
+                reading = RECOMMEND_READING_SCHEMA.load(record, "Record")
+            except ValidationError as e:
+                results[i] = {"index": i, **e.to_dict()}
+                continue
+            features.append([reading[field] for field in RECOMMEND_REQUIRED_FIELDS])
+            valid_rows.append(i)
+
+        if valid_rows:
+            proba = recommend_crop_proba(np.array(features))
+            classes = models.get("crop_recommender_pipeline")[1].classes_
+            best = top_k_classes(proba, top_k)
+            for j, i in enumerate(valid_rows):
+                label = classes[best[j, 0]]
+                results[i] = {
+                    "index": i,
+                    "crop": RECOMMENDED_CROPS.get(label),
+                    "recommended_crop": recommendation_sentence(label),
+                    "top_crops": top_crops(proba[j], best[j], classes),
+                }
 
+        return jsonify({
+            "count": len(records),
+            "succeeded": len(valid_rows),
+            "failed": len(records) - len(valid_rows),
+            "results": results
+        })
+
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 # Real-time Weather and Environmental Data API
+
+# Weather cache settings: "current" conditions barely change within 10-15 minutes.
+# WEATHER_COORD_DECIMALS=2 groups locations within ~1 km into one cache entry.
+WEATHER_CACHE_TTL = float(os.environ.get("WEATHER_CACHE_TTL", 600))
+WEATHER_STALE_TTL = float(os.environ.get("WEATHER_STALE_TTL", 3600))
+WEATHER_CACHE_SIZE = int(os.environ.get("WEATHER_CACHE_SIZE", 1024))
+WEATHER_COORD_DECIMALS = int(os.environ.get("WEATHER_COORD_DECIMALS", 2))
+# Coordinates within WEATHER_SNAP_RADIUS_KM of a district (or of an extra point from
+# WEATHER_REFERENCE_POINTS, a JSON file of {"name": [lat, lon]}) share that point's
+# cached weather; only coordinates farther out fetch their own grid cell. 0 = off.
+WEATHER_SNAP_RADIUS_KM = float(os.environ.get("WEATHER_SNAP_RADIUS_KM", 15))
+WEATHER_REFERENCE_POINTS = os.environ.get("WEATHER_REFERENCE_POINTS", "")
+# Entries older than WEATHER_LAST_KNOWN_TTL are dropped outright; until then they can
+# still be served as last-known data when Open-Meteo is unavailable.
+WEATHER_LAST_KNOWN_TTL = float(os.environ.get("WEATHER_LAST_KNOWN_TTL", 86400))
+WEATHER_PREWARM = os.environ.get("WEATHER_PREWARM", "1") == "1"
+WEATHER_PREWARM_INTERVAL = float(os.environ.get("WEATHER_PREWARM_INTERVAL", WEATHER_CACHE_TTL))
+
+# Outbound Open-Meteo client: pooled keep-alive connections, split timeouts and a
+# circuit breaker that opens after UPSTREAM_FAILURE_THRESHOLD failures in a row
+OPEN_METEO_URL = os.environ.get("OPEN_METEO_URL", OPEN_METEO_URL)
+UPSTREAM_POOL_SIZE = int(os.environ.get("UPSTREAM_POOL_SIZE", 10))
+UPSTREAM_CONNECT_TIMEOUT = float(os.environ.get("UPSTREAM_CONNECT_TIMEOUT", 3.05))
+UPSTREAM_READ_TIMEOUT = float(os.environ.get("UPSTREAM_READ_TIMEOUT", 5))
+UPSTREAM_FAILURE_THRESHOLD = int(os.environ.get("UPSTREAM_FAILURE_THRESHOLD", 5))
+UPSTREAM_RESET_TIMEOUT = float(os.environ.get("UPSTREAM_RESET_TIMEOUT", 30))
+
+open_meteo_client = UpstreamClient(
+    "open-meteo", OPEN_METEO_URL, pool_size=UPSTREAM_POOL_SIZE,
+    connect_timeout=UPSTREAM_CONNECT_TIMEOUT, read_timeout=UPSTREAM_READ_TIMEOUT,
+    failure_threshold=UPSTREAM_FAILURE_THRESHOLD, reset_timeout=UPSTREAM_RESET_TIMEOUT
+)
+
+weather_service = WeatherService(
+    DISTRICT_COORDS, ttl=WEATHER_CACHE_TTL, stale_ttl=WEATHER_STALE_TTL,
+    max_size=WEATHER_CACHE_SIZE, coord_decimals=WEATHER_COORD_DECIMALS,
+    client=open_meteo_client,
+    store=make_cache(CACHE_BACKEND, "weather", max_size=WEATHER_CACHE_SIZE, ttl=WEATHER_LAST_KNOWN_TTL),
+    reference_points=load_reference_points(WEATHER_REFERENCE_POINTS), snap_radius_km=WEATHER_SNAP_RADIUS_KM
+)
+
+
+_background_started = False
+_background_lock = threading.Lock()
+_prewarm_delay = 0.0
+
+
+@app.before_request
+def start_background_tasks():
+    """Start background workers once per process, on its first request"""
+    global _background_started
+    if _background_started:
+        return
+    with _background_lock:
+        if _background_started:
+            return
+        _background_started = True
+        if WEATHER_PREWARM:
+            weather_service.start_prewarm(WEATHER_PREWARM_INTERVAL, delay=_prewarm_delay)
+
+
+def configure_background_tasks(enabled=True, prewarm_delay=0.0):
+    """
+    Called by serve.py in each worker before it serves: whether the worker runs the
+    background tasks, and how long its weather pre-warm waits before the first run
+    """
+    global _background_started, _prewarm_delay
+    with _background_lock:
+        _background_started = not enabled
+        _prewarm_delay = prewarm_delay
+
+
+WEATHER_SCHEMA = Schema({
+    "district": optional(string(), ""),
+    "latitude": optional(number(-90, 90)),
+    "longitude": optional(number(-180, 180)),
+})
+
+
 @app.route('/api/weather', methods=['POST', 'OPTIONS'])
 def get_weather_data():
     """
@@ -848,128 +1726,36 @@ def get_weather_data():
     if request.method == 'OPTIONS':
         return '', 204
     
+    district = ''
     try:
-        data = request.json
-        district = data.get('district', '')
-        latitude = data.get('latitude')
-        longitude = data.get('longitude')
-        
-        print(f"[Weather API] Request received for district: {district}, lat: {latitude}, lon: {longitude}")
-        longitude = data.get('longitude')
-        
-        # District coordinates mapping for Maharashtra
-        district_coords = {
-            "Pune": (18.5204, 73.8567),
-            "Mumbai": (19.0760, 72.8777),
-            "Nagpur": (21.1458, 79.0882),
-            "Aurangabad": (19.8762, 75.3433),
-            "Nashik": (19.9975, 73.7898),
-            "Ahmednagar": (19.0841, 74.7421),
-            "Solapur": (17.6599, 75.9064),
-            "Kolhapur": (16.7050, 73.7331),
-            "Ratnagiri": (16.9891, 73.3128),
-            "Sindhudurg": (16.3975, 73.6675),
-            "Sangli": (16.8507, 74.5627),
-            "Satara": (17.6761, 73.9197),
-            "Yavatmal": (20.4248, 78.1357),
-            "Wardha": (20.7468, 78.6006),
-            "Akola": (20.7136, 77.0066),
-            "Amravati": (20.9517, 77.7597),
-            "Buldhana": (20.5544, 76.1797),
-            "Washim": (20.1033, 76.8157),
-            "Jalgaon": (21.1781, 75.5597),
-            "Dhule": (21.1975, 74.7742),
-            "Nandurbar": (21.3803, 74.2453),
-            "Gondia": (21.4515, 80.1925),
-            "Bhandara": (21.1768, 79.2502),
-            "Chandrapur": (19.2841, 79.3057),
-            "Latur": (18.4088, 76.3764),
-            "Parbhani": (19.2683, 76.7597),
-            "Hingoli": (19.7271, 77.1453),
-            "Vikarabad": (19.2783, 75.1385),
-            "Kannada": (19.2241, 75.5250),
-            "Beed": (19.2183, 75.7597),
-            "Usmanabad": (18.3706, 76.7597),
-            "Indore": (22.7196, 75.8577),
-        }
-        
-        # Get coordinates
-        if latitude and longitude:
-            lat, lon = float(latitude), float(longitude)
-        else:
-            district_name = district.strip().title()
-            if district_name in district_coords:
-                lat, lon = district_coords[district_name]
-            else:
-                print(f"[Weather API] District not found: {district}")
-                return jsonify({"error": f"District '{district}' not found"}), 400
+        data = WEATHER_SCHEMA.load_request(request)
+        district = data['district']
+        latitude = data['latitude']
+        longitude = data['longitude']
         
-        print(f"[Weather API] Using coordinates - lat: {lat}, lon: {lon}")
-        
-        # Fetch weather data from Open-Meteo (free, no API key needed)
-        # This service provides accurate weather without rate limiting
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&current=temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m,pressure_msl&timezone=Asia/Kolkata"
-        
-        print(f"[Weather API] Fetching from Open-Meteo: lat={lat}, lon={lon}")
-        response = requests.get(url, timeout=10)
-        print(f"[Weather API] Response status: {response.status_code}")
-        
-        if response.status_code != 200:
+        try:
+            weather_data = weather_service.current(district, latitude, longitude)
+        except WeatherError as e:
             # No fallback - return error so frontend knows API is down
-            print(f"[Weather API] API request failed with status {response.status_code}")
             return jsonify({
-                "error": f"Weather API unavailable (status {response.status_code})",
+                "error": str(e),
                 "district": district
-            }), response.status_code
-        
-        weather = response.json()
-        current = weather.get('current', {})
-        
-        # Map WMO weather codes to descriptions
-        wmo_codes = {
-            0: "Clear sky", 1: "Partly cloudy", 2: "Partly cloudy", 3: "Overcast",
-            45: "Foggy", 48: "Foggy", 51: "Light drizzle", 53: "Moderate drizzle", 55: "Heavy drizzle",
-            61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain", 71: "Slight snow",
-            73: "Moderate snow", 75: "Heavy snow", 77: "Snow grains", 80: "Slight rain showers",
-            81: "Moderate rain showers", 82: "Violent rain showers", 85: "Slight snow showers",
-            86: "Heavy snow showers", 95: "Thunderstorm", 96: "Thunderstorm with hail",
-            99: "Thunderstorm with hail"
-        }
-        
-        weather_code = current.get('weather_code', 0)
-        description = wmo_codes.get(weather_code, "Unknown")
-        
-        # Extract relevant data from Open-Meteo
-        weather_data = {
-            "status": "success",
-            "temperature": round(current.get('temperature_2m', 0), 1),
-            "humidity": current.get('relative_humidity_2m', 0),
-            "wind_speed": round(current.get('wind_speed_10m', 0), 2),
-            "pressure": round(current.get('pressure_msl', 1013), 1),
-            "description": description,
-            "weather_code": weather_code,
-            "district": district,
-            "latitude": lat,
-            "longitude": lon,
-            "season": get_current_season(),
-            "timezone": weather.get('timezone', 'Asia/Kolkata'),
-            "timestamp": datetime.now().isoformat()
-        }
-        
-        print(f"[Weather API] Success - Temperature: {weather_data['temperature']}°C, Humidity: {weather_data['humidity']}%")
+            }), e.status_code
         return jsonify(weather_data), 200
         
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
     except requests.exceptions.Timeout:
         print("[Weather API] Request timeout - Open-Meteo API unavailable")
         return jsonify({
             "error": "Weather service timeout",
-            "district": data.get('district', '') if data else ''
+            "district": district
         }), 504
     except requests.exceptions.ConnectionError:
         print("[Weather API] Connection error - Cannot reach Open-Meteo API")
         return jsonify({
             "error": "Cannot connect to weather service",
-            "district": data.get('district', '') if data else ''
+            "district": district
         }), 503
     except Exception as e:
         print(f"[Weather API] Exception occurred: {str(e)}")
@@ -978,20 +1764,68 @@ def get_weather_data():
         return jsonify({"error": f"Error fetching weather: {str(e)}"}), 500
 
 
-def get_current_season():
-    """Determine current season for Maharashtra"""
-    month = datetime.now().month
-    
-    # Maharashtra farming seasons
-    if month in [6, 7, 8, 9]:  # June-September
-        return "Monsoon (Kharif)"
-    elif month in [10, 11, 12, 1]:  # October-January
-        return "Winter (Rabi)"
-    else:  # February-May
-        return "Summer"
+# Upper bound on locations accepted by /api/weather/bulk in one request
+MAX_WEATHER_BULK_LOCATIONS = 200
+
+# Each location is checked by the weather service, which reports bad ones per item
+WEATHER_BULK_SCHEMA = Schema({
+    "districts": optional(list_of(string(), MAX_WEATHER_BULK_LOCATIONS)),
+    "locations": optional(list_of(mapping, MAX_WEATHER_BULK_LOCATIONS)),
+})
+
+
+@app.route('/api/weather/bulk', methods=['POST', 'OPTIONS'])
+def get_bulk_weather_data():
+    """
+    Get real-time weather for many locations in one call
+    Input: {
+        "districts": ["Pune", "Nagpur", ...],          (optional)
+        "locations": [                                   (optional)
+            {"district": "Pune"},
+            {"district": "My farm", "latitude": 18.6, "longitude": 73.9},
+            ...
+        ]
+    }
+    Cached locations are served from memory; all misses are fetched from
+    Open-Meteo in one multi-location request. Results follow request order
+    (districts first, then locations); failed items carry "error".
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    try:
+        data = WEATHER_BULK_SCHEMA.load_request(request)
+        districts = data['districts'] or []
+        locations = [{"district": district} for district in districts] + (data['locations'] or [])
+        if not locations:
+            return jsonify({"error": "No districts or locations in request"}), 400
+        if len(locations) > MAX_WEATHER_BULK_LOCATIONS:
+            return jsonify({"error": f"Too many locations (max {MAX_WEATHER_BULK_LOCATIONS})"}), 400
+
+        results = weather_service.current_many(locations)
+        failed = sum(1 for result in results if "error" in result)
+        return jsonify({
+            "count": len(results),
+            "failed": failed,
+            "results": results
+        }), 200
+
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
+    except Exception as e:
+        print(f"[Weather API] Bulk exception occurred: {str(e)}")
+        return jsonify({"error": f"Error fetching weather: {str(e)}"}), 500
 
 
 # Environmental Data Summary API
+ENVIRONMENTAL_SUMMARY_SCHEMA = Schema({
+    "district": optional(string(), ""),
+    "soil_type": optional(string(), "Unknown"),
+    "area": optional(number(minimum=0), 0),
+    "weather": optional(mapping),
+})
+
+
 @app.route('/api/environmental-summary', methods=['POST'])
 def get_environmental_summary():
     """
@@ -999,25 +1833,27 @@ def get_environmental_summary():
     Input: {
         "district": "Pune",
         "soil_type": "Loamy",
-        "area": 5.5
+        "area": 5.5,
+        "weather": (optional, payload previously returned by /api/weather)
     }
     """
     try:
-        data = request.json
-        district = data.get('district', '')
-        soil_type = data.get('soil_type', 'Unknown')
-        area = data.get('area', 0)
-        
-        # Get weather data
-        weather_response = requests.post(
-            'http://localhost:5000/api/weather',
-            json={"district": district},
-            timeout=10
-        )
+        data = ENVIRONMENTAL_SUMMARY_SCHEMA.load_request(request)
+        district = data['district']
+        soil_type = data['soil_type']
+        area = data['area']
         
-        if weather_response.status_code == 200:
-            weather_data = weather_response.json()
-        else:
+        # Get weather data: reuse a payload the client already fetched, else
+        # look it up in-process (served from the shared weather cache)
+        weather_data = data['weather']
+        if weather_data is None:
+            try:
+                weather_data = weather_service.current(district)
+            except (WeatherError, requests.exceptions.RequestException) as e:
+                print(f"[Environmental Summary] Weather unavailable for {district}: {e}")
+                weather_data = None
+
+        if weather_data is None:
             weather_data = {
                 "temperature": 28,
                 "humidity": 65,
@@ -1048,6 +1884,8 @@ def get_environmental_summary():
         
         return jsonify(summary), 200
         
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
     except Exception as e:
         return jsonify({"error": f"Error: {str(e)}"}), 500
 
@@ -1094,215 +1932,477 @@ def get_environmental_recommendations(temp, humidity, season, soil_type):
 
 
 # Crop Market Data API
+
+# Simulated market data per crop (shared by the market trends and crop comparison endpoints)
+# In production, this would integrate with actual market APIs like:
+# - AGMARKNET (Agricultural Marketing Network)
+# - NCDEX (National Commodity & Derivatives Exchange)
+# - MANDI pricing data
+CROP_MARKET_DATA = {
+    "Rice": {
+        "avg_price": 2850,  # ₹ per quintal
+        "min_price": 2650,
+        "max_price": 3050,
+        "trend": "↑ Upward",
+        "change_percent": 3.5,
+        "volume": 125000,  # quintals
+        "unit": "per quintal"
+    },
+    "Wheat": {
+        "avg_price": 2100,
+        "min_price": 1950,
+        "max_price": 2250,
+        "trend": "→ Stable",
+        "change_percent": 0.8,
+        "volume": 95000,
+        "unit": "per quintal"
+    },
+    "Cotton": {
+        "avg_price": 5500,
+        "min_price": 5200,
+        "max_price": 5800,
+        "trend": "↓ Downward",
+        "change_percent": -2.1,
+        "volume": 45000,
+        "unit": "per quintal"
+    },
+    "Groundnut": {
+        "avg_price": 5800,
+        "min_price": 5400,
+        "max_price": 6200,
+        "trend": "↑ Upward",
+        "change_percent": 2.8,
+        "volume": 38000,
+        "unit": "per quintal"
+    },
+    "Sugarcane": {
+        "avg_price": 3200,
+        "min_price": 3000,
+        "max_price": 3400,
+        "trend": "↑ Upward",
+        "change_percent": 1.5,
+        "volume": 520000,
+        "unit": "per tonne"
+    },
+    "Maize": {
+        "avg_price": 1850,
+        "min_price": 1700,
+        "max_price": 2000,
+        "trend": "→ Stable",
+        "change_percent": 0.2,
+        "volume": 115000,
+        "unit": "per quintal"
+    },
+    "Soybean": {
+        "avg_price": 4200,
+        "min_price": 3900,
+        "max_price": 4500,
+        "trend": "↑ Upward",
+        "change_percent": 2.2,
+        "volume": 42000,
+        "unit": "per quintal"
+    },
+    "Pulses": {
+        "avg_price": 6500,
+        "min_price": 6000,
+        "max_price": 7000,
+        "trend": "↑ Upward",
+        "change_percent": 4.1,
+        "volume": 65000,
+        "unit": "per quintal"
+    },
+    "Gram": {
+        "avg_price": 5200,
+        "min_price": 4800,
+        "max_price": 5600,
+        "trend": "→ Stable",
+        "change_percent": 0.5,
+        "volume": 28000,
+        "unit": "per quintal"
+    },
+    "Mustard": {
+        "avg_price": 5100,
+        "min_price": 4700,
+        "max_price": 5500,
+        "trend": "↓ Downward",
+        "change_percent": -1.2,
+        "volume": 35000,
+        "unit": "per quintal"
+    },
+    "Barley": {
+        "avg_price": 1600,
+        "min_price": 1450,
+        "max_price": 1750,
+        "trend": "→ Stable",
+        "change_percent": 0.3,
+        "volume": 18000,
+        "unit": "per quintal"
+    },
+    "Peas": {
+        "avg_price": 4500,
+        "min_price": 4100,
+        "max_price": 4900,
+        "trend": "↑ Upward",
+        "change_percent": 3.2,
+        "volume": 22000,
+        "unit": "per quintal"
+    }
+}
+
+# Quintals per price unit, to turn predicted production (quintals) into revenue
+QUINTALS_PER_PRICE_UNIT = {"per quintal": 1, "per tonne": 10}
+
+# Simulated trend series per (crop, state, day): every worker, and every repeat
+# request, shows the same series until it expires
+MARKET_CACHE_TTL = float(os.environ.get("MARKET_CACHE_TTL", 3600))
+market_cache = make_cache(CACHE_BACKEND, "market", max_size=256, ttl=MARKET_CACHE_TTL)
+
+# Historical mandi prices from AGMARKNET dumps, ingested with
+# `python price_store.py ingest <csv>...`. Crops in the store are answered from it
+# (any date range, state or market); others fall back to CROP_MARKET_DATA. A running
+# server reopens the store within MARKET_STORE_CHECK_INTERVAL seconds of an ingest.
+MARKET_PRICE_STORE = os.environ.get("MARKET_PRICE_STORE", "data/mandi_prices")
+MARKET_STORE_CHECK_INTERVAL = float(os.environ.get("MARKET_STORE_CHECK_INTERVAL", 30))
+MARKET_TREND_DAYS = 14
+MARKET_MAX_DAYS = 3660
+MARKET_BULK_MAX_CROPS = 100
+
+
+def load_price_store():
+    """The memory-mapped price store, or None when none has been ingested"""
+    if not os.path.exists(os.path.join(MARKET_PRICE_STORE, "meta.json")):
+        print(f"[Market API] No price store at {MARKET_PRICE_STORE}; using simulated market data")
+        return None
+    store = PriceStore(MARKET_PRICE_STORE)
+    info = store.info()
+    print(f"[Market API] Loaded price store {MARKET_PRICE_STORE}: {info['rows']} reports, "
+          f"{len(info['crops'])} crops, {info['first_date']} to {info['last_date']}")
+    return store
+
+
+models.register("price_store", load_price_store, required=False)
+price_store_checked = time.monotonic()
+price_store_lock = threading.Lock()
+
+
+def current_price_store():
+    """The price store (or None), reopened when an ingest has replaced it since it was loaded"""
+    global price_store_checked
+    store = models.get("price_store")
+    if time.monotonic() - price_store_checked < MARKET_STORE_CHECK_INTERVAL:
+        return store
+    with price_store_lock:
+        if time.monotonic() - price_store_checked >= MARKET_STORE_CHECK_INTERVAL:
+            price_store_checked = time.monotonic()
+            if store is None:
+                changed = os.path.exists(os.path.join(MARKET_PRICE_STORE, "meta.json"))
+            else:
+                changed = store.changed()
+            if changed:
+                models.release("price_store")
+    return models.get("price_store")
+
+
+def market_trend_label(change_percent):
+    if change_percent > 1:
+        return "↑ Upward"
+    if change_percent < -1:
+        return "↓ Downward"
+    return "→ Stable"
+
+
+def market_price_insight(change_percent):
+    if change_percent > 2:
+        return "Good opportunity to sell - prices trending up"
+    elif change_percent > 0:
+        return "Prices gradually improving"
+    elif change_percent > -2:
+        return "Prices slightly declining - monitor market"
+    return "Prices declining - consider alternative crops"
+
+
+def market_recommendations(change_percent, volume):
+    recommendations = []
+    if change_percent > 2:
+        recommendations.append("✅ High demand - strong selling opportunity")
+        recommendations.append("📈 Prices showing upward trend")
+    elif change_percent < -2:
+        recommendations.append("⚠️ Prices declining - consider storage or alternative crops")
+        recommendations.append("📉 Market oversupply situation")
+    else:
+        recommendations.append("➡️ Market stable - regular trading conditions")
+
+    if volume is not None and volume > 100000:
+        recommendations.append("💹 High trading volume - good liquidity")
+    else:
+        recommendations.append("📊 Moderate trading volume")
+    return recommendations
+
+
+# Optional price store range fields shared by the market routes
+MARKET_RANGE_FIELDS = {
+    "start_date": optional(iso_date),
+    "end_date": optional(iso_date),
+    "days": optional(integer(1, MARKET_MAX_DAYS), MARKET_TREND_DAYS),
+}
+
+MARKET_TRENDS_SCHEMA = Schema({
+    "crop": string(strip=True),
+    "state": optional(string(strip=True), "Maharashtra"),
+    "market": optional(string(strip=True), ""),
+    **MARKET_RANGE_FIELDS,
+    "interval": optional(choice(PRICE_INTERVALS), "day"),
+})
+
+MARKET_BULK_SCHEMA = Schema({
+    "crops": optional(list_of(string(strip=True), MARKET_BULK_MAX_CROPS)),
+    "state": optional(string(strip=True), "Maharashtra"),
+    **MARKET_RANGE_FIELDS,
+    "interval": optional(choice(("day",)), "day"),
+    "series": optional(boolean, True),
+})
+
+
+def load_market_request(schema):
+    """The request validated against schema, with start_date after end_date rejected too"""
+    data = schema.load_request(request)
+    if data["start_date"] and data["end_date"] and data["start_date"] > data["end_date"]:
+        raise ValidationError({"start_date": "must not be after end_date"})
+    return data
+
+
+def stored_market_summary(prices):
+    """market_data, period, trend_series and recommendations of a price store query() or summary()"""
+    change_percent = round(prices["change_percent"], 2)
+    # Arrivals are reported in tonnes; volumes elsewhere are in quintals
+    volume = round(prices["arrivals_tonnes"] * 10) if prices["arrivals_tonnes"] is not None else None
+    period = {"start": prices["start"], "end": prices["end"], "reports": prices["reports"]}
+    if "markets" in prices:
+        period["markets"] = prices["markets"]
+    return {
+        "market_data": {
+            "average_price": round(prices["average_price"]),
+            "minimum_price": round(prices["minimum_price"]),
+            "maximum_price": round(prices["maximum_price"]),
+            "price_unit": "per quintal",
+            "trend": market_trend_label(change_percent),
+            "price_change_percent": change_percent,
+            "trading_volume": volume,
+            "price_insight": market_price_insight(change_percent)
+        },
+        "period": period,
+        "trend_series": prices["series"],
+        "recommendations": market_recommendations(change_percent, volume),
+        "last_updated": prices["end"],
+        "data_source": "AGMARKNET (local price store)"
+    }
+
+
+def stored_market_trends(store, crop, state, market, data):
+    """
+    Market trends response from the price store. Without start_date the range is
+    the `days` days up to end_date, or up to the crop's latest report (dumps lag
+    behind today).
+    """
+    start, end, days, interval = data["start_date"], data["end_date"], data["days"], data["interval"]
+    if start is None:
+        start = (end or store.last_date(crop)) - timedelta(days=days - 1)
+
+    query_start = time.perf_counter()
+    prices = store.query(crop, start, end, state=state, market=market, interval=interval)
+    query_ms = (time.perf_counter() - query_start) * 1000
+    where = f"{market}, {state}" if market else state
+    if prices is None:
+        print(f"[Market API] No stored prices for {crop} in {where} from {start} to {end or 'latest'}")
+        return jsonify({
+            "error": f"No market prices for {crop} in {where} between {start} and {end or 'the latest report'}"
+        }), 404
+
+    summary = stored_market_summary(prices)
+    summary["period"]["interval"] = interval
+    response_data = {"status": "success", "crop": crop, "state": state, "market": market, **summary}
+    response_data["query_ms"] = round(query_ms, 3)
+    print(f"[Market API] Success - Average Price: ₹{summary['market_data']['average_price']}/quintal "
+          f"from {prices['reports']} reports ({query_ms:.2f} ms)")
+    return jsonify(response_data), 200
+
+
+def simulated_trend_series(crop, state):
+    """Mock trend series (last 14 days) around a CROP_MARKET_DATA crop's average price, cached per day"""
+    market_data = CROP_MARKET_DATA[crop]
+    trend_key = (crop, state, datetime.now().strftime('%Y-%m-%d'))
+    trend_series = market_cache.get(trend_key)
+    if trend_series is None:
+        trend_days = MARKET_TREND_DAYS
+        avg = market_data["avg_price"]
+        change_pct = market_data.get("change_percent", 0) / 100.0
+        trend_series = []
+        for i in range(trend_days - 1, -1, -1):
+            day = datetime.now() - timedelta(days=i)
+            # small random daily volatility plus a bias from overall change_percent
+            daily_vol = random.uniform(-0.01, 0.01)
+            trend_bias = (i / trend_days) * change_pct  # recent days reflect change
+            price = avg * (1 + trend_bias + daily_vol)
+            # clamp to min/max
+            price = max(market_data["min_price"], min(market_data["max_price"], round(price)))
+            trend_series.append({"date": day.strftime('%Y-%m-%d'), "price": price})
+        market_cache.set(trend_key, trend_series)
+    return trend_series
+
+
+def simulated_market_summary(market_data):
+    return {
+        "market_data": {
+            "average_price": market_data["avg_price"],
+            "minimum_price": market_data["min_price"],
+            "maximum_price": market_data["max_price"],
+            "price_unit": market_data["unit"],
+            "trend": market_data["trend"],
+            "price_change_percent": market_data["change_percent"],
+            "trading_volume": market_data["volume"],
+            "price_insight": market_price_insight(market_data["change_percent"])
+        },
+        "recommendations": market_recommendations(market_data["change_percent"], market_data["volume"]),
+        "data_source": "Agricultural Market Network (AGMARKNET) - Simulated"
+    }
+
+
+# The simulated summaries never change, so they are built once
+SIMULATED_MARKET_SUMMARIES = {crop: simulated_market_summary(market_data) for crop, market_data in CROP_MARKET_DATA.items()}
+
+# Per-crop bulk entries built from the price store's per-day aggregates, keyed by
+# the store version so a reopened store never serves stale entries
+market_bulk_cache = LRUCache(max_size=1024)
+
+
 @app.route('/api/crop-market-trends', methods=['POST', 'OPTIONS'])
 def get_crop_market_trends():
     """
     Get real-time market trends and prices for a selected crop
     Input: {
         "crop": "Rice",
-        "state": "Maharashtra"
+        "state": "Maharashtra",
+        "market": "Pune",            (optional, price store only)
+        "start_date": "2024-01-01",  (optional, price store only)
+        "end_date": "2024-06-30",    (optional, price store only)
+        "days": 14,                  (optional, price store only)
+        "interval": "day"            (optional: day, week or month; price store only)
     }
     """
     if request.method == 'OPTIONS':
         return '', 204
     
     try:
-        data = request.json
-        crop = data.get('crop', '').strip()
-        state = data.get('state', 'Maharashtra').strip()
+        data = load_market_request(MARKET_TRENDS_SCHEMA)
+        crop = data['crop']
+        state = data['state']
+        market = data['market'] or None
         
         print(f"[Market API] Request for crop: {crop}, state: {state}")
-        
-        # Simulate real market data based on crop type
-        # In production, this would integrate with actual market APIs like:
-        # - AGMARKNET (Agricultural Marketing Network)
-        # - NCDEX (National Commodity & Derivatives Exchange)
-        # - MANDI pricing data
-        
-        crop_market_data = {
-            "Rice": {
-                "avg_price": 2850,  # ₹ per quintal
-                "min_price": 2650,
-                "max_price": 3050,
-                "trend": "↑ Upward",
-                "change_percent": 3.5,
-                "volume": 125000,  # quintals
-                "unit": "per quintal"
-            },
-            "Wheat": {
-                "avg_price": 2100,
-                "min_price": 1950,
-                "max_price": 2250,
-                "trend": "→ Stable",
-                "change_percent": 0.8,
-                "volume": 95000,
-                "unit": "per quintal"
-            },
-            "Cotton": {
-                "avg_price": 5500,
-                "min_price": 5200,
-                "max_price": 5800,
-                "trend": "↓ Downward",
-                "change_percent": -2.1,
-                "volume": 45000,
-                "unit": "per quintal"
-            },
-            "Groundnut": {
-                "avg_price": 5800,
-                "min_price": 5400,
-                "max_price": 6200,
-                "trend": "↑ Upward",
-                "change_percent": 2.8,
-                "volume": 38000,
-                "unit": "per quintal"
-            },
-            "Sugarcane": {
-                "avg_price": 3200,
-                "min_price": 3000,
-                "max_price": 3400,
-                "trend": "↑ Upward",
-                "change_percent": 1.5,
-                "volume": 520000,
-                "unit": "per tonne"
-            },
-            "Maize": {
-                "avg_price": 1850,
-                "min_price": 1700,
-                "max_price": 2000,
-                "trend": "→ Stable",
-                "change_percent": 0.2,
-                "volume": 115000,
-                "unit": "per quintal"
-            },
-            "Soybean": {
-                "avg_price": 4200,
-                "min_price": 3900,
-                "max_price": 4500,
-                "trend": "↑ Upward",
-                "change_percent": 2.2,
-                "volume": 42000,
-                "unit": "per quintal"
-            },
-            "Pulses": {
-                "avg_price": 6500,
-                "min_price": 6000,
-                "max_price": 7000,
-                "trend": "↑ Upward",
-                "change_percent": 4.1,
-                "volume": 65000,
-                "unit": "per quintal"
-            },
-            "Gram": {
-                "avg_price": 5200,
-                "min_price": 4800,
-                "max_price": 5600,
-                "trend": "→ Stable",
-                "change_percent": 0.5,
-                "volume": 28000,
-                "unit": "per quintal"
-            },
-            "Mustard": {
-                "avg_price": 5100,
-                "min_price": 4700,
-                "max_price": 5500,
-                "trend": "↓ Downward",
-                "change_percent": -1.2,
-                "volume": 35000,
-                "unit": "per quintal"
-            },
-            "Barley": {
-                "avg_price": 1600,
-                "min_price": 1450,
-                "max_price": 1750,
-                "trend": "→ Stable",
-                "change_percent": 0.3,
-                "volume": 18000,
-                "unit": "per quintal"
-            },
-            "Peas": {
-                "avg_price": 4500,
-                "min_price": 4100,
-                "max_price": 4900,
-                "trend": "↑ Upward",
-                "change_percent": 3.2,
-                "volume": 22000,
-                "unit": "per quintal"
-            }
-        }
+
+        store = current_price_store()
+        if store is not None and store.has_crop(crop):
+            return stored_market_trends(store, crop, state, market, data)
         
         # Get crop data or return default if not found
-        if crop in crop_market_data:
-            market_data = crop_market_data[crop]
+        if crop in CROP_MARKET_DATA:
+            market_data = CROP_MARKET_DATA[crop]
         else:
             print(f"[Market API] Crop not found: {crop}")
             return jsonify({"error": f"Market data not available for {crop}"}), 404
-        
-        # Calculate price trend insights
-        price_insight = ""
-        if market_data["change_percent"] > 2:
-            price_insight = "Good opportunity to sell - prices trending up"
-        elif market_data["change_percent"] > 0:
-            price_insight = "Prices gradually improving"
-        elif market_data["change_percent"] > -2:
-            price_insight = "Prices slightly declining - monitor market"
-        else:
-            price_insight = "Prices declining - consider alternative crops"
-        
-        # Generate market recommendations
-        recommendations = []
-        if market_data["change_percent"] > 2:
-            recommendations.append("✅ High demand - strong selling opportunity")
-            recommendations.append("📈 Prices showing upward trend")
-        elif market_data["change_percent"] < -2:
-            recommendations.append("⚠️ Prices declining - consider storage or alternative crops")
-            recommendations.append("📉 Market oversupply situation")
-        else:
-            recommendations.append("➡️ Market stable - regular trading conditions")
-        
-        if market_data["volume"] > 100000:
-            recommendations.append("💹 High trading volume - good liquidity")
-        else:
-            recommendations.append("📊 Moderate trading volume")
-        
-        # Build a mock trend series (last 14 days) around average price
-        trend_days = 14
-        avg = market_data["avg_price"]
-        change_pct = market_data.get("change_percent", 0) / 100.0
-        trend_series = []
-        for i in range(trend_days - 1, -1, -1):
-            day = datetime.now() - timedelta(days=i)
-            # small random daily volatility plus a bias from overall change_percent
-            daily_vol = random.uniform(-0.01, 0.01)
-            trend_bias = (i / trend_days) * change_pct  # recent days reflect change
-            price = avg * (1 + trend_bias + daily_vol)
-            # clamp to min/max
-            price = max(market_data["min_price"], min(market_data["max_price"], round(price)))
-            trend_series.append({"date": day.strftime('%Y-%m-%d'), "price": price})
 
         # Prepare response
         response_data = {
             "status": "success",
             "crop": crop,
             "state": state,
-            "market_data": {
-                "average_price": market_data["avg_price"],
-                "minimum_price": market_data["min_price"],
-                "maximum_price": market_data["max_price"],
-                "price_unit": market_data["unit"],
-                "trend": market_data["trend"],
-                "price_change_percent": market_data["change_percent"],
-                "trading_volume": market_data["volume"],
-                "price_insight": price_insight
-            },
-            "trend_series": trend_series,
-            "recommendations": recommendations,
-            "last_updated": datetime.now().isoformat(),
-            "data_source": "Agricultural Market Network (AGMARKNET) - Simulated"
+            **SIMULATED_MARKET_SUMMARIES[crop],
+            "trend_series": simulated_trend_series(crop, state),
+            "last_updated": datetime.now().isoformat()
         }
         
         print(f"[Market API] Success - Average Price: ₹{market_data['avg_price']}/{market_data['unit']}")
         return jsonify(response_data), 200
         
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
+    except Exception as e:
+        print(f"[Market API] Exception occurred: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"error": f"Error fetching market data: {str(e)}"}), 500
+
+
+@app.route('/api/crop-market-trends/bulk', methods=['POST', 'OPTIONS'])
+def get_bulk_crop_market_trends():
+    """
+    Market trends for several crops in one request (result dashboard, price boards).
+    Stored crops are summarized from the price store's per-day aggregates over the
+    same range /api/crop-market-trends uses with a daily interval.
+    Input: {
+        "crops": ["Rice", "Wheat"],  (optional, default: every crop with market data)
+        "state": "Maharashtra",
+        "start_date": "2024-01-01",  (optional, price store only)
+        "end_date": "2024-06-30",    (optional, price store only)
+        "days": 14,                  (optional, price store only)
+        "series": true               (optional: false leaves out trend_series)
+    }
+    """
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    try:
+        data = load_market_request(MARKET_BULK_SCHEMA)
+        state = data['state']
+        include_series = data['series']
+        start, end, days = data['start_date'], data['end_date'], data['days']
+        store = current_price_store()
+
+        crops = data['crops']
+        if crops is None:
+            crops = list(dict.fromkeys(list(CROP_MARKET_DATA) + (store.crops if store is not None else [])))
+
+        query_start = time.perf_counter()
+        results, unavailable = [], []
+        for crop in dict.fromkeys(crops):
+            if store is not None and store.has_crop(crop):
+                key = (store.mtime, crop.lower(), state.lower(), start, end, days)
+                entry = market_bulk_cache.get(key)
+                if entry is None:
+                    crop_start = start or (end or store.last_date(crop)) - timedelta(days=days - 1)
+                    prices = store.summary(crop, crop_start, end, state=state)
+                    entry = stored_market_summary(prices) if prices is not None else False
+                    market_bulk_cache.set(key, entry)
+                if entry is False:
+                    unavailable.append(crop)
+                    continue
+                entry = {"crop": crop, **entry}
+            elif crop in CROP_MARKET_DATA:
+                entry = {
+                    "crop": crop,
+                    **SIMULATED_MARKET_SUMMARIES[crop],
+                    "trend_series": simulated_trend_series(crop, state),
+                    "last_updated": datetime.now().isoformat()
+                }
+            else:
+                unavailable.append(crop)
+                continue
+            if not include_series:
+                entry = {name: value for name, value in entry.items() if name != "trend_series"}
+            results.append(entry)
+        query_ms = (time.perf_counter() - query_start) * 1000
+
+        print(f"[Market API] Bulk request for {len(crops)} crops in {state}: {len(results)} found ({query_ms:.2f} ms)")
+        return jsonify({
+            "status": "success",
+            "state": state,
+            "crops": results,
+            "unavailable": unavailable,
+            "query_ms": round(query_ms, 3)
+        }), 200
+
+    except ValidationError as e:
+        return jsonify(e.to_dict()), 400
     except Exception as e:
         print(f"[Market API] Exception occurred: {str(e)}")
         import traceback
@@ -1310,5 +2410,41 @@ def get_crop_market_trends():
         return jsonify({"error": f"Error fetching market data: {str(e)}"}), 500
 
 
+@app.route("/ready")
+def ready():
+    """Readiness probe: 200 once models are loaded and warmed up, else 503; includes load timings"""
+    status = models.status()
+    status["load_mode"] = MODEL_LOAD_MODE
+    status["process_uptime_seconds"] = round(time.perf_counter() - BOOT_TIME, 3)
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+def warm_up_yield_model():
+    """One prediction through the assembler and booster so the first request isn't slow"""
+    assembler = models.get("assembler")
+    district = next(iter(assembler.district_codes))
+    season = next(iter(assembler.season_codes))
+    soil = next(iter(assembler.soil_codes))
+    predict_production(assembler.row(800, 10, district, season, soil, "Rice"))
+    predict_production(assembler.matrix(np.array([800.0]), np.array([10.0]), [assembler.encode(district, season, soil, "Rice")]))
+
+
+def warm_up_crop_recommender():
+    scalers, forest = models.get("crop_recommender_pipeline")
+    forest.predict_proba(scale_crop_features(scalers, np.array([[90, 42, 43, 21, 82, 6.5, 203]], dtype=float)))
+
+
+models.add_warmup("yield_model", warm_up_yield_model)
+models.add_warmup("crop_recommender", warm_up_crop_recommender)
+
+if MODEL_LOAD_MODE == "eager":
+    if not models.load_all():
+        raise RuntimeError(f"Failed to load model artifacts: {models.errors}")
+elif MODEL_LOAD_MODE == "background":
+    models.start_background_load()
+else:
+    models.mark_ready()
+
+
 if __name__ == "__main__":
     app.run(debug=True)
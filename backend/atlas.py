@@ -0,0 +1,234 @@
+import bisect
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+ATLAS_MODES = ("off", "nearest", "interpolate")
+ATLAS_VERSION = 1
+
+
+def metadata_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def booster_fingerprint(booster):
+    """Hash of a booster's serialized trees, to tell whether an atlas matches the live model"""
+    return hashlib.sha256(bytes(booster.save_raw("ubj"))).hexdigest()
+
+
+class PredictionAtlas:
+    """
+    Precomputed yield predictions for every district x season x soil x crop
+    combination over a rainfall x area lattice.
+
+    Values live in a .npy file of shape (districts, seasons, soils, crops,
+    rainfall, area) opened with mmap_mode="r", so lookups are O(1) array reads
+    and every worker process shares the same page-cache copy. Metadata (category
+    order, lattice axes, model fingerprint, error check) is in a JSON sidecar.
+    Inputs outside the lattice are clamped to its edges; the build places the
+    edges past the model's outermost split points, where predictions are flat.
+    """
+
+    def __init__(self, path):
+        with open(metadata_path(path)) as f:
+            self.metadata = json.load(f)
+        if self.metadata.get("version") != ATLAS_VERSION:
+            raise ValueError(f"Unsupported atlas version {self.metadata.get('version')}")
+        self.path = path
+        self.values = np.load(path, mmap_mode="r")
+        self.district_index = {name: i for i, name in enumerate(self.metadata["districts"])}
+        self.season_index = {name: i for i, name in enumerate(self.metadata["seasons"])}
+        self.soil_index = {name: i for i, name in enumerate(self.metadata["soils"])}
+        self.crop_index = {name: i for i, name in enumerate(self.metadata["crops"])}
+        self.rainfall = [float(value) for value in self.metadata["rainfall"]]
+        self.area = [float(value) for value in self.metadata["area"]]
+        for name, axis in (("rainfall", self.rainfall), ("area", self.area)):
+            if len(axis) < 2:
+                raise ValueError(f"Atlas {name} axis needs at least 2 points, got {len(axis)}")
+        self.model_sha256 = self.metadata["model_sha256"]
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+
+    @staticmethod
+    def _locate(axis, value):
+        """(lower lattice index, fraction of the way to the next point), clamped to the axis"""
+        if value <= axis[0]:
+            return 0, 0.0
+        if value >= axis[-1]:
+            return len(axis) - 2, 1.0
+        i = bisect.bisect_right(axis, value) - 1
+        return i, (value - axis[i]) / (axis[i + 1] - axis[i])
+
+    def lookup(self, rainfall, area, district, season, soil, crop, mode="interpolate"):
+        """Predicted production from the lattice, or None if the combination isn't in the atlas"""
+        with self._lock:
+            self.lookups += 1
+        try:
+            block = self.values[
+                self.district_index[district], self.season_index[season],
+                self.soil_index[soil], self.crop_index[str(crop)]
+            ]
+        except KeyError:
+            return None
+        with self._lock:
+            self.hits += 1
+
+        i, t = self._locate(self.rainfall, rainfall)
+        j, u = self._locate(self.area, area)
+        if mode == "nearest":
+            return float(block[i + (t >= 0.5), j + (u >= 0.5)])
+        cell = block[i:i + 2, j:j + 2].astype(float)
+        return float(
+            (1 - t) * ((1 - u) * cell[0, 0] + u * cell[0, 1])
+            + t * ((1 - u) * cell[1, 0] + u * cell[1, 1])
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "path": self.path,
+                "shape": list(self.values.shape),
+                "size_bytes": int(self.values.nbytes),
+                "built_at": self.metadata.get("built_at"),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "error_check": self.metadata.get("error_check"),
+            }
+
+
+def build_atlas(path, assembler, predict_grid, rainfall_axis, area_axis, model_sha256):
+    """
+    Evaluate predict_grid over every categorical combination known to the
+    assembler and write the atlas (values + metadata) to path.
+    predict_grid(features) must accept an assembler.grid() matrix.
+    """
+    districts = list(assembler.district_codes)
+    seasons = list(assembler.season_codes)
+    soils = list(assembler.soil_codes)
+    crops = list(assembler.crop_columns)
+    shape = (len(districts), len(seasons), len(soils), len(crops), len(rainfall_axis), len(area_axis))
+
+    start = time.perf_counter()
+    tmp_path = path + ".tmp.npy"
+    values = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=shape)
+    for d, district in enumerate(districts):
+        for s, season in enumerate(seasons):
+            for q, soil in enumerate(soils):
+                for c, crop in enumerate(crops):
+                    features = assembler.grid(rainfall_axis, area_axis, district, season, soil, crop)
+                    values[d, s, q, c] = predict_grid(features).reshape(len(rainfall_axis), len(area_axis))
+        print(f"[Atlas] {district} done ({d + 1}/{len(districts)}, {time.perf_counter() - start:.1f}s)")
+    values.flush()
+    del values
+    os.replace(tmp_path, path)
+
+    metadata = {
+        "version": ATLAS_VERSION,
+        "districts": districts,
+        "seasons": seasons,
+        "soils": soils,
+        "crops": crops,
+        "rainfall": [float(value) for value in rainfall_axis],
+        "area": [float(value) for value in area_axis],
+        "model_sha256": model_sha256,
+        "built_at": datetime.now().isoformat(),
+        "build_seconds": round(time.perf_counter() - start, 1),
+    }
+    with open(metadata_path(path), "w") as f:
+        json.dump(metadata, f, indent=2)
+    return metadata
+
+
+def check_atlas(atlas, assembler, predict, n=20000, seed=0):
+    """
+    Compare atlas lookups with the live model on n random inputs inside the
+    lattice (Rainfall/Area rounded to 0-2 decimals, like form input). Returns
+    absolute and relative error percentiles per lookup mode.
+    """
+    rng = np.random.default_rng(seed)
+    decimals = rng.integers(0, 3, n)
+    rainfall = np.round(rng.uniform(atlas.rainfall[0], atlas.rainfall[-1], n) * 10.0 ** decimals) / 10.0 ** decimals
+    area = np.round(rng.uniform(atlas.area[0], atlas.area[-1], n) * 10.0 ** decimals) / 10.0 ** decimals
+    records = [
+        (rng.choice(atlas.metadata["districts"]), rng.choice(atlas.metadata["seasons"]),
+         rng.choice(atlas.metadata["soils"]), rng.choice(atlas.metadata["crops"]))
+        for _ in range(n)
+    ]
+    live = predict(assembler.matrix(rainfall, area, [assembler.encode(*record) for record in records])).astype(float)
+
+    report = {"samples": n}
+    for mode in ("nearest", "interpolate"):
+        approx = np.array([
+            atlas.lookup(rainfall[i], area[i], *records[i], mode=mode) for i in range(n)
+        ])
+        error = np.abs(approx - live)
+        relative = error / np.maximum(np.abs(live), 1.0)
+        report[mode] = {
+            "abs_mean": round(float(error.mean()), 4),
+            "abs_p50": round(float(np.percentile(error, 50)), 4),
+            "abs_p95": round(float(np.percentile(error, 95)), 4),
+            "abs_max": round(float(error.max()), 4),
+            "rel_p50": round(float(np.percentile(relative, 50)), 5),
+            "rel_p95": round(float(np.percentile(relative, 95)), 5),
+            "rel_max": round(float(relative.max()), 5),
+        }
+    return report
+
+
+def lattice_axis(split_points, steps, low=0.0, margin=0.02):
+    """Evenly spaced axis from low to just past the last split point (predictions are flat beyond it)"""
+    high = float(split_points.max()) * (1 + margin) if len(split_points) else 1.0
+    return np.linspace(min(low, float(split_points.min()) if len(split_points) else low), high, steps)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build or check the yield prediction atlas")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Precompute the atlas from the live yield model")
+    build.add_argument("--output", default="model/prediction_atlas.npy")
+    build.add_argument("--rainfall-steps", type=int, default=64)
+    build.add_argument("--area-steps", type=int, default=48)
+    build.add_argument("--check-samples", type=int, default=20000)
+    check = subparsers.add_parser("check", help="Measure atlas error against the live yield model")
+    check.add_argument("--atlas", default="model/prediction_atlas.npy")
+    check.add_argument("--samples", type=int, default=20000)
+    args = parser.parse_args()
+    if args.command == "build":
+        for option in ("rainfall_steps", "area_steps"):
+            if getattr(args, option) < 2:
+                parser.error(f"--{option.replace('_', '-')} must be at least 2")
+
+    # Only the yield model is needed; skip the eager load of everything else
+    os.environ.setdefault("MODEL_LOAD_MODE", "lazy")
+    os.environ.setdefault("PREDICTION_ATLAS_MODE", "off")
+    import app
+
+    if args.command == "build":
+        assembler = app.models.get("assembler")
+        split_points = app.raw_split_points()
+        metadata = build_atlas(
+            args.output, assembler, app.predict_grid_production,
+            lattice_axis(split_points.get(0, np.empty(0)), args.rainfall_steps),
+            lattice_axis(split_points.get(1, np.empty(0)), args.area_steps),
+            booster_fingerprint(app.models.get("yield_booster")),
+        )
+        if args.check_samples:
+            atlas = PredictionAtlas(args.output)
+            metadata["error_check"] = check_atlas(atlas, assembler, app.predict_production, args.check_samples)
+            with open(metadata_path(args.output), "w") as f:
+                json.dump(metadata, f, indent=2)
+        print(json.dumps({key: metadata[key] for key in ("build_seconds", "error_check") if key in metadata}, indent=2))
+        print(f"Wrote {args.output} ({os.path.getsize(args.output) / 2**20:.1f} MiB)")
+
+    elif args.command == "check":
+        atlas = PredictionAtlas(args.atlas)
+        print(json.dumps(check_atlas(atlas, app.models.get("assembler"), app.predict_production, args.samples), indent=2))
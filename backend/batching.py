@@ -0,0 +1,160 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class _Pending:
+    __slots__ = ("row", "future", "enqueued_at")
+
+    def __init__(self, row):
+        self.row = row
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into one model call.
+
+    Request threads submit() a row and block; one scheduler thread takes the
+    oldest waiting row, keeps collecting until max_batch rows are queued or the
+    oldest has waited max_wait seconds, then runs predict() once on the stacked
+    matrix and hands each caller its value. If that call raises, the rows are
+    retried one at a time, so only the caller whose row fails gets the error.
+    If every in-flight caller is already in the batch, it runs at once rather
+    than waiting out max_wait, so a lone request isn't delayed. Only the scheduler thread calls the model, so its
+    internal threads aren't competing with each other per request.
+    The thread starts on first use (and again after a fork, in each worker).
+    """
+
+    def __init__(self, predict, max_batch=64, max_wait=0.002, name="batcher", window=1000):
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._inflight = 0
+        self._inflight_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=window)
+        self._queue_waits = deque(maxlen=window)
+        self._inference_times = deque(maxlen=window)
+        self.batches = 0
+        self.rows = 0
+        self.errors = 0
+        self.flush_reasons = {"full": 0, "max_wait": 0, "idle": 0}
+
+    def submit(self, row, timeout=None):
+        """Predict one feature row (copied, so the caller may reuse its buffer); returns the model output"""
+        self._ensure_started()
+        pending = _Pending(np.array(row, dtype=float).ravel())
+        with self._inflight_lock:
+            self._inflight += 1
+        try:
+            self._queue.put(pending)
+            return pending.future.result(timeout)
+        finally:
+            with self._inflight_lock:
+                self._inflight -= 1
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """
+        Block for the oldest row, then gather more until the batch is full, it
+        holds every in-flight request, or the oldest row has waited max_wait
+        """
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued_at + self.max_wait
+        while len(batch) < self.max_batch:
+            if len(batch) >= self._inflight:
+                return batch, "idle"
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                return batch, "max_wait"
+        return batch, "full"
+
+    def _run(self):
+        while True:
+            batch, reason = self._collect()
+            started = time.perf_counter()
+            try:
+                outputs = self.predict(np.stack([pending.row for pending in batch]))
+            except Exception as e:
+                if len(batch) == 1:
+                    self._fail(batch[0], e)
+                    continue
+                # Retry row by row, so a bad row fails only its own caller
+                outputs = []
+                for pending in batch:
+                    try:
+                        outputs.append(self.predict(pending.row[np.newaxis])[0])
+                    except Exception as row_error:
+                        self._fail(pending, row_error)
+                        outputs.append(None)
+            finished = time.perf_counter()
+            for pending, output in zip(batch, outputs):
+                if not pending.future.done():
+                    pending.future.set_result(output)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.rows += len(batch)
+                self.flush_reasons[reason] += 1
+                self._batch_sizes.append(len(batch))
+                self._inference_times.append(finished - started)
+                self._queue_waits.extend(started - pending.enqueued_at for pending in batch)
+
+    def _fail(self, pending, error):
+        with self._stats_lock:
+            self.errors += 1
+        pending.future.set_exception(error)
+
+    def stats(self):
+        def percentiles_ms(values):
+            if not values:
+                return None
+            values = np.array(values) * 1000
+            return {
+                "p50": round(float(np.percentile(values, 50)), 3),
+                "p95": round(float(np.percentile(values, 95)), 3),
+                "max": round(float(values.max()), 3),
+            }
+
+        with self._stats_lock:
+            sizes = list(self._batch_sizes)
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "rows": self.rows,
+                "errors": self.errors,
+                "flush_reasons": dict(self.flush_reasons),
+                "batch_size": {
+                    "mean": round(float(np.mean(sizes)), 2),
+                    "p50": float(np.percentile(sizes, 50)),
+                    "max": int(max(sizes)),
+                } if sizes else None,
+                "queue_wait_ms": percentiles_ms(self._queue_waits),
+                "inference_ms": percentiles_ms(self._inference_times),
+            }
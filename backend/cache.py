@@ -0,0 +1,600 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import unquote, urlparse
+
+from singleflight import SingleFlight
+
+
+EVICTION_POLICIES = ("lru", "fifo")
+CACHE_BACKENDS = ("memory", "sqlite", "redis")
+
+# Bump when the key or value encoding below changes, so old shared entries are ignored
+KEY_VERSION = 1
+
+
+class LRUCache:
+    """
+    Thread-safe bounded in-process cache.
+
+    Entries are evicted by least-recent use ("lru") or insertion order ("fifo")
+    once max_size is reached, and optionally expire ttl seconds after being set.
+    Hit/miss/eviction counters are kept so the cache can be sized from /cache/stats.
+    """
+
+    def __init__(self, max_size=1024, ttl=None, policy="lru"):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy '{policy}' (expected one of {EVICTION_POLICIES})")
+        self.max_size = max_size
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.policy = policy
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            if self.policy == "lru":
+                self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store value under key, evicting the oldest entry when full"""
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (value, expires_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_many(self, keys):
+        """Cached values for keys, in order, with None for misses"""
+        return [self.get(key) for key in keys]
+
+    def set_many(self, items):
+        for key, value in items:
+            self.set(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Counters for sizing the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "policy": self.policy,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def encode_key(namespace, key):
+    """
+    Shared-backend key: "<namespace>:v<KEY_VERSION>:<key as compact JSON>". Key tuples
+    hold str/float/int parts; floats are written with repr precision, so distinct
+    inputs never collide and every worker derives the same string.
+    """
+    return f"{namespace}:v{KEY_VERSION}:" + json.dumps(key, separators=(",", ":"), ensure_ascii=False)
+
+
+def _json_default(value):
+    # NumPy arrays and scalars (cached probability rows, float32 predictions)
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Cannot cache a {type(value).__name__}")
+
+
+def encode_value(value):
+    """Shared-backend value encoding: compact JSON, arrays as lists, tuples as lists"""
+    return json.dumps(value, separators=(",", ":"), default=_json_default)
+
+
+def decode_value(data):
+    return json.loads(data)
+
+
+class SharedCache:
+    """
+    Base for caches stored outside the process (see SQLiteCache, RedisCache).
+
+    Same get/set/get_many/set_many/stats interface as LRUCache, with keys and values
+    encoded by encode_key()/encode_value(), so every worker reads what any other
+    wrote. Values come back as decoded JSON (lists, not tuples or arrays). Backend
+    errors are counted and treated as misses, and the store is then skipped for
+    retry_interval seconds, so an unavailable store costs requests the uncached
+    path but never fails or stalls them.
+    """
+
+    backend = None
+
+    def __init__(self, namespace, ttl=None, retry_interval=5.0):
+        self.namespace = namespace
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.skipped = 0
+        self._failing = False
+        self._retry_at = 0.0
+
+    def get(self, key, default=None):
+        value = self.get_many([key])[0]
+        return default if value is None else value
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def get_many(self, keys):
+        """Cached values for keys, in order, with None for misses"""
+        if not keys:
+            return []
+        found = [None] * len(keys)
+        if self._available():
+            try:
+                found = self._get_encoded([encode_key(self.namespace, key) for key in keys])
+                self._record_success()
+            except Exception as e:
+                self._record_error("read", e)
+        values = [decode_value(data) if data is not None else None for data in found]
+        hits = sum(value is not None for value in values)
+        with self._lock:
+            self.hits += hits
+            self.misses += len(values) - hits
+        return values
+
+    def set_many(self, items):
+        if not items or not self._available():
+            return
+        try:
+            self._set_encoded([(encode_key(self.namespace, key), encode_value(value)) for key, value in items])
+            self._record_success()
+        except Exception as e:
+            self._record_error("write", e)
+
+    def _available(self):
+        if not self._failing or time.monotonic() >= self._retry_at:
+            return True
+        with self._lock:
+            self.skipped += 1
+        return False
+
+    def _record_success(self):
+        if self._failing:
+            self._failing = False
+            print(f"[Cache] {self.backend} cache '{self.namespace}' recovered")
+
+    def _record_error(self, operation, error):
+        with self._lock:
+            self.errors += 1
+        self._retry_at = time.monotonic() + self.retry_interval
+        if not self._failing:
+            self._failing = True
+            print(f"[Cache] {self.backend} cache '{self.namespace}' {operation} failed, serving uncached: {error}")
+
+    def _get_encoded(self, keys):
+        raise NotImplementedError
+
+    def _set_encoded(self, items):
+        raise NotImplementedError
+
+    def size(self):
+        return None
+
+    def stats(self):
+        try:
+            size = self.size()
+        except Exception:
+            size = None
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend,
+                "namespace": self.namespace,
+                "size": size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "skipped_while_failing": self.skipped,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+class SQLiteCache(SharedCache):
+    """
+    Cache in a SQLite file shared by the worker processes on one host.
+
+    WAL journaling lets readers proceed while one worker writes. Entries expire
+    ttl seconds after being set; each namespace is trimmed back to max_size
+    (oldest writes first) every prune_every writes, so it can briefly exceed it.
+    Counters are per process.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path, namespace, max_size=1024, ttl=None, prune_every=256, timeout=5.0):
+        super().__init__(namespace, ttl)
+        self.path = path
+        self.max_size = max_size
+        self.prune_every = prune_every
+        self.timeout = timeout
+        self.evictions = 0
+        self._writes = 0
+        self._local = threading.local()
+        self._connection()  # create the schema (and fail fast on a bad path) at startup
+
+    def _connection(self):
+        # sqlite3 connections belong to one thread and must not cross a fork
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, value TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, expires_at REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS cache_namespace_stored ON cache (namespace, stored_at)")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def _get_encoded(self, keys):
+        connection = self._connection()
+        now = time.time()
+        found = {}
+        for start in range(0, len(keys), 500):  # stay under SQLite's bound-parameter limit
+            chunk = keys[start:start + 500]
+            rows = connection.execute(
+                f"SELECT key, value, expires_at FROM cache WHERE key IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for key, value, expires_at in rows:
+                if expires_at is None or expires_at > now:
+                    found[key] = value
+        return [found.get(key) for key in keys]
+
+    def _set_encoded(self, items):
+        connection = self._connection()
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl else None
+        connection.executemany(
+            "INSERT OR REPLACE INTO cache (key, namespace, value, stored_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            [(key, self.namespace, value, now, expires_at) for key, value in items]
+        )
+        with self._lock:
+            self._writes += len(items)
+            prune = self._writes >= self.prune_every
+            if prune:
+                self._writes = 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """Drop expired entries and trim the namespace to its newest max_size"""
+        connection = self._connection()
+        expired = connection.execute(
+            "DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (self.namespace, time.time())
+        ).rowcount
+        trimmed = connection.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache WHERE namespace = ? "
+            "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)", (self.namespace, self.max_size)
+        ).rowcount
+        with self._lock:
+            self.evictions += expired + trimmed
+
+    def size(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)
+        ).fetchone()[0]
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(path=self.path, max_size=self.max_size, evictions=self.evictions)
+        return stats
+
+
+class RedisError(Exception):
+    """Error reply from a Redis server"""
+
+
+class RedisConnection:
+    """
+    Minimal blocking Redis client: one socket, RESP2 commands, no pipelining
+    beyond what execute() is given. Enough for GET/SET/MGET against Redis or
+    any server speaking its protocol.
+    """
+
+    def __init__(self, host="localhost", port=6379, db=0, password=None, timeout=1.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        if password:
+            self.execute(("AUTH", password))
+        if db:
+            self.execute(("SELECT", db))
+
+    @staticmethod
+    def _encode(command):
+        parts = [f"*{len(command)}\r\n".encode()]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Redis connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RedisError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            length = int(body)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            if len(data) != length + 2:
+                raise ConnectionError("Redis connection closed")
+            return data[:-2]
+        if kind == b"*":
+            length = int(body)
+            return None if length < 0 else [self._read_reply() for _ in range(length)]
+        raise ConnectionError(f"Unexpected Redis reply {line!r}")
+
+    def execute(self, *commands):
+        """Send every command in one write and return their replies (one reply for one command)"""
+        self.sock.sendall(b"".join(self._encode(command) for command in commands))
+        replies = [self._read_reply() for _ in commands]
+        return replies[0] if len(commands) == 1 else replies
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisCache(SharedCache):
+    """
+    Cache in Redis (or a protocol-compatible server), shared by every worker on
+    every host. Entries expire ttl seconds after being set; size is bounded by
+    the server's maxmemory policy. One connection per thread, reopened after a
+    fork or an error. Counters are per process.
+    """
+
+    backend = "redis"
+
+    def __init__(self, url, namespace, ttl=None, timeout=1.0):
+        super().__init__(namespace, ttl)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _execute(self, *commands):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = RedisConnection(self.host, self.port, self.db, self.password, self.timeout)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        try:
+            return connection.execute(*commands)
+        except (OSError, ConnectionError):
+            connection.close()
+            self._local.connection = None
+            raise
+
+    def _get_encoded(self, keys):
+        return self._execute(("MGET", *keys))
+
+    def _set_encoded(self, items):
+        expiry = ("PX", int(self.ttl * 1000)) if self.ttl else ()
+        replies = self._execute(*[("SET", key, value, *expiry) for key, value in items])
+        if len(items) == 1:
+            replies = [replies]
+        for reply in replies:
+            if reply != "OK":
+                raise RedisError(f"SET returned {reply!r}")
+
+    def stats(self):
+        stats = super().stats()
+        stats.update(url=f"redis://{self.host}:{self.port}/{self.db}")
+        return stats
+
+
+def make_cache(url, namespace, max_size=1024, ttl=None, policy="lru"):
+    """
+    Cache for one namespace on the backend named by url:
+      memory                - in-process LRUCache, one per worker (max_size, ttl, policy)
+      sqlite:///path        - SQLiteCache, shared by the workers on one host (max_size, ttl);
+                              relative path, or sqlite:////abs/path for an absolute one
+      redis://host:port/db  - RedisCache, shared across hosts (ttl)
+    """
+    scheme = urlparse(url).scheme if "://" in url else url
+    if scheme == "memory":
+        return LRUCache(max_size, ttl=ttl, policy=policy)
+    if scheme == "sqlite":
+        return SQLiteCache(url[len("sqlite:///"):], namespace, max_size=max_size, ttl=ttl)
+    if scheme == "redis":
+        return RedisCache(url, namespace, ttl=ttl)
+    raise ValueError(f"Unknown cache backend '{url}' (expected one of {CACHE_BACKENDS})")
+
+
+def quantize(value, step):
+    """
+    Snap value to the nearest multiple of step (no-op when step is 0/None).
+    The snapped value differs from the input by at most step / 2.
+    """
+    if not step:
+        return value
+    return round(value / step) * step
+
+
+class StaleWhileRevalidateCache:
+    """
+    TTL cache for slow upstream data with stale-while-revalidate semantics.
+
+    get() returns (value, status) where status is:
+      "fresh" - entry younger than ttl, served from the store
+      "stale" - entry expired less than stale_ttl ago; served from the store while a
+                background thread reloads it
+      "miss"  - no usable entry; loaded synchronously (loader errors propagate)
+
+    Entries live in store (an in-process LRUCache of max_size by default, or a
+    make_cache() backend shared between workers) as (value, loaded_at) with
+    wall-clock load times, so every process sharing the store ages them alike.
+    Stale entries are kept until the store evicts or expires them (peek()).
+
+    Loads go through a SingleFlight, so concurrent misses (and a background
+    refresh) for one key make a single loader call and share its result or error.
+    """
+
+    def __init__(self, loader, ttl, stale_ttl=0, max_size=1024, name="cache", store=None):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self.store = store if store is not None else LRUCache(max_size)
+        self.flights = SingleFlight(name)
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    def get(self, key):
+        value, status = self.lookup(key)
+        if status == "miss":
+            return self.refresh(key), "miss"
+        return value, status
+
+    def lookup(self, key):
+        """Like get(), but returns (None, "miss") instead of loading missing keys"""
+        entry = self.store.get(key)
+        with self._lock:
+            if entry is not None:
+                value, loaded_at = entry
+                age = time.time() - loaded_at
+                if age < self.ttl:
+                    self.hits += 1
+                    return value, "fresh"
+                if age < self.ttl + self.stale_ttl:
+                    self.stale_hits += 1
+                    self._schedule_refresh(key)
+                    return value, "stale"
+            self.misses += 1
+        return None, "miss"
+
+    def peek(self, key):
+        """Return the last loaded value for key regardless of age, or None"""
+        entry = self.store.get(key)
+        return entry[0] if entry is not None else None
+
+    def age(self, key):
+        """Seconds since key was loaded, or None if it is not cached"""
+        entry = self.store.get(key)
+        return time.time() - entry[1] if entry is not None else None
+
+    def refresh(self, key):
+        """Load key synchronously and store the result, joining a load already in flight"""
+        return self.flights.do(key, lambda: self._load(key))
+
+    def _load(self, key):
+        value = self.loader(key)
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        """Store a value loaded outside the cache (e.g. by a bulk fetch)"""
+        self.store.set(key, (value, time.time()))
+        with self._lock:
+            self.refreshes += 1
+
+    def record_refresh_error(self):
+        with self._lock:
+            self.refresh_errors += 1
+
+    def _schedule_refresh(self, key):
+        # Called with the lock held; at most one background refresh per key
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        threading.Thread(target=self._background_refresh, args=(key,), daemon=True).start()
+
+    def _background_refresh(self, key):
+        try:
+            self.refresh(key)
+        except Exception as e:
+            self.record_refresh_error()
+            print(f"[{self.name}] Background refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def stats(self):
+        store = self.store.stats()
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "size": store.get("size"),
+                "max_size": store.get("max_size"),
+                "ttl_seconds": self.ttl,
+                "stale_ttl_seconds": self.stale_ttl,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "evictions": store.get("evictions"),
+                "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+                "store": store,
+                "single_flight": self.flights.stats(),
+            }
@@ -0,0 +1,206 @@
+import math
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+# orjson is optional: without it the stdlib json module does the encoding and decoding
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider (request.get_json, jsonify) backed by orjson when it is
+    installed, which decodes and encodes several times faster than the stdlib.
+    Output matches the default provider: sorted keys, compact unless debugging,
+    and dates/other types through its default().
+    """
+
+    if orjson is not None:
+        OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+                   | orjson.OPT_PASSTHROUGH_DATETIME)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def encode(self, obj, indent=False):
+        """obj as compact (or indented) UTF-8 JSON bytes"""
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=self.default,
+                                    option=self.OPTIONS | (orjson.OPT_INDENT_2 if indent else 0))
+            except orjson.JSONEncodeError:
+                pass  # e.g. integers beyond 64 bits; the stdlib handles them
+        if indent:
+            return super().dumps(obj, indent=2).encode()
+        return super().dumps(obj, separators=(",", ":")).encode()
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.encode(obj).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.encode(obj, indent=indent) + b"\n", mimetype=self.mimetype)
+
+
+class ValidationError(ValueError):
+    """A request body that doesn't match its schema; fields maps each bad field to the problem"""
+
+    def __init__(self, fields, message=None):
+        self.fields = fields
+        super().__init__(message or "; ".join(f"{name} {problem}" for name, problem in fields.items()))
+
+    def to_dict(self):
+        return {"error": str(self), "fields": self.fields}
+
+
+# Converters: each returns the typed value or raises ValueError saying what the value must be
+
+def number(minimum=None, maximum=None):
+    """Finite int/float (or numeric string), as float"""
+    def convert(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError("must be a number")
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError("must be a number") from None
+        if not math.isfinite(value):
+            raise ValueError("must be a finite number")
+        if minimum is not None and value < minimum:
+            raise ValueError(f"must be at least {minimum}")
+        if maximum is not None and value > maximum:
+            raise ValueError(f"must be at most {maximum}")
+        return value
+    return convert
+
+
+def integer(minimum, maximum):
+    """JSON integer within [minimum, maximum]"""
+    def convert(value):
+        if isinstance(value, bool) or not isinstance(value, int) or not minimum <= value <= maximum:
+            raise ValueError(f"must be an integer between {minimum} and {maximum}")
+        return value
+    return convert
+
+
+def string(strip=False):
+    def convert(value):
+        if not isinstance(value, str):
+            raise ValueError("must be a string")
+        return value.strip() if strip else value
+    return convert
+
+
+def choice(values):
+    """One of values; a callable is called per request (for sets known only once models load)"""
+    def convert(value):
+        allowed = values() if callable(values) else values
+        if not isinstance(value, str) or value not in allowed:
+            if len(allowed) <= 10:
+                raise ValueError(f"must be one of {list(allowed)}")
+            raise ValueError(f"has unknown value {value!r}")
+        return value
+    return convert
+
+
+def iso_date(value):
+    """'YYYY-MM-DD' string, as datetime.date"""
+    if isinstance(value, str) and len(value) == 10:
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    raise ValueError("must be a date in YYYY-MM-DD format")
+
+
+def boolean(value):
+    if not isinstance(value, bool):
+        raise ValueError("must be true or false")
+    return value
+
+
+def mapping(value):
+    if not isinstance(value, dict):
+        raise ValueError("must be an object")
+    return value
+
+
+def any_value(value):
+    """Any JSON value, left to the route to check (e.g. batch records, validated one by one)"""
+    return value
+
+
+def list_of(convert, max_items):
+    def convert_list(values):
+        if not isinstance(values, list):
+            raise ValueError("must be a list")
+        if len(values) > max_items:
+            raise ValueError(f"must have at most {max_items} items")
+        try:
+            return [convert(value) for value in values]
+        except ValueError as e:
+            raise ValueError(f"items {e}") from None
+    return convert_list
+
+
+class Field:
+    """A schema entry: its converter, and whether it is required or else its default"""
+
+    def __init__(self, convert, required=True, default=None):
+        self.convert = convert
+        self.required = required
+        self.default = default
+
+
+def optional(convert, default=None):
+    return Field(convert, required=False, default=default)
+
+
+class Schema:
+    """
+    Typed request body: name -> converter (required) or Field. Compiled once into
+    a tuple walked by load(), which returns a dict with every schema field converted
+    (optional ones absent or null get their default) and ignores unknown fields.
+    Every bad field is reported at once through ValidationError.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(
+            (name, field if isinstance(field, Field) else Field(field)) for name, field in fields.items()
+        )
+
+    def load(self, data, what="Request body"):
+        """Converted fields of data; what names it in the error when data isn't an object"""
+        if not isinstance(data, dict):
+            raise ValidationError({}, f"{what} must be a JSON object")
+        values, errors, missing = {}, {}, {}
+        for name, field in self.fields:
+            value = data.get(name)
+            if value is None:
+                if field.required:
+                    missing[name] = "is required"
+                else:
+                    values[name] = field.default
+                continue
+            try:
+                values[name] = field.convert(value)
+            except ValueError as e:
+                errors[name] = str(e)
+        if missing:
+            raise ValidationError({**missing, **errors}, "Missing fields in request")
+        if errors:
+            raise ValidationError(errors)
+        return values
+
+    def load_request(self, request):
+        """load() the JSON body of a Flask request (a malformed body fails like a non-object one)"""
+        return self.load(request.get_json(silent=True))
+
@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+
+from werkzeug.wrappers import Response
+
+# brotli is optional: without it responses are offered as gzip only
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# Per-response (dynamic) compression trades a few percent of size for much less CPU
+DYNAMIC_GZIP_LEVEL = 6
+DYNAMIC_BROTLI_QUALITY = 4
+
+# Media types worth compressing; images, fonts and archives are already compressed
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/manifest+json", "image/svg+xml",
+    "image/x-icon", "image/vnd.microsoft.icon",
+)
+
+
+def available_encodings():
+    """Content-Encodings this process can produce, best first"""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def compressible(content_type):
+    return content_type is not None and content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(body, encoding, dynamic=False):
+    """body in encoding, at maximum compression or, when dynamic, at a cheaper per-response level"""
+    if encoding == "gzip":
+        # mtime=0 keeps the bytes (and their ETag) identical across processes and restarts
+        return gzip.compress(body, compresslevel=DYNAMIC_GZIP_LEVEL if dynamic else GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=DYNAMIC_BROTLI_QUALITY if dynamic else BROTLI_QUALITY)
+    raise ValueError(f"Unsupported encoding '{encoding}'")
+
+
+def compress_response(response, accept_encodings, min_bytes):
+    """
+    Compress a buffered response in place with the encoding the client prefers
+    (highest q-value, then ours), when its body is compressible and at least
+    min_bytes. Responses that carry an ETag or a Content-Encoding already
+    negotiated their own variant.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers or "ETag" in response.headers
+            or not compressible(response.mimetype)):
+        return response
+    body = response.get_data()
+    if len(body) < min_bytes:
+        return response
+    response.vary.add("Accept-Encoding")
+    accepted = [encoding for encoding in available_encodings() if accept_encodings[encoding] > 0]
+    if accepted:
+        # Highest q-value; max() keeps the first, i.e. the best, of equal ones
+        encoding = max(accepted, key=lambda encoding: accept_encodings[encoding])
+        encoded = compress(body, encoding, dynamic=True)
+        if len(encoded) < len(body):
+            response.set_data(encoded)
+            response.headers["Content-Encoding"] = encoding
+    return response
+
+
+class Precompressed:
+    """
+    A static response body encoded once, at maximum compression, instead of per
+    request: identity plus every available encoding that comes out smaller.
+    encoded supplies variants compressed ahead of time (e.g. .br files written at
+    build time, usable without the brotli package); encodings limits the ones
+    compressed here, and () keeps an incompressible body identity-only.
+
+    Each variant has its own strong ETag built from the body's hash, so caches and
+    If-None-Match revalidation work per encoding. The hash also serves as the
+    body's version for cache-busting URLs.
+    """
+
+    def __init__(self, body, content_type="application/json", encoded=None, encodings=None):
+        self.content_type = content_type
+        self.version = hashlib.sha256(body).hexdigest()[:16]
+        self.variants = {"identity": (body, self.version)}  # encoding -> (bytes, etag)
+        encoded = dict(encoded or {})
+        for encoding in available_encodings() if encodings is None else encodings:
+            if encoding not in encoded:
+                encoded[encoding] = compress(body, encoding)
+        for encoding, data in encoded.items():
+            if len(data) < len(body):
+                self.variants[encoding] = (data, f"{self.version}-{encoding}")
+
+    @property
+    def body(self):
+        return self.variants["identity"][0]
+
+    def select(self, accept_encodings):
+        """
+        (encoding, bytes, etag) of the variant a werkzeug Accept-Encoding prefers:
+        the highest q-value, then the smallest; identity when none is accepted
+        """
+        accepted = [encoding for encoding in self.variants if encoding != "identity" and accept_encodings[encoding] > 0]
+        best = max(
+            accepted, key=lambda encoding: (accept_encodings[encoding], -len(self.variants[encoding][0])),
+            default="identity",
+        )
+        return (best, *self.variants[best])
+
+    def response(self, request, cache_control):
+        """The negotiated variant, or 304 Not Modified when the client's If-None-Match has its ETag"""
+        encoding, body, etag = self.select(request.accept_encodings)
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, content_type=self.content_type)
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = cache_control
+        if len(self.variants) > 1:
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    def sizes(self):
+        return {encoding: len(body) for encoding, (body, _) in self.variants.items()}
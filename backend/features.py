@@ -0,0 +1,164 @@
+import threading
+
+import numpy as np
+
+
+class FeatureAssembler:
+    """
+    Precompiled feature assembly for the crop yield model.
+
+    Built once at startup from the fitted ordinal encoders and StandardScaler.
+    Categorical inputs become dict lookups, the crop one-hot is set through a
+    precomputed column index and scaling is a plain NumPy affine transform, so
+    the request path needs neither pandas nor sklearn. The output is
+    bit-identical to encoder.transform -> pd.DataFrame -> scaler.transform.
+    """
+
+    # Columns ahead of the crop one-hot block: Rainfall, Area, District, Season, Soil
+    NUMERIC_COLUMNS = 5
+
+    def __init__(self, encoder_district, encoder_season, encoder_soil, scaler, crop_categories):
+        self.district_codes = {name: float(code) for code, name in enumerate(encoder_district.categories_[0])}
+        self.season_codes = {name: float(code) for code, name in enumerate(encoder_season.categories_[0])}
+        self.soil_codes = {name: float(code) for code, name in enumerate(encoder_soil.categories_[0])}
+
+        # "Rice" -> column of Crop_Rice in the feature matrix
+        self.crop_columns = {
+            category[len("Crop_"):]: self.NUMERIC_COLUMNS + i
+            for i, category in enumerate(crop_categories)
+        }
+        self.n_features = self.NUMERIC_COLUMNS + len(crop_categories)
+
+        # StandardScaler stores mean_/scale_ as None when centering/scaling is disabled;
+        # scaler=None assembles raw features (for models with the scaler folded in)
+        self.mean = np.array(scaler.mean_, dtype=float) if scaler is not None and scaler.with_mean else None
+        self.scale = np.array(scaler.scale_, dtype=float) if scaler is not None and scaler.with_std else None
+
+        # Per-thread preallocated row buffer for single predictions
+        self._local = threading.local()
+
+    def encode(self, district, season, soil, crop):
+        """
+        Encode one record's categorical inputs.
+        Returns (district_code, season_code, soil_code, crop_column); crop_column is
+        None for crops outside the model's categories (all one-hot columns stay 0).
+        Raises ValueError for unknown district, season or soil values.
+        """
+        district_code = self.district_codes.get(district)
+        if district_code is None:
+            raise ValueError(f"Unknown district '{district}'")
+        season_code = self.season_codes.get(season)
+        if season_code is None:
+            raise ValueError(f"Unknown season '{season}'")
+        soil_code = self.soil_codes.get(soil)
+        if soil_code is None:
+            raise ValueError(f"Unknown soil quality '{soil}'")
+        return district_code, season_code, soil_code, self.crop_columns.get("" if crop is None else str(crop))
+
+    def row(self, rainfall, area, district, season, soil, crop):
+        """
+        Return the scaled (1, n_features) input for a single record.
+        The array is a per-thread buffer reused by the next call on the same thread.
+        """
+        district_code, season_code, soil_code, crop_column = self.encode(district, season, soil, crop)
+
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None:
+            buffer = self._local.buffer = np.empty((1, self.n_features))
+        features = buffer[0]
+        features[:] = 0.0
+        features[0] = finite_float(rainfall, "Rainfall")
+        features[1] = finite_float(area, "Area")
+        features[2] = district_code
+        features[3] = season_code
+        features[4] = soil_code
+        if crop_column is not None:
+            features[crop_column] = 1.0
+        return self.transform(buffer, out=buffer)
+
+    def matrix(self, rainfall, area, codes):
+        """
+        Return the scaled (N, n_features) input for N records.
+        rainfall and area are float arrays, codes is a list of encode() results.
+        """
+        n = len(codes)
+        features = np.zeros((n, self.n_features))
+        features[:, 0] = rainfall
+        features[:, 1] = area
+        if n:
+            features[:, 2:5] = [code[:3] for code in codes]
+            crop_rows = [i for i, code in enumerate(codes) if code[3] is not None]
+            features[crop_rows, [codes[i][3] for i in crop_rows]] = 1.0
+        return self.transform(features, out=features)
+
+    def crop_variants(self, rainfall, area, district, season, soil):
+        """
+        Return (crops, features): one scaled row per crop category for the same field,
+        differing only in the crop one-hot, in crop_categories order.
+        """
+        district_code, season_code, soil_code, _ = self.encode(district, season, soil, None)
+        crops = list(self.crop_columns)
+        features = np.zeros((len(crops), self.n_features))
+        features[:, 0] = finite_float(rainfall, "Rainfall")
+        features[:, 1] = finite_float(area, "Area")
+        features[:, 2] = district_code
+        features[:, 3] = season_code
+        features[:, 4] = soil_code
+        features[np.arange(len(crops)), list(self.crop_columns.values())] = 1.0
+        return crops, self.transform(features, out=features)
+
+    def grid(self, rainfall_values, area_values, district, season, soil, crop):
+        """
+        Return the scaled input for every (rainfall, area) pair of one field and crop,
+        shape (len(rainfall_values) * len(area_values), n_features), rainfall-major.
+        """
+        district_code, season_code, soil_code, crop_column = self.encode(district, season, soil, crop)
+        rainfall, area = np.meshgrid(rainfall_values, area_values, indexing="ij")
+        features = np.zeros((rainfall.size, self.n_features))
+        features[:, 0] = rainfall.ravel()
+        features[:, 1] = area.ravel()
+        features[:, 2] = district_code
+        features[:, 3] = season_code
+        features[:, 4] = soil_code
+        if crop_column is not None:
+            features[:, crop_column] = 1.0
+        return self.transform(features, out=features)
+
+    def random_matrix(self, n, rainfall_range=(0, 5000), area_range=(0, 500), seed=0):
+        """
+        Unscaled (n, n_features) matrix of random valid inputs, for checking compiled
+        models against the originals. Rainfall/Area are drawn uniformly and rounded
+        to a mix of 0-3 decimals; categorical codes and crop one-hots cover every value.
+        """
+        rng = np.random.default_rng(seed)
+        features = np.zeros((n, self.n_features))
+        decimals = rng.integers(0, 4, n)
+        features[:, 0] = np.round(rng.uniform(*rainfall_range, n) * 10.0 ** decimals) / 10.0 ** decimals
+        features[:, 1] = np.round(rng.uniform(*area_range, n) * 10.0 ** decimals) / 10.0 ** decimals
+        features[:, 2] = rng.integers(0, len(self.district_codes), n)
+        features[:, 3] = rng.integers(0, len(self.season_codes), n)
+        features[:, 4] = rng.integers(0, len(self.soil_codes), n)
+        crop_columns = rng.integers(self.NUMERIC_COLUMNS - 1, self.n_features, n)  # NUMERIC_COLUMNS - 1 = no crop
+        has_crop = crop_columns >= self.NUMERIC_COLUMNS
+        features[np.flatnonzero(has_crop), crop_columns[has_crop]] = 1.0
+        return features
+
+    def transform(self, features, out=None):
+        """Apply the StandardScaler affine map, matching sklearn's operation order"""
+        if out is None:
+            out = features.copy()
+        elif out is not features:
+            out[...] = features
+        if self.mean is not None:
+            np.subtract(out, self.mean, out=out)
+        if self.scale is not None:
+            np.divide(out, self.scale, out=out)
+        return out
+
+
+def finite_float(value, field):
+    """Cast a numeric input to float, rejecting NaN and infinity like the scaler does"""
+    value = float(value)
+    if not np.isfinite(value):
+        raise ValueError(f"{field} must be a finite number")
+    return value
@@ -0,0 +1,70 @@
+import math
+import threading
+from collections import defaultdict
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class ReferencePointIndex:
+    """
+    Nearest named reference point within radius_km of a coordinate.
+
+    Points are bucketed into a lat/lon grid whose cells are radius_km tall, so a
+    lookup only measures (haversine) the points in the cells that the search
+    circle can reach: the 3 cell rows around the query and as many columns as the
+    radius spans at that latitude. Lookups are O(1) in the number of points.
+    """
+
+    def __init__(self, points, radius_km):
+        if radius_km <= 0:
+            raise ValueError("radius_km must be positive")
+        self.radius_km = radius_km
+        self.cell_degrees = radius_km / KM_PER_DEGREE_LAT
+        self.points = {name: (float(lat), float(lon)) for name, (lat, lon) in points.items()}
+        self._cells = defaultdict(list)  # (row, column) -> [(name, lat, lon), ...]
+        for name, (lat, lon) in self.points.items():
+            self._cells[self._cell(lat, lon)].append((name, lat, lon))
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.matched = 0
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def nearest(self, lat, lon):
+        """(name, (lat, lon), distance_km) of the closest point within radius_km, or None"""
+        row, column = self._cell(lat, lon)
+        # A degree of longitude shrinks with cos(latitude); widen the column span to match
+        cos_lat = max(math.cos(math.radians(min(abs(lat) + self.cell_degrees, 90.0))), 1e-6)
+        column_span = math.ceil(1 / cos_lat)
+        best = None
+        for r in range(row - 1, row + 2):
+            for c in range(column - column_span, column + column_span + 1):
+                for name, point_lat, point_lon in self._cells.get((r, c), ()):
+                    distance = haversine_km(lat, lon, point_lat, point_lon)
+                    if distance <= self.radius_km and (best is None or distance < best[2]):
+                        best = (name, (point_lat, point_lon), distance)
+        with self._lock:
+            self.lookups += 1
+            self.matched += best is not None
+        return best
+
+    def stats(self):
+        with self._lock:
+            return {
+                "points": len(self.points),
+                "radius_km": self.radius_km,
+                "lookups": self.lookups,
+                "matched": self.matched,
+                "match_rate": round(self.matched / self.lookups, 4) if self.lookups else 0.0,
+            }
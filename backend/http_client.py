@@ -0,0 +1,147 @@
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(Exception):
+    """The upstream's circuit breaker is open; the call was not attempted"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} circuit open, retrying in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed    - calls go through; failure_threshold failures in a row open it
+    open      - calls fail fast for reset_timeout seconds
+    half_open - one trial call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return 0 if a call may proceed, else seconds until the next trial call"""
+        with self._lock:
+            if self.state == "closed":
+                return 0
+            elapsed = time.monotonic() - self.opened_at
+            if self.state == "open" and elapsed >= self.reset_timeout:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return 0
+            return max(self.reset_timeout - elapsed, 0.001)
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    """
+    Shared outbound HTTP client for one upstream service.
+
+    Uses a pooled keep-alive session (at most pool_size connections; callers wait for
+    a free one), separate connect/read timeouts and a circuit breaker, and records
+    per-upstream request, error and latency metrics. Connection errors, timeouts and
+    5xx responses count as failures; 4xx responses do not.
+    """
+
+    def __init__(self, name, base_url, pool_size=10, connect_timeout=3.05, read_timeout=10,
+                 failure_threshold=5, reset_timeout=30, latency_window=1000):
+        self.name = name
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=latency_window)
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.rejected = 0
+
+    def get(self, path="", params=None):
+        """GET base_url + path; raises CircuitOpenError without calling out while the circuit is open"""
+        retry_in = self.breaker.allow()
+        if retry_in:
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpenError(self.name, retry_in)
+
+        start = time.perf_counter()
+        try:
+            response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            self._record(time.perf_counter() - start, error=True, timeout=isinstance(e, requests.exceptions.Timeout))
+            self.breaker.record_failure()
+            raise
+
+        failed = response.status_code >= 500
+        self._record(time.perf_counter() - start, error=failed)
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _record(self, elapsed, error=False, timeout=False):
+        with self._lock:
+            self.requests += 1
+            self.errors += error
+            self.timeouts += timeout
+            self._latencies.append(elapsed)
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = {
+                "base_url": self.base_url,
+                "circuit": self.breaker.state,
+                "circuit_opened": self.breaker.times_opened,
+                "consecutive_failures": self.breaker.failures,
+                "requests": self.requests,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "error_rate": round(self.errors / self.requests, 4) if self.requests else 0.0,
+            }
+        if latencies:
+            stats["latency_ms"] = {
+                "p50": round(latencies[len(latencies) // 2] * 1000, 2),
+                "p95": round(latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] * 1000, 2),
+                "max": round(latencies[-1] * 1000, 2),
+            }
+        return stats
@@ -0,0 +1,225 @@
+import hashlib
+import importlib
+import os
+import pickle
+import sys
+import threading
+import time
+
+
+LOAD_MODES = ("eager", "background", "lazy")
+
+# Stored for artifacts whose loader returned None (e.g. optional data that isn't
+# configured), so get() answers them from the lock-free fast path too
+_NONE = object()
+
+
+class ArtifactUnavailable(RuntimeError):
+    """An artifact whose last load failed recently; raised instead of retrying the load"""
+
+
+class ModelStore:
+    """
+    Registry of model artifacts, loaded on first use or all at once.
+
+    Each artifact is registered with a loader callable; get() loads it on demand
+    (once, thread-safe) so workers can boot and bind before the heavy imports and
+    unpickling happen. load_all() loads every artifact and runs the registered
+    warm-up inferences; with start_background_load() it runs in a daemon thread
+    and ready() reports when it has finished. Import and load times are recorded
+    per artifact for status(). A failed load is retried at most once every
+    retry_interval seconds; get() raises ArtifactUnavailable in between.
+    """
+
+    def __init__(self, model_dir="model", retry_interval=30):
+        self.model_dir = model_dir
+        self.retry_interval = retry_interval
+        self.created_at = time.perf_counter()
+        self._loaders = {}  # name -> (loader, required)
+        self._artifacts = {}
+        self._failures = {}  # name -> (time.monotonic() of the failed load, exception)
+        self._warmups = []  # (name, fn)
+        self._lock = threading.RLock()
+        self._ready = threading.Event()
+        self.load_seconds = {}
+        self.import_seconds = {}
+        self.warmup_seconds = {}
+        self.errors = {}
+        self.ready_after = None
+
+    def path(self, filename):
+        return os.path.join(self.model_dir, filename)
+
+    def register(self, name, loader, required=True):
+        """Register loader() as the source of artifact name"""
+        self._loaders[name] = (loader, required)
+
+    def add_warmup(self, name, fn):
+        """Run fn() after load_all() so the first real request doesn't pay first-call costs"""
+        self._warmups.append((name, fn))
+
+    def get(self, name):
+        """Return artifact name, loading it (and anything its loader needs) on first use"""
+        artifact = self._artifacts.get(name)
+        if artifact is None:
+            self._raise_recent_failure(name)
+            with self._lock:
+                artifact = self._artifacts.get(name)
+                if artifact is None:
+                    self._raise_recent_failure(name)
+                    artifact = self._load(name)
+        return None if artifact is _NONE else artifact
+
+    def _load(self, name):
+        loader, _ = self._loaders[name]
+        start = time.perf_counter()
+        try:
+            artifact = loader()
+        except Exception as e:
+            self.errors[name] = str(e)
+            self._failures[name] = (time.monotonic(), e)
+            raise
+        # Includes any dependencies first loaded on this artifact's behalf
+        self.load_seconds[name] = time.perf_counter() - start
+        artifact = _NONE if artifact is None else artifact
+        self._artifacts[name] = artifact
+        self._failures.pop(name, None)
+        self.errors.pop(name, None)
+        return artifact
+
+    def _raise_recent_failure(self, name):
+        failure = self._failures.get(name)
+        if failure is not None and time.monotonic() - failure[0] < self.retry_interval:
+            # A fresh exception each time; re-raising the stored one would grow its traceback
+            raise ArtifactUnavailable(f"{name} failed to load: {failure[1]}") from failure[1]
+
+    def release(self, name):
+        """Drop a loaded artifact (e.g. once compiled into another one); get() reloads it"""
+        with self._lock:
+            self._artifacts.pop(name, None)
+            self._failures.pop(name, None)
+
+    def fingerprint(self, *filenames):
+        """Short content hash of the given model files (missing ones skipped), for versioning cached results"""
+        digest = hashlib.sha256()
+        for filename in filenames:
+            if os.path.exists(self.path(filename)):
+                digest.update(filename.encode())
+                with open(self.path(filename), "rb") as f:
+                    digest.update(f.read())
+        return digest.hexdigest()[:12]
+
+    def import_module(self, module_name):
+        """Import a module, recording how long the first import took"""
+        if module_name in sys.modules:
+            return sys.modules[module_name]
+        start = time.perf_counter()
+        module = importlib.import_module(module_name)
+        self.import_seconds[module_name] = time.perf_counter() - start
+        return module
+
+    def load_all(self):
+        """Load every registered artifact and run the warm-ups; marks the store ready"""
+        for name, (_, required) in self._loaders.items():
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"[Model Store] Failed to load {name}: {e}")
+                if required:
+                    return False
+        for name, fn in self._warmups:
+            start = time.perf_counter()
+            try:
+                fn()
+            except Exception as e:
+                print(f"[Model Store] Warm-up {name} failed: {e}")
+            self.warmup_seconds[name] = time.perf_counter() - start
+        self.ready_after = time.perf_counter() - self.created_at
+        self._ready.set()
+        print(f"[Model Store] Ready after {self.ready_after:.2f}s")
+        return True
+
+    def start_background_load(self):
+        thread = threading.Thread(target=self.load_all, daemon=True)
+        thread.start()
+        return thread
+
+    def mark_ready(self):
+        """Report ready without loading anything (lazy mode: artifacts load on first use)"""
+        self.ready_after = time.perf_counter() - self.created_at
+        self._ready.set()
+
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        return self._ready.wait(timeout)
+
+    def status(self):
+        """Readiness plus per-artifact import/load/warm-up timings"""
+        return {
+            "ready": self.ready(),
+            "ready_after_seconds": round(self.ready_after, 3) if self.ready_after is not None else None,
+            "artifacts": {
+                name: {
+                    "loaded": name in self._artifacts,
+                    "required": required,
+                    "load_seconds": round(self.load_seconds[name], 4) if name in self.load_seconds else None,
+                    "error": self.errors.get(name),
+                }
+                for name, (_, required) in self._loaders.items()
+            },
+            "import_seconds": {name: round(seconds, 4) for name, seconds in self.import_seconds.items()},
+            "warmup_seconds": {name: round(seconds, 4) for name, seconds in self.warmup_seconds.items()},
+        }
+
+    # Artifact loaders
+
+    def load_joblib(self, filename, requires=()):
+        """Unpickle filename with joblib; requires names modules to import (and time) first"""
+        for module_name in requires:
+            self.import_module(module_name)
+        joblib = self.import_module("joblib")
+        return joblib.load(self.path(filename))
+
+    def load_pickle(self, filename, requires=()):
+        for module_name in requires:
+            self.import_module(module_name)
+        with open(self.path(filename), "rb") as f:
+            return pickle.load(f)
+
+    def load_xgboost_booster(self, pickle_filename, native_filenames=()):
+        """
+        Load an XGBoost booster, preferring a native model file (.ubj/.json written by
+        Booster.save_model) over the pickled sklearn wrapper when one exists.
+        """
+        xgboost = self.import_module("xgboost")
+        for filename in native_filenames:
+            if os.path.exists(self.path(filename)):
+                booster = xgboost.Booster()
+                booster.load_model(self.path(filename))
+                return booster
+        return self.load_joblib(pickle_filename).get_booster()
+
+
+def export_xgboost(pickle_path, output_path):
+    """Write the booster inside a pickled XGBRegressor in XGBoost's native format"""
+    import joblib
+    booster = joblib.load(pickle_path).get_booster()
+    booster.save_model(output_path)
+    return output_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Model artifact utilities")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export-xgboost", help="Convert the pickled yield model to native XGBoost format")
+    export.add_argument("--input", default="model/xgboost_crop_yield_model.pkl")
+    export.add_argument("--output", default="model/xgboost_crop_yield_model.ubj",
+                        help="Output file; .ubj for binary, .json for JSON")
+    args = parser.parse_args()
+
+    if args.command == "export-xgboost":
+        print(f"Wrote {export_xgboost(args.input, args.output)}")
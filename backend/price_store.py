@@ -0,0 +1,593 @@
+import csv
+import json
+import os
+import re
+import shutil
+import time
+from datetime import date, datetime
+
+import numpy as np
+
+
+STORE_VERSION = 1
+COLUMNS = {
+    "crop": np.uint16,
+    "market": np.uint16,
+    "date": np.int32,  # days since 1970-01-01
+    "min_price": np.float32,  # Rs. per quintal
+    "max_price": np.float32,
+    "modal_price": np.float32,
+    "arrivals": np.float32,  # tonnes; NaN when the dump has no arrivals column
+}
+INTERVALS = ("day", "week", "month")
+
+# Per-day aggregates (daily.npy): one row per crop, state and date, plus one per crop
+# and date over every state (state ALL_STATES), sorted by crop, state and date
+DAILY_DTYPE = np.dtype([
+    ("crop", np.uint16),
+    ("state", np.uint16),
+    ("date", np.int32),
+    ("reports", np.uint32),
+    ("modal_sum", np.float64),  # averages combine exactly across days and states
+    ("min_price", np.float32),
+    ("max_price", np.float32),
+    ("arrivals", np.float32),
+])
+ALL_STATES = np.iinfo(np.uint16).max
+
+# Normalized CSV header (lowercase, non-alphanumerics -> "_") -> field. Covers the
+# data.gov.in daily dump (Min_x0020_Price, Arrival_Date) and agmarknet.gov.in
+# report exports ("Min Price (Rs./Quintal)", "Price Date", "Arrivals (Tonnes)").
+HEADER_ALIASES = {
+    "state": "state", "state_name": "state",
+    "district": "district", "district_name": "district",
+    "market": "market", "market_name": "market", "market_center": "market",
+    "commodity": "commodity",
+    "arrival_date": "date", "price_date": "date", "reported_date": "date", "date": "date",
+    "min_price": "min_price", "min_x0020_price": "min_price", "min_price_rs_quintal": "min_price",
+    "max_price": "max_price", "max_x0020_price": "max_price", "max_price_rs_quintal": "max_price",
+    "modal_price": "modal_price", "modal_x0020_price": "modal_price", "modal_price_rs_quintal": "modal_price",
+    "arrivals": "arrivals", "arrivals_tonnes": "arrivals", "arrival_quantity": "arrivals",
+}
+REQUIRED_FIELDS = ("state", "district", "market", "commodity", "date", "min_price", "max_price", "modal_price")
+DATE_FORMATS = ("%d/%m/%Y", "%d-%m-%Y", "%Y-%m-%d", "%d %b %Y", "%d-%b-%Y")
+
+# AGMARKNET commodity names -> the crop names used by the app
+COMMODITY_ALIASES = {
+    "paddy(dhan)(common)": "Rice", "paddy(dhan)(basmati)": "Rice", "rice": "Rice",
+    "wheat": "Wheat",
+    "cotton": "Cotton", "kapas": "Cotton",
+    "groundnut": "Groundnut", "groundnut pods (raw)": "Groundnut",
+    "sugarcane": "Sugarcane",
+    "maize": "Maize",
+    "soyabean": "Soybean", "soybean": "Soybean",
+    "bengal gram(gram)(whole)": "Gram", "gram": "Gram", "bengal gram dal (chana dal)": "Gram",
+    "mustard": "Mustard", "mustard seed": "Mustard",
+    "barley (jau)": "Barley", "barley": "Barley",
+    "peas(dry)": "Peas", "peas wet": "Peas", "green peas": "Peas",
+    "arhar (tur/red gram)(whole)": "Pulses", "black gram (urd beans)(whole)": "Pulses",
+    "green gram (moong)(whole)": "Pulses", "lentil (masur)(whole)": "Pulses",
+}
+
+EPOCH = date(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+def to_day(value):
+    """datetime.date -> days since 1970-01-01"""
+    return (value - EPOCH).days
+
+
+def from_day(day):
+    return date.fromordinal(EPOCH_ORDINAL + int(day))
+
+
+def market_state_codes(markets):
+    """
+    (states, codes): state names in first-seen order and each market's state code.
+    Ingests only append markets, so the codes stay stable across ingests.
+    """
+    states = list(dict.fromkeys(state for _, _, state in markets))
+    index = {state: i for i, state in enumerate(states)}
+    return states, np.array([index[state] for _, _, state in markets], dtype=np.uint16)
+
+
+def _normalize_header(name):
+    return re.sub(r"[^a-z0-9]+", "_", name.strip().lower()).strip("_")
+
+
+def _parse_price(value):
+    try:
+        return float(value.replace(",", ""))
+    except (AttributeError, ValueError):
+        return float("nan")
+
+
+class PriceStore:
+    """
+    Read-only historical mandi price store: one memory-mapped .npy file per column
+    plus meta.json, written by ingest().
+
+    Rows hold one (crop, market, date) price report and are sorted by crop, then
+    date, then market. meta.json stores where each crop's rows start, so a crop and
+    date range is one contiguous slice found with a binary search (searchsorted);
+    state/market filters are vectorized masks on that slice, and day/week/month
+    aggregates are np.*.reduceat over it. Query cost grows with the rows in the
+    requested range, not with the length of the history.
+
+    daily.npy holds the same reports pre-aggregated per crop, state and day
+    (DAILY_DTYPE), which summary() reads for multi-crop boards. ingest() refreshes
+    only the days it touched; changed() tells a server to reopen the store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        while True:
+            # Resolve the store symlink once, so every file comes from the same version
+            self.version_path = os.path.realpath(path)
+            try:
+                self._open(self.version_path)
+                return
+            except FileNotFoundError:
+                # An ingest removed this version while it was being opened: open the new one
+                if os.path.realpath(path) == self.version_path:
+                    raise
+
+    def _open(self, path):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported price store version {self.meta.get('version')}")
+        self.columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+        self.crops = self.meta["crops"]
+        self.crop_index = {name.lower(): i for i, name in enumerate(self.crops)}
+        self.crop_offsets = np.array(self.meta["crop_offsets"], dtype=np.int64)
+        self.markets = self.meta["markets"]  # [market, district, state]
+        self.market_states = np.array([state.lower() for _, _, state in self.markets])
+        self.states, self.market_state_codes = market_state_codes(self.markets)
+        self.state_index = {state.lower(): i for i, state in enumerate(self.states)}
+        self.mtime = os.stat(os.path.join(path, "meta.json")).st_mtime_ns
+
+        daily_path = os.path.join(path, "daily.npy")
+        if os.path.exists(daily_path):
+            self.daily = np.load(daily_path, mmap_mode="r")
+        else:  # stores written before daily.npy existed
+            self.daily = build_daily(self.columns, self.crop_offsets, self.market_state_codes)
+        groups = (self.daily["crop"].astype(np.int64) << 16) | self.daily["state"]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(groups)) + 1)) if len(groups) else []
+        ends = np.append(starts[1:], len(groups)) if len(groups) else []
+        # (crop code, state code) -> [lo, hi) rows of daily
+        self.daily_rows = {
+            (int(groups[lo]) >> 16, int(groups[lo]) & 0xFFFF): (int(lo), int(hi)) for lo, hi in zip(starts, ends)
+        }
+
+    def changed(self):
+        """True once the store on disk was rebuilt (or removed) since this one was opened"""
+        if os.path.realpath(self.path) != self.version_path:
+            return True
+        try:
+            return os.stat(os.path.join(self.path, "meta.json")).st_mtime_ns != self.mtime
+        except OSError:
+            return True
+
+    def __len__(self):
+        return int(self.crop_offsets[-1])
+
+    def has_crop(self, crop):
+        return str(crop).strip().lower() in self.crop_index
+
+    def crop_rows(self, crop):
+        """[lo, hi) row range of a crop"""
+        i = self.crop_index[str(crop).strip().lower()]
+        return int(self.crop_offsets[i]), int(self.crop_offsets[i + 1])
+
+    def last_date(self, crop):
+        lo, hi = self.crop_rows(crop)
+        return from_day(self.columns["date"][hi - 1]) if hi > lo else None
+
+    def _market_codes(self, state=None, market=None):
+        """Codes of the markets matching state/market (case-insensitive), or None for no filter"""
+        if not state and not market:
+            return None
+        mask = np.ones(len(self.markets), dtype=bool)
+        if state:
+            mask &= self.market_states == state.strip().lower()
+        if market:
+            mask &= np.array([name.lower() == market.strip().lower() for name, _, _ in self.markets])
+        return np.flatnonzero(mask)
+
+    def query(self, crop, start=None, end=None, state=None, market=None, interval="day"):
+        """
+        Aggregate one crop's prices over [start, end] (dates, None = open-ended),
+        optionally limited to a state and/or market. Returns None when no rows match,
+        else the overall min/max/average, percent change between the first and last
+        interval, total arrivals and the per-interval series.
+        """
+        if interval not in INTERVALS:
+            raise ValueError(f"interval must be one of {INTERVALS}")
+        lo, hi = self.crop_rows(crop)
+        dates = self.columns["date"]
+        if start is not None:
+            lo += int(np.searchsorted(dates[lo:hi], to_day(start), side="left"))
+        if end is not None:
+            hi = lo + int(np.searchsorted(dates[lo:hi], to_day(end), side="right"))
+
+        selected = slice(lo, hi)
+        codes = self._market_codes(state, market)
+        if codes is not None:
+            selected = np.flatnonzero(np.isin(self.columns["market"][lo:hi], codes)) + lo
+        day = np.asarray(dates[selected])
+        if not len(day):
+            return None
+        min_price = np.asarray(self.columns["min_price"][selected], dtype=float)
+        max_price = np.asarray(self.columns["max_price"][selected], dtype=float)
+        modal_price = np.asarray(self.columns["modal_price"][selected], dtype=float)
+        arrivals = np.asarray(self.columns["arrivals"][selected], dtype=float)
+
+        # Bucket ids are non-decreasing because rows are date-sorted within a crop
+        if interval == "day":
+            bucket = day
+        elif interval == "week":
+            bucket = (day + 3) // 7  # weeks starting on Monday (1970-01-01 was a Thursday)
+        else:
+            bucket = day.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+        counts = np.diff(np.append(starts, len(day)))
+        bucket_modal = np.add.reduceat(modal_price, starts) / counts
+        bucket_min = np.minimum.reduceat(min_price, starts)
+        bucket_max = np.maximum.reduceat(max_price, starts)
+
+        first, last = bucket_modal[0], bucket_modal[-1]
+        reported_arrivals = np.isfinite(arrivals)
+        return {
+            "start": from_day(day[0]).isoformat(),
+            "end": from_day(day[-1]).isoformat(),
+            "reports": int(len(day)),
+            "markets": int(len(np.unique(self.columns["market"][selected]))),
+            "average_price": float(modal_price.mean()),
+            "minimum_price": float(min_price.min()),
+            "maximum_price": float(max_price.max()),
+            "change_percent": float((last - first) / first * 100) if first else 0.0,
+            "arrivals_tonnes": float(arrivals[reported_arrivals].sum()) if reported_arrivals.any() else None,
+            "series": [
+                {
+                    "date": from_day(bucket_day).isoformat(),
+                    "price": round(price),
+                    "min_price": round(low),
+                    "max_price": round(high),
+                    "reports": n,
+                }
+                for bucket_day, price, low, high, n in zip(
+                    day[starts].tolist(), bucket_modal.tolist(), bucket_min.tolist(), bucket_max.tolist(), counts.tolist()
+                )
+            ],
+        }
+
+    def summary(self, crop, start=None, end=None, state=None):
+        """
+        query() with a daily series and no market filter, read from the per-day
+        aggregates: a binary search and a few vector reductions over one row per day.
+        start/end default to the crop's first/latest report.
+        """
+        crop_code = self.crop_index[str(crop).strip().lower()]
+        state_code = self.state_index.get(state.strip().lower()) if state else ALL_STATES
+        lo, hi = self.daily_rows.get((crop_code, state_code), (0, 0))
+        dates = self.daily["date"][lo:hi]
+        first = int(np.searchsorted(dates, to_day(start), side="left")) if start is not None else 0
+        last = int(np.searchsorted(dates, to_day(end), side="right")) if end is not None else len(dates)
+        if last <= first:
+            return None
+        rows = self.daily[lo + first:lo + last]
+
+        modal = rows["modal_sum"] / rows["reports"]
+        arrivals = rows["arrivals"][np.isfinite(rows["arrivals"])]
+        return {
+            "start": from_day(rows["date"][0]).isoformat(),
+            "end": from_day(rows["date"][-1]).isoformat(),
+            "reports": int(rows["reports"].sum()),
+            "average_price": float(rows["modal_sum"].sum() / rows["reports"].sum()),
+            "minimum_price": float(rows["min_price"].min()),
+            "maximum_price": float(rows["max_price"].max()),
+            "change_percent": float((modal[-1] - modal[0]) / modal[0] * 100) if modal[0] else 0.0,
+            "arrivals_tonnes": float(arrivals.sum(dtype=np.float64)) if len(arrivals) else None,
+            "series": [
+                {
+                    "date": from_day(day).isoformat(),
+                    "price": round(price),
+                    "min_price": round(low),
+                    "max_price": round(high),
+                    "reports": n,
+                }
+                for day, price, low, high, n in zip(
+                    rows["date"].tolist(), modal.tolist(), rows["min_price"].tolist(), rows["max_price"].tolist(),
+                    rows["reports"].tolist()
+                )
+            ],
+        }
+
+    def info(self):
+        return {
+            "path": self.path,
+            "rows": len(self),
+            "crops": {name: int(self.crop_offsets[i + 1] - self.crop_offsets[i]) for i, name in enumerate(self.crops)},
+            "markets": len(self.markets),
+            "states": len(self.states),
+            "daily_rows": len(self.daily),
+            "first_date": self.meta.get("first_date"),
+            "last_date": self.meta.get("last_date"),
+            "size_bytes": sum(int(column.nbytes) for column in self.columns.values()) + int(self.daily.nbytes),
+            "built_at": self.meta.get("built_at"),
+        }
+
+
+def read_agmarknet_csv(path, crops, markets):
+    """
+    Parse one AGMARKNET-style CSV into column lists, extending the crops
+    ({name: code}) and markets ({(market, district, state): code}) vocabularies.
+    Rows with an unparseable date or modal price are skipped (and counted).
+    """
+    columns = {name: [] for name in COLUMNS}
+    skipped = 0
+    day_cache = {}
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [HEADER_ALIASES.get(_normalize_header(name)) for name in next(reader)]
+        missing = [field for field in REQUIRED_FIELDS if field not in header]
+        if missing:
+            raise ValueError(f"{path}: missing columns {missing}")
+        position = {field: header.index(field) for field in set(header) if field}
+        has_arrivals = "arrivals" in position
+
+        for row in reader:
+            if len(row) < len(header):
+                skipped += 1
+                continue
+            raw_date = row[position["date"]].strip()
+            day = day_cache.get(raw_date)
+            if day is None:
+                for fmt in DATE_FORMATS:
+                    try:
+                        day = day_cache[raw_date] = to_day(datetime.strptime(raw_date, fmt).date())
+                        break
+                    except ValueError:
+                        continue
+            modal = _parse_price(row[position["modal_price"]])
+            if day is None or not np.isfinite(modal) or modal <= 0:
+                skipped += 1
+                continue
+
+            commodity = row[position["commodity"]].strip()
+            crop = COMMODITY_ALIASES.get(commodity.lower(), commodity)
+            market = (row[position["market"]].strip(), row[position["district"]].strip(), row[position["state"]].strip())
+            columns["crop"].append(crops.setdefault(crop, len(crops)))
+            columns["market"].append(markets.setdefault(market, len(markets)))
+            columns["date"].append(day)
+            columns["min_price"].append(_parse_price(row[position["min_price"]]))
+            columns["max_price"].append(_parse_price(row[position["max_price"]]))
+            columns["modal_price"].append(modal)
+            columns["arrivals"].append(_parse_price(row[position["arrivals"]]) if has_arrivals else float("nan"))
+    return {name: np.array(values, dtype=COLUMNS[name]) for name, values in columns.items()}, skipped
+
+
+def _row_keys(columns):
+    # Sort/group key in storage order: crop, then date, then market
+    return ((columns["crop"].astype(np.int64) << 48)
+            | (columns["date"].astype(np.int64) << 16)
+            | columns["market"].astype(np.int64))
+
+
+def _collapse(columns):
+    """
+    One row per (crop, date, market), in storage order: reports for several
+    varieties/grades are merged (lowest min, highest max, mean modal, summed arrivals)
+    """
+    keys = _row_keys(columns)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1)) if len(keys) else np.zeros(0, dtype=np.int64)
+    counts = np.diff(np.append(starts, len(keys)))
+    if not len(starts):
+        return {name: values[:0] for name, values in columns.items()}
+
+    def reduce(name, ufunc):
+        return ufunc.reduceat(columns[name][order].astype(float), starts)
+
+    arrivals = columns["arrivals"][order].astype(float)
+    reported = np.isfinite(arrivals)
+    arrival_totals = np.add.reduceat(np.where(reported, arrivals, 0.0), starts)
+    arrival_totals[np.add.reduceat(reported.astype(np.int64), starts) == 0] = np.nan
+    return {
+        "crop": columns["crop"][order][starts],
+        "market": columns["market"][order][starts],
+        "date": columns["date"][order][starts],
+        "min_price": np.fmin.reduceat(columns["min_price"][order].astype(float), starts).astype(np.float32),
+        "max_price": np.fmax.reduceat(columns["max_price"][order].astype(float), starts).astype(np.float32),
+        "modal_price": (reduce("modal_price", np.add) / counts).astype(np.float32),
+        "arrivals": arrival_totals.astype(np.float32),
+    }
+
+
+def _daily_keys(daily):
+    return ((daily["crop"].astype(np.int64) << 48)
+            | (daily["state"].astype(np.int64) << 32)
+            | daily["date"].astype(np.int64))
+
+
+def build_daily(columns, crop_offsets, state_codes, day_ranges=None):
+    """
+    Per-day aggregate table (DAILY_DTYPE) from the store columns. day_ranges
+    ({crop code: (first day, last day)}) limits it to those crops and days, so an
+    ingest only recomputes the days it touched.
+    """
+    pieces = []
+    for crop in range(len(crop_offsets) - 1):
+        lo, hi = int(crop_offsets[crop]), int(crop_offsets[crop + 1])
+        if day_ranges is not None:
+            if crop not in day_ranges:
+                continue
+            first, last = day_ranges[crop]
+            dates = columns["date"][lo:hi]
+            lo, hi = lo + int(np.searchsorted(dates, first, side="left")), lo + int(np.searchsorted(dates, last, side="right"))
+        if hi > lo:
+            pieces.append(np.arange(lo, hi))
+    if not pieces:
+        return np.zeros(0, dtype=DAILY_DTYPE)
+
+    # Every report counts towards its state's row and the crop's all-states row
+    index = np.concatenate(pieces)
+    take = np.concatenate([index, index])
+    state = np.concatenate([state_codes[columns["market"][index]], np.full(len(index), ALL_STATES, dtype=np.uint16)])
+    keys = ((columns["crop"][take].astype(np.int64) << 48)
+            | (state.astype(np.int64) << 32)
+            | columns["date"][take].astype(np.int64))
+    order = np.argsort(keys, kind="stable")
+    keys, take, state = keys[order], take[order], state[order]
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+
+    arrivals = columns["arrivals"][take].astype(float)
+    reported = np.isfinite(arrivals)
+    daily = np.zeros(len(starts), dtype=DAILY_DTYPE)
+    daily["crop"] = columns["crop"][take[starts]]
+    daily["state"] = state[starts]
+    daily["date"] = columns["date"][take[starts]]
+    daily["reports"] = np.diff(np.append(starts, len(keys)))
+    daily["modal_sum"] = np.add.reduceat(columns["modal_price"][take].astype(float), starts)
+    daily["min_price"] = np.fmin.reduceat(columns["min_price"][take].astype(float), starts)
+    daily["max_price"] = np.fmax.reduceat(columns["max_price"][take].astype(float), starts)
+    daily["arrivals"] = np.add.reduceat(np.where(reported, arrivals, 0.0), starts)
+    daily["arrivals"][np.add.reduceat(reported.astype(np.int64), starts) == 0] = np.nan
+    return daily
+
+
+def _replace(old, new):
+    """old's rows plus new's, where new's replace old's for the same (crop, date, market), in storage order"""
+    keep = ~np.isin(_row_keys(old), _row_keys(new))
+    merged = {name: np.concatenate([old[name][keep], new[name]]) for name in COLUMNS}
+    order = np.argsort(_row_keys(merged), kind="stable")
+    return {name: values[order] for name, values in merged.items()}
+
+
+def _publish(store_path, version_path):
+    """Atomically point the store_path symlink at version_path; keep only it and the previous version"""
+    base = store_path.rstrip("/")
+    previous = os.path.realpath(base) if os.path.exists(base) else None
+    if os.path.isdir(base) and not os.path.islink(base):
+        # A store written before versioned directories: move it aside once, like a version.
+        # Only this first swap leaves a moment with no store at store_path
+        previous = f"{base}.v0"
+        os.replace(base, previous)
+    link = base + ".link"
+    if os.path.lexists(link):
+        os.remove(link)
+    os.symlink(os.path.basename(version_path), link)  # relative, so the store can be moved
+    os.replace(link, base)
+    # The previous version stays until the next ingest, for readers still opening it
+    keep = {os.path.realpath(path) for path in (version_path, previous) if path}
+    prefix = os.path.basename(base) + ".v"
+    for name in os.listdir(os.path.dirname(os.path.abspath(base))):
+        path = os.path.join(os.path.dirname(base), name)
+        if name.startswith(prefix) and name[len(prefix):].isdigit() and os.path.realpath(path) not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def ingest(csv_paths, store_path):
+    """
+    Add AGMARKNET-style CSV dumps to the store at store_path (created if missing).
+    Reports for a (crop, market, date) already in the store, or in an earlier
+    file of csv_paths, are replaced by the later ones, so overlapping dumps can be
+    re-ingested. The new store is written to a versioned directory next to the
+    old one and store_path, a symlink, is repointed to it in one rename, so
+    readers always find a complete store. Returns the new store's info().
+    """
+    start = time.perf_counter()
+    crops, markets, sources = {}, {}, []
+    existing = None
+    if os.path.exists(os.path.join(store_path, "meta.json")):
+        existing = PriceStore(store_path)
+        crops = {name: i for i, name in enumerate(existing.crops)}
+        markets = {tuple(market): i for i, market in enumerate(existing.markets)}
+        sources = list(existing.meta.get("sources", []))
+
+    new, skipped = None, 0
+    for path in csv_paths:
+        columns, file_skipped = read_agmarknet_csv(path, crops, markets)
+        columns = _collapse(columns)
+        new = columns if new is None else _replace(new, columns)
+        skipped += file_skipped
+        sources.append(os.path.basename(path))
+        print(f"[Price Store] Read {len(columns['date'])} rows from {path} ({file_skipped} skipped)")
+    if len(crops) > np.iinfo(np.uint16).max or len(markets) > np.iinfo(np.uint16).max:
+        raise ValueError("Too many crops or markets for the store's 16-bit codes")
+
+    # Days each crop's new reports fall in: the only per-day aggregates to recompute
+    crop_codes, crop_starts = np.unique(new["crop"], return_index=True)
+    day_ranges = {
+        int(crop): (int(first), int(last)) for crop, first, last in zip(
+            crop_codes, np.minimum.reduceat(new["date"], crop_starts), np.maximum.reduceat(new["date"], crop_starts)
+        )
+    } if len(crop_codes) else {}
+    if existing is not None:
+        new = _replace({name: np.asarray(existing.columns[name]) for name in COLUMNS}, new)
+
+    crop_names = sorted(crops, key=crops.get)
+    crop_offsets = np.searchsorted(new["crop"], np.arange(len(crop_names) + 1), side="left")
+    market_names = sorted(markets, key=markets.get)
+    _, state_codes = market_state_codes(market_names)
+    if existing is not None:
+        daily = np.asarray(existing.daily)
+        stale = np.zeros(len(daily), dtype=bool)
+        for crop, (first, last) in day_ranges.items():
+            stale |= (daily["crop"] == crop) & (daily["date"] >= first) & (daily["date"] <= last)
+        daily = np.concatenate([daily[~stale], build_daily(new, crop_offsets, state_codes, day_ranges)])
+        daily = daily[np.argsort(_daily_keys(daily), kind="stable")]
+    else:
+        daily = build_daily(new, crop_offsets, state_codes)
+    version_path = f"{store_path.rstrip('/')}.v{datetime.now():%Y%m%d%H%M%S%f}"
+    os.makedirs(version_path)
+    for name, dtype in COLUMNS.items():
+        np.save(os.path.join(version_path, f"{name}.npy"), new[name].astype(dtype))
+    np.save(os.path.join(version_path, "daily.npy"), daily)
+    meta = {
+        "version": STORE_VERSION,
+        "crops": crop_names,
+        "markets": [list(market) for market in market_names],
+        "crop_offsets": [int(offset) for offset in crop_offsets],
+        "first_date": from_day(new["date"].min()).isoformat() if len(new["date"]) else None,
+        "last_date": from_day(new["date"].max()).isoformat() if len(new["date"]) else None,
+        "sources": sources,
+        "built_at": datetime.now().isoformat(),
+    }
+    with open(os.path.join(version_path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    _publish(store_path, version_path)
+    print(f"[Price Store] Wrote {len(new['date'])} rows to {store_path} in {time.perf_counter() - start:.1f}s "
+          f"({skipped} rows skipped, {len(daily)} daily aggregates)")
+    return PriceStore(store_path).info()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Historical mandi price store")
+    parser.add_argument("--store", default=os.environ.get("MARKET_PRICE_STORE", "data/mandi_prices"))
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Add AGMARKNET CSV dumps to the store")
+    ingest_parser.add_argument("csv", nargs="+")
+    subparsers.add_parser("info", help="Rows, crops and date range of the store")
+    query_parser = subparsers.add_parser("query", help="Aggregate one crop's prices")
+    query_parser.add_argument("crop")
+    query_parser.add_argument("--state")
+    query_parser.add_argument("--market")
+    query_parser.add_argument("--start", type=date.fromisoformat)
+    query_parser.add_argument("--end", type=date.fromisoformat)
+    query_parser.add_argument("--interval", choices=INTERVALS, default="day")
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        print(json.dumps(ingest(args.csv, args.store), indent=2))
+    elif args.command == "info":
+        print(json.dumps(PriceStore(args.store).info(), indent=2))
+    else:
+        result = PriceStore(args.store).query(args.crop, args.start, args.end, args.state, args.market, args.interval)
+        print(json.dumps(result, indent=2))
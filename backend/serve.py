@@ -0,0 +1,299 @@
+"""
+Production entrypoint for the backend: python serve.py [options]
+
+The master process imports app.py, which loads and warms every model eagerly, then
+binds the listening socket and forks the workers. Workers inherit the loaded models
+copy-on-write, so the weights sit in memory once however many workers run. Each
+worker serves the shared socket with a fixed pool of request threads.
+
+The master only supervises. It replaces workers that exit, recycles any whose
+private memory (pages not shared with the master) passes --max-memory-mb, and on
+SIGTERM/SIGINT has every worker stop accepting, finish in-flight requests and
+exit, with SIGKILL after --graceful-timeout. Workers also recycle themselves
+after --max-requests requests.
+
+Each worker has a slot, which its replacements keep. With a shared CACHE_BACKEND
+the weather pre-warm runs in slot 0 only; with the memory cache every worker
+pre-warms its own cache, the slots staggered over the pre-warm interval.
+
+Every option can be set through the environment (SERVE_WORKERS, SERVE_THREADS, ...;
+the port also from PORT). Keep workers x (threads + model threads) near the core
+count. XGBoost runs single-threaded by default (SERVE_MODEL_THREADS=1), because
+parallelism comes from the workers.
+"""
+import argparse
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+import traceback
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_float(name, default):
+    return float(os.environ.get(name, default))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the backend with preforked workers")
+    parser.add_argument("--host", default=os.environ.get("SERVE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=env_int("PORT", os.environ.get("SERVE_PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=env_int("SERVE_WORKERS", os.cpu_count() or 1),
+                        help="worker processes (default: CPU count)")
+    parser.add_argument("--threads", type=int, default=env_int("SERVE_THREADS", 4),
+                        help="request threads per worker")
+    parser.add_argument("--model-threads", type=int, default=env_int("SERVE_MODEL_THREADS", 1),
+                        help="XGBoost/OpenMP threads per worker")
+    parser.add_argument("--max-requests", type=int, default=env_int("SERVE_MAX_REQUESTS", 0),
+                        help="recycle a worker after this many requests (0 = never)")
+    parser.add_argument("--max-requests-jitter", type=int, default=env_int("SERVE_MAX_REQUESTS_JITTER", 0),
+                        help="add up to this many requests to each worker's limit, so they don't recycle together")
+    parser.add_argument("--max-memory-mb", type=float, default=env_float("SERVE_MAX_MEMORY_MB", 0),
+                        help="recycle a worker whose private memory passes this (0 = no limit)")
+    parser.add_argument("--graceful-timeout", type=float, default=env_float("SERVE_GRACEFUL_TIMEOUT", 30),
+                        help="seconds a stopping worker gets to finish in-flight requests")
+    parser.add_argument("--keepalive-timeout", type=float, default=env_float("SERVE_KEEPALIVE_TIMEOUT", 5),
+                        help="seconds an idle keep-alive connection may hold a request thread")
+    parser.add_argument("--backlog", type=int, default=env_int("SERVE_BACKLOG", 1024))
+    parser.add_argument("--access-log", action="store_true", default=os.environ.get("SERVE_ACCESS_LOG", "0") == "1")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.threads < 1 or args.model_threads < 1:
+        parser.error("--workers, --threads and --model-threads must be at least 1")
+    return args
+
+
+def private_memory_bytes(pid):
+    """
+    Memory a process holds alone: Private_Clean + Private_Dirty from /proc, so the
+    model pages shared with the master don't count. Falls back to the resident set
+    size on kernels without smaps_rollup; None where /proc isn't available.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            return sum(
+                int(line.split()[1]) * 1024 for line in f
+                if line.startswith(("Private_Clean:", "Private_Dirty:"))
+            )
+    except OSError:
+        pass
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def make_worker_server(application, sock, args, max_requests):
+    """werkzeug WSGI server on the inherited socket with a fixed pool of request threads"""
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class RequestHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+        timeout = args.keepalive_timeout
+
+        def run_wsgi(self):
+            super().run_wsgi()
+            self.server.request_done()
+            if self.server.stopping:
+                self.close_connection = True
+
+        def log_request(self, *log_args, **kwargs):
+            if args.access_log:
+                super().log_request(*log_args, **kwargs)
+
+    class PooledWSGIServer(BaseWSGIServer):
+        multithread = True
+
+        def __init__(self):
+            super().__init__(args.host, args.port, application, handler=RequestHandler, fd=sock.fileno())
+            # Non-blocking accept: when workers race for one connection the losers get
+            # BlockingIOError (ignored by socketserver) instead of stalling their loop
+            self.socket.setblocking(False)
+            self.executor = ThreadPoolExecutor(args.threads, thread_name_prefix="request")
+            # Only accept while a request thread is free, leaving queued connections
+            # to idle workers instead of piling them up behind busy ones
+            self.free_threads = threading.Semaphore(args.threads)
+            self.stopping = False
+            self.requests = 0
+            self._requests_lock = threading.Lock()
+
+        def get_request(self):
+            self.free_threads.acquire()
+            try:
+                return super().get_request()
+            except BaseException:
+                self.free_threads.release()
+                raise
+
+        def process_request(self, request, client_address):
+            self.executor.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                self.free_threads.release()
+
+        def request_done(self):
+            with self._requests_lock:
+                self.requests += 1
+                if max_requests and self.requests == max_requests:
+                    print(f"[Serve] Worker {os.getpid()} reached {max_requests} requests, recycling")
+                    self.stop()
+
+        def stop(self):
+            """Stop accepting; serve_forever returns once its loop notices"""
+            if not self.stopping:
+                self.stopping = True
+                threading.Thread(target=self.shutdown, daemon=True).start()
+
+    return PooledWSGIServer()
+
+
+def run_worker(application, sock, args, slot):
+    # Background tasks (the weather pre-warm loop): with a shared cache one loop, in
+    # worker slot 0, warms every worker. With the per-process memory cache each worker
+    # warms its own cache; each loop costs one bulk Open-Meteo request per interval,
+    # and the slots start evenly spread over the interval so the workers don't
+    # request together
+    if application.CACHE_BACKEND != "memory":
+        application.configure_background_tasks(enabled=slot == 0)
+    else:
+        application.configure_background_tasks(
+            prewarm_delay=slot * application.WEATHER_PREWARM_INTERVAL / args.workers
+        )
+
+    max_requests = args.max_requests + random.randint(0, args.max_requests_jitter) if args.max_requests else 0
+    server = make_worker_server(application.app, sock, args, max_requests)
+
+    def handle_stop(signum, frame):
+        server.stop()
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    if args.model_threads > 1:
+        application.models.get("yield_model").set_param({"nthread": args.model_threads})
+
+    server.serve_forever(poll_interval=0.5)
+    # Let in-flight requests finish; idle keep-alive connections time out
+    server.executor.shutdown(wait=True)
+    server.server_close()
+
+
+def spawn_worker(application, sock, args, slot):
+    pid = os.fork()
+    if pid:
+        return pid
+    code = 0
+    try:
+        run_worker(application, sock, args, slot)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def serve(args):
+    # The master loads every model before forking, so the workers share them; the
+    # single-threaded OpenMP default is also set before the native libraries load,
+    # as the master must not start OpenMP threads before forking
+    os.environ["MODEL_LOAD_MODE"] = "eager"
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    import app as application
+
+    application.models.get("yield_model").set_param({"nthread": 1})
+    # Objects that exist now are never collected, so keep the collector from
+    # touching (and un-sharing) their pages in the workers
+    gc.freeze()
+
+    sock = socket.create_server((args.host, args.port), backlog=args.backlog)
+    print(f"[Serve] Master {os.getpid()} listening on {args.host}:{args.port} with {args.workers} workers x "
+          f"{args.threads} threads (model threads: {args.model_threads})")
+
+    workers = {}
+    recycling = set()
+    stopping = False
+
+    def handle_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    def start_worker(slot):
+        pid = spawn_worker(application, sock, args, slot)
+        workers[pid] = (time.monotonic(), slot)
+        print(f"[Serve] Started worker {pid}")
+
+    for slot in range(args.workers):
+        start_worker(slot)
+
+    max_memory = args.max_memory_mb * 2**20
+    while not stopping:
+        while workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                break
+            worker = workers.pop(pid, None)
+            recycling.discard(pid)
+            if worker is None:
+                continue
+            started, slot = worker
+            print(f"[Serve] Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}")
+            if time.monotonic() - started < 1:
+                time.sleep(1)  # don't spin if workers die at startup
+            if not stopping:
+                start_worker(slot)
+
+        if max_memory:
+            for pid in list(workers):
+                memory = private_memory_bytes(pid)
+                if pid not in recycling and memory is not None and memory > max_memory:
+                    print(f"[Serve] Worker {pid} private memory {memory / 2**20:.0f} MiB over "
+                          f"{args.max_memory_mb:.0f} MiB, recycling")
+                    recycling.add(pid)
+                    os.kill(pid, signal.SIGTERM)
+        time.sleep(0.5)
+
+    print(f"[Serve] Shutting down {len(workers)} workers")
+    sock.close()
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + args.graceful_timeout
+    while workers and time.monotonic() < deadline:
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            workers.pop(pid, None)
+        else:
+            time.sleep(0.1)
+    for pid in workers:
+        print(f"[Serve] Worker {pid} still running after {args.graceful_timeout:.0f}s, killing it")
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+    print("[Serve] Stopped")
+
+
+if __name__ == "__main__":
+    serve(parse_args())
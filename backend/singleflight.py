@@ -0,0 +1,123 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Request coalescing for upstream calls.
+
+    Concurrent calls for the same key share one execution: the first caller (the
+    leader) runs the fetch, callers arriving while it is in flight wait for it and
+    receive the same result or exception. Once it completes the key is released,
+    so later calls fetch again (caching stays the caller's job). Counters show how
+    many calls were coalesced, i.e. how many upstream requests a herd didn't make.
+    """
+
+    def __init__(self, name="single-flight"):
+        self.name = name
+        self._in_flight = {}  # key -> Future
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.max_waiters = 0
+        self._waiters = {}  # key -> callers waiting on the current flight
+
+    def _claim(self, key):
+        """(future, leader): a new flight for key if none is running, else the running one"""
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            waiters = self._waiters[key] = self._waiters[key] + 1
+            self.max_waiters = max(self.max_waiters, waiters)
+            return future, False
+        future = self._in_flight[key] = Future()
+        self._waiters[key] = 0
+        self.executions += 1
+        return future, True
+
+    def _release(self, key):
+        # Called with the lock held, after the flight's future is resolved
+        self._in_flight.pop(key, None)
+        self._waiters.pop(key, None)
+
+    def do(self, key, fn):
+        """Return fn(), shared with every concurrent do() for the same key"""
+        with self._lock:
+            future, leader = self._claim(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            with self._lock:
+                self.errors += 1
+                self._release(key)
+            raise
+        future.set_result(result)
+        with self._lock:
+            self._release(key)
+        return result
+
+    def do_many(self, keys, fn):
+        """
+        do() for several keys at once. Keys already in flight are waited on; the rest
+        are claimed and fetched with one fn(claimed_keys) call returning {key: value}.
+        Returns (values, errors): {key: value} for keys fn returned, and
+        {key: exception} for keys whose fetch failed.
+        """
+        claimed, waiting = [], {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                future, leader = self._claim(key)
+                if leader:
+                    claimed.append((key, future))
+                else:
+                    waiting[key] = future
+
+        values, errors = {}, {}
+        if claimed:
+            try:
+                fetched = fn([key for key, _ in claimed])
+                for key, future in claimed:
+                    future.set_result(fetched.get(key))
+                    if key in fetched:
+                        values[key] = fetched[key]
+            except BaseException as e:
+                # Resolve every claimed future, as do() does, or its waiters block forever;
+                # only ordinary exceptions are reported per key, the rest propagate
+                for key, future in claimed:
+                    if not future.done():
+                        future.set_exception(e)
+                        errors[key] = e
+                with self._lock:
+                    self.errors += 1
+                if not isinstance(e, Exception):
+                    raise
+            finally:
+                with self._lock:
+                    for key, _ in claimed:
+                        self._release(key)
+
+        for key, future in waiting.items():
+            try:
+                value = future.result()
+            except Exception as e:
+                errors[key] = e
+            else:
+                if value is not None:
+                    values[key] = value
+        return values, errors
+
+    def stats(self):
+        with self._lock:
+            calls = self.executions + self.coalesced
+            return {
+                "in_flight": len(self._in_flight),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "errors": self.errors,
+                "max_waiters": self.max_waiters,
+                "coalesced_ratio": round(self.coalesced / calls, 4) if calls else 0.0,
+            }
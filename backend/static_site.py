@@ -0,0 +1,126 @@
+import mimetypes
+import os
+import re
+
+from compression import Precompressed, available_encodings, compress, compressible
+
+# Content-hashed build outputs (static/js/main.86e6a220.js, 453.8ab44547.chunk.js)
+# never change under the same name, so browsers may keep them forever
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8}\.")
+IMMUTABLE = "public, max-age=31536000, immutable"
+# Everything else (index.html, manifest.json, icons) is revalidated with its ETag
+REVALIDATE = "no-cache"
+
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def content_type(path):
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if mimetype.startswith("text/") or mimetype == "application/javascript":
+        return f"{mimetype}; charset=utf-8"
+    return mimetype
+
+
+def build_files(root):
+    """Paths (relative, with /) of the build's files, leaving out .br/.gz variants"""
+    suffixes = tuple(ENCODING_SUFFIXES.values())
+    for directory, _, names in os.walk(root):
+        for name in sorted(names):
+            if not name.endswith(suffixes):
+                yield os.path.relpath(os.path.join(directory, name), root).replace(os.sep, "/")
+
+
+def read_encoded(path):
+    """encoding -> bytes of the .br/.gz files next to path that are at least as new as it"""
+    encoded = {}
+    mtime = os.path.getmtime(path)
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        if os.path.exists(path + suffix) and os.path.getmtime(path + suffix) >= mtime:
+            with open(path + suffix, "rb") as f:
+                encoded[encoding] = f.read()
+    return encoded
+
+
+class StaticBuild:
+    """
+    A built single-page app (the React frontend/build directory) served from memory.
+
+    Every file is read once. Compressible ones get their .br/.gz variants from
+    files written at build time (`python static_site.py compress`) when those are
+    current, and are compressed here otherwise, so no request compresses anything.
+    Hashed files are served as immutable; the rest revalidate with their ETags.
+    Paths that don't name a file fall back to index.html for client-side routing.
+    """
+
+    def __init__(self, root, index="index.html"):
+        self.root = root
+        self.index = index
+        self.files = {}
+        for path in build_files(root):
+            full_path = os.path.join(root, path)
+            with open(full_path, "rb") as f:
+                body = f.read()
+            file_type = content_type(path)
+            if compressible(file_type):
+                self.files[path] = Precompressed(body, file_type, encoded=read_encoded(full_path))
+            else:
+                self.files[path] = Precompressed(body, file_type, encodings=())
+        if index not in self.files:
+            raise FileNotFoundError(f"No {index} in {root}")
+
+    def cache_control(self, path):
+        return IMMUTABLE if HASHED_NAME.search(path) else REVALIDATE
+
+    def response(self, request, path):
+        """The file at path (or index.html for app routes), or None when there is no such file"""
+        path = path.strip("/") or self.index
+        if path not in self.files:
+            if "." in path.rsplit("/", 1)[-1]:
+                return None
+            path = self.index
+        return self.files[path].response(request, self.cache_control(path))
+
+    def sizes(self):
+        """Total bytes of the build per encoding, counting identity where a file has no such variant"""
+        all_sizes = [payload.sizes() for payload in self.files.values()]
+        encodings = dict.fromkeys(encoding for sizes in all_sizes for encoding in sizes)
+        return {
+            encoding: sum(sizes.get(encoding, sizes["identity"]) for sizes in all_sizes)
+            for encoding in encodings
+        }
+
+
+def write_compressed(root):
+    """Write .br (with the brotli package) and .gz variants next to each compressible build file"""
+    written = 0
+    for path in build_files(root):
+        full_path = os.path.join(root, path)
+        if not compressible(content_type(path)):
+            continue
+        with open(full_path, "rb") as f:
+            body = f.read()
+        for encoding in available_encodings():
+            encoded = compress(body, encoding)
+            if len(encoded) < len(body):
+                with open(full_path + ENCODING_SUFFIXES[encoding], "wb") as f:
+                    f.write(encoded)
+                written += 1
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Precompress or inspect the frontend build")
+    parser.add_argument("--build", default=os.environ.get("FRONTEND_BUILD") or "../frontend/build")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("compress", help="Write .br/.gz variants next to the build's files")
+    subparsers.add_parser("info", help="Files and total bytes per encoding")
+    args = parser.parse_args()
+
+    if args.command == "compress":
+        print(f"Wrote {write_compressed(args.build)} compressed files in {args.build}")
+    else:
+        build = StaticBuild(args.build)
+        print(json.dumps({"files": len(build.files), "bytes": build.sizes()}, indent=2))
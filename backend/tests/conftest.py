@@ -0,0 +1,120 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from model_store import ModelStore  # noqa: E402
+
+
+def pytest_configure(config):
+    # The pickles were written by older sklearn/xgboost releases and the original
+    # code paths pass plain arrays to encoders fitted on DataFrames; the tests compare
+    # against exactly that behaviour, so these warnings are expected
+    expected = ("Trying to unpickle", "If you are loading a serialized model", "X does not have valid feature names")
+    for message in expected:
+        config.addinivalue_line("filterwarnings", f"ignore:.*{message}")
+
+
+@pytest.fixture(scope="session")
+def models():
+    return ModelStore(os.path.join(BACKEND_DIR, "model"))
+
+@pytest.fixture(scope="session")
+def yield_artifacts(models):
+    """The shipped yield model pieces, loaded the way the original /predict loaded them"""
+    scaler = models.load_joblib("scaler.pkl", requires=["sklearn"])
+    return {
+        "model": models.load_joblib("xgboost_crop_yield_model.pkl", requires=["xgboost"]),
+        "encoders": tuple(
+            models.load_joblib(f"ordinal_encoder_{name}.pkl", requires=["sklearn"])
+            for name in ("district", "season", "soil")
+        ),
+        "scaler": scaler,
+        # Feature columns after the five numeric ones are the crop one-hots
+        "crop_categories": [str(name) for name in scaler.feature_names_in_[5:]],
+    }
+
+
+
+@pytest.fixture(scope="session")
+def crop_recommender(models):
+    """(forest, (minmax scaler, standard scaler)) as /recommend_crop applies them"""
+    forest = models.load_pickle("modelrandclf.pkl", requires=["sklearn"])
+    scalers = (
+        models.load_pickle("minmaxscaler.pkl", requires=["sklearn"]),
+        models.load_pickle("standscaler.pkl", requires=["sklearn"]),
+    )
+    return forest, scalers
+
+
+FORECAST = {
+    "current": {"temperature_2m": 31.46, "relative_humidity_2m": 40, "wind_speed_10m": 9.123,
+                "pressure_msl": 1008.04, "weather_code": 1},
+    "timezone": "Asia/Kolkata",
+}
+
+
+class StubUpstream(ThreadingHTTPServer):
+    """
+    Open-Meteo stand-in on an ephemeral 127.0.0.1 port. status and delay set how
+    the next requests are answered; requests counts the requests that arrived and
+    connections the client (host, port) pairs they came from.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.status = 200
+        self.delay = 0.0
+        self.requests = 0
+        self.connections = set()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1/forecast"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+        time.sleep(server.delay)
+        # Like Open-Meteo: one object for one location, a list for several
+        query = parse_qs(urlparse(self.path).query)
+        locations = len(query.get("latitude", [""])[0].split(","))
+        forecast = FORECAST if locations == 1 else [FORECAST] * locations
+        body = json.dumps(forecast if server.status == 200 else {"error": True}).encode()
+        try:
+            self.send_response(server.status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass  # the client timed out and hung up
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    server = StubUpstream()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
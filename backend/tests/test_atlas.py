@@ -0,0 +1,32 @@
+import json
+
+import numpy as np
+import pytest
+
+from atlas import ATLAS_VERSION, PredictionAtlas, metadata_path
+
+
+def write_atlas(path, rainfall, area, values):
+    np.save(path, np.asarray(values, dtype=np.float32).reshape(1, 1, 1, 1, len(rainfall), len(area)))
+    with open(metadata_path(path), "w") as f:
+        json.dump({
+            "version": ATLAS_VERSION, "districts": ["Pune"], "seasons": ["Kharif"], "soils": ["Loamy"],
+            "crops": ["Rice"], "rainfall": rainfall, "area": area, "model_sha256": "0" * 64,
+        }, f)
+    return path
+
+
+def test_lookup_interpolates_and_clamps(tmp_path):
+    path = write_atlas(str(tmp_path / "atlas.npy"), [0.0, 100.0], [0.0, 10.0, 20.0], [[0, 10, 20], [100, 110, 120]])
+    atlas = PredictionAtlas(path)
+    assert atlas.lookup(50.0, 5.0, "Pune", "Kharif", "Loamy", "Rice") == pytest.approx(55.0)
+    assert atlas.lookup(500.0, 25.0, "Pune", "Kharif", "Loamy", "Rice") == pytest.approx(120.0)
+    assert atlas.lookup(-1.0, 15.0, "Pune", "Kharif", "Loamy", "Rice", mode="nearest") == 20.0
+    assert atlas.lookup(50.0, 5.0, "Nagpur", "Kharif", "Loamy", "Rice") is None
+
+
+@pytest.mark.parametrize("rainfall, area", [([0.0], [0.0, 10.0]), ([0.0, 100.0], [5.0])])
+def test_single_point_axis_is_rejected(tmp_path, rainfall, area):
+    path = write_atlas(str(tmp_path / "atlas.npy"), rainfall, area, np.zeros(len(rainfall) * len(area)))
+    with pytest.raises(ValueError, match="at least 2 points"):
+        PredictionAtlas(path)
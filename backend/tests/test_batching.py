@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher
+
+
+def double(matrix):
+    return matrix[:, 0] * 2
+
+
+def submit_all(batcher, values):
+    """Submit each value from its own thread; returns {value: result or exception}"""
+    results = {}
+
+    def call(value):
+        try:
+            results[value] = batcher.submit([value, 0.0])
+        except Exception as e:
+            results[value] = e
+
+    threads = [threading.Thread(target=call, args=(value,)) for value in values]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def wait_for_inflight(batcher, n):
+    deadline = time.monotonic() + 5
+    while batcher._inflight < n and time.monotonic() < deadline:
+        time.sleep(0.001)
+    assert batcher._inflight == n
+
+
+def test_results_go_back_to_their_callers():
+    batcher = MicroBatcher(double, max_batch=8, max_wait=0.01)
+    values = [float(i) for i in range(50)]
+    assert submit_all(batcher, values) == {value: value * 2 for value in values}
+    stats = batcher.stats()
+    assert stats["rows"] == 50 and stats["errors"] == 0
+    assert stats["batch_size"]["max"] <= 8
+
+
+def test_waiting_rows_are_predicted_in_one_call():
+    entered, gate, calls = threading.Event(), threading.Event(), []
+
+    def predict(matrix):
+        calls.append(len(matrix))
+        entered.set()
+        gate.wait()
+        return double(matrix)
+
+    batcher = MicroBatcher(predict, max_batch=64, max_wait=0.3)
+    first = threading.Thread(target=batcher.submit, args=([0.0, 0.0],))
+    first.start()
+    assert entered.wait(5)  # the scheduler is busy with the first row while the rest queue up
+    rest = threading.Thread(target=submit_all, args=(batcher, [1.0, 2.0, 3.0, 4.0]))
+    rest.start()
+    wait_for_inflight(batcher, 5)
+    gate.set()
+    first.join()
+    rest.join()
+    assert calls == [1, 4]
+
+
+def test_an_error_fails_only_its_caller():
+    entered, gate = threading.Event(), threading.Event()
+
+    def predict(matrix):
+        entered.set()
+        gate.wait()
+        if (matrix[:, 0] < 0).any():
+            raise ValueError("negative rainfall")
+        return double(matrix)
+
+    batcher = MicroBatcher(predict, max_batch=64, max_wait=0.3)
+    first = threading.Thread(target=batcher.submit, args=([0.0, 0.0],))
+    first.start()
+    assert entered.wait(5)  # the scheduler is busy with the first row while the rest queue up
+    results = {}
+    rest = threading.Thread(target=lambda: results.update(submit_all(batcher, [1.0, -1.0, 2.0, -2.0, 3.0])))
+    rest.start()
+    wait_for_inflight(batcher, 6)
+    gate.set()
+    first.join()
+    rest.join()
+
+    assert {value: results[value] for value in (1.0, 2.0, 3.0)} == {1.0: 2.0, 2.0: 4.0, 3.0: 6.0}
+    for value in (-1.0, -2.0):
+        assert isinstance(results[value], ValueError)
+    assert batcher.stats()["errors"] == 2
+
+
+def test_a_lone_failing_row_raises_to_its_caller():
+    def predict(matrix):
+        raise RuntimeError("model unavailable")
+
+    batcher = MicroBatcher(predict)
+    with pytest.raises(RuntimeError):
+        batcher.submit([1.0, 0.0])
+    assert batcher.stats()["errors"] == 1
+
+
+def test_caller_buffer_is_copied():
+    batcher = MicroBatcher(double)
+    row = np.array([3.0, 0.0])
+    assert batcher.submit(row) == 6.0
+    row[0] = 5.0
+    assert batcher.submit(row) == 10.0
+
+
+@pytest.mark.filterwarnings("ignore::DeprecationWarning")
+def test_scheduler_restarts_in_a_forked_child():
+    batcher = MicroBatcher(double)
+    assert batcher.submit([1.0, 0.0]) == 2.0
+    parent_thread = batcher._thread
+
+    pid = os.fork()
+    if pid == 0:
+        # The parent's scheduler thread doesn't exist here; submit must start a new one
+        try:
+            ok = batcher.submit([4.0, 0.0], timeout=5) == 8.0 and batcher._thread is not parent_thread
+        except BaseException:
+            ok = False
+        os._exit(0 if ok else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    assert batcher._thread is parent_thread
+    assert batcher.submit([2.0, 0.0]) == 4.0
@@ -0,0 +1,266 @@
+import socket
+import socketserver
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from cache import LRUCache, RedisCache, RedisConnection, RedisError, SQLiteCache, encode_key, make_cache
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    """
+    Just enough of a Redis server for RedisCache on 127.0.0.1: AUTH, SELECT, GET,
+    MGET and SET with PX, over RESP2. commands records every command received.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password=None):
+        super().__init__(("127.0.0.1", 0), RedisStandInHandler)
+        self.password = password
+        self.databases = {}  # db -> {key: (value, expires_at)}
+        self.commands = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+
+    def get(self, db, key):
+        entry = self.databases.get(db, {}).get(key)
+        if entry is None or (entry[1] is not None and entry[1] <= time.time()):
+            return None
+        return entry[0]
+
+
+class RedisStandInHandler(socketserver.StreamRequestHandler):
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(self.reply(item) for item in value)
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        server = self.server
+        db, authenticated = 0, server.password is None
+        while True:
+            command = self.read_command()
+            if command is None:
+                return
+            name, args = command[0].decode().upper(), command[1:]
+            with server.lock:
+                server.commands.append(name)
+                if name == "AUTH":
+                    authenticated = args[0].decode() == server.password
+                    out = b"+OK\r\n" if authenticated else b"-WRONGPASS invalid password\r\n"
+                elif not authenticated:
+                    out = b"-NOAUTH Authentication required.\r\n"
+                elif name == "SELECT":
+                    db = int(args[0])
+                    out = b"+OK\r\n"
+                elif name == "GET":
+                    out = self.reply(server.get(db, args[0]))
+                elif name == "MGET":
+                    out = self.reply([server.get(db, key) for key in args])
+                elif name == "SET":
+                    expires_at = None
+                    if len(args) == 4 and args[2].upper() == b"PX":
+                        expires_at = time.time() + int(args[3]) / 1000
+                    server.databases.setdefault(db, {})[args[0]] = (args[1], expires_at)
+                    out = b"+OK\r\n"
+                else:
+                    out = b"-ERR unknown command '%s'\r\n" % name.encode()
+            self.wfile.write(out)
+
+
+@pytest.fixture
+def redis_server():
+    server = RedisStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["sqlite", "redis"])
+def backend_url(request, tmp_path):
+    """URL of a shared backend: a SQLite file in a temp dir, or the Redis stand-in"""
+    if request.param == "sqlite":
+        return f"sqlite:///{tmp_path / 'cache.db'}"
+    return request.getfixturevalue("redis_server").url
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_make_cache_picks_the_backend(tmp_path, redis_server):
+    assert isinstance(make_cache("memory", "ns"), LRUCache)
+    assert isinstance(make_cache(f"sqlite:///{tmp_path / 'cache.db'}", "ns"), SQLiteCache)
+    assert isinstance(make_cache(redis_server.url, "ns"), RedisCache)
+    with pytest.raises(ValueError):
+        make_cache("memcached://localhost", "ns")
+
+
+def test_get_many_set_many_round_trip(backend_url):
+    cache = make_cache(backend_url, "predictions")
+    keys = [("Pune", "Kharif", 800.0, 1), ("Pune", "Kharif", 800.5, 1), ("Nagpur", "Rabi", 0.1, 2)]
+    values = [{"production": 12.5}, np.array([0.25, 0.75]), np.float32(3.5)]
+    assert cache.get_many(keys) == [None, None, None]
+    cache.set_many(list(zip(keys, values)))
+    assert cache.get_many(keys + [("Nowhere",)]) == [{"production": 12.5}, [0.25, 0.75], 3.5, None]
+    assert cache.get(keys[0]) == {"production": 12.5}
+    assert cache.get(("Nowhere",), "default") == "default"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["errors"]) == (4, 5, 0)
+
+
+def test_shared_backends_return_lists_where_memory_returns_tuples(backend_url):
+    # Values are JSON in a shared store: a tuple comes back as a list, as documented
+    entry = ({"temperature": 31.5}, 1700000000.0)
+    memory = make_cache("memory", "weather")
+    shared = make_cache(backend_url, "weather")
+    memory.set((18.52, 73.86), entry)
+    shared.set((18.52, 73.86), entry)
+    assert memory.get((18.52, 73.86)) == entry
+    assert shared.get((18.52, 73.86)) == [{"temperature": 31.5}, 1700000000.0]
+    # Both unpack the same way, which is all StaleWhileRevalidateCache relies on
+    value, loaded_at = shared.get((18.52, 73.86))
+    assert (value, loaded_at) == entry
+
+
+def test_workers_share_entries(backend_url):
+    # A second cache object on the same URL stands in for another worker
+    make_cache(backend_url, "weather").set(("Pune",), {"temperature": 31.5})
+    assert make_cache(backend_url, "weather").get(("Pune",)) == {"temperature": 31.5}
+
+
+def test_namespaces_do_not_collide(backend_url):
+    predictions = make_cache(backend_url, "predictions")
+    recommendations = make_cache(backend_url, "recommendations")
+    predictions.set(("Pune", 1), "prediction")
+    recommendations.set(("Pune", 1), "recommendation")
+    assert predictions.get(("Pune", 1)) == "prediction"
+    assert recommendations.get(("Pune", 1)) == "recommendation"
+
+
+def test_encode_key_keeps_distinct_keys_distinct():
+    keys = [("1", "a"), (1, "a"), (1.0, "a"), (0.1, "a"), (0.1 + 1e-12, "a"), ("1,a",), ("Pune",)]
+    encoded = {encode_key("predictions", key) for key in keys}
+    assert len(encoded) == len(keys)
+    assert encode_key("predictions", ("Pune",)) != encode_key("prediction", ("Pune",))
+    assert encode_key("predictions", ("Pune",)) == encode_key("predictions", ["Pune"])
+
+
+def test_entries_expire_after_ttl(backend_url):
+    cache = make_cache(backend_url, "weather", ttl=0.2)
+    cache.set(("Pune",), 1)
+    assert cache.get(("Pune",)) == 1
+    time.sleep(0.3)
+    assert cache.get(("Pune",)) is None
+
+
+def test_sqlite_prune_drops_expired_and_oldest_entries(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = SQLiteCache(path, "predictions", max_size=3, ttl=0.2, prune_every=1000)
+    other = SQLiteCache(path, "recommendations", max_size=3, prune_every=1000)
+    cache.set_many([((i,), i) for i in range(5)])
+    other.set_many([((i,), i) for i in range(5)])
+    time.sleep(0.01)
+    cache.set_many([(("late", i), i) for i in range(2)])
+    assert cache.size() == 7
+
+    cache.prune()  # keeps the newest 3
+    assert cache.size() == 3
+    assert cache.get(("late", 1)) == 1 and cache.get(("late", 0)) == 0
+    assert cache.evictions == 4
+    assert other.size() == 5  # pruning one namespace leaves the others alone
+
+    time.sleep(0.3)
+    cache.prune()
+    assert cache.size() == 0
+    assert cache.evictions == 7
+
+
+def test_sqlite_prunes_every_prune_every_writes(tmp_path):
+    cache = SQLiteCache(str(tmp_path / "cache.db"), "predictions", max_size=2, prune_every=4)
+    cache.set_many([((i,), i) for i in range(3)])
+    assert cache.size() == 3
+    cache.set((3,), 3)
+    assert cache.size() == 2
+
+
+def test_redis_url_selects_database_and_authenticates():
+    server = RedisStandIn(password="s3cret")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        port = server.server_address[1]
+        cache = RedisCache(f"redis://:s3cret@127.0.0.1:{port}/2", "weather", ttl=60)
+        cache.set(("Pune",), 1)
+        assert cache.get(("Pune",)) == 1
+        assert server.commands[:2] == ["AUTH", "SELECT"]
+        assert list(server.databases) == [2]
+
+        with pytest.raises(RedisError):
+            RedisConnection("127.0.0.1", port, password="wrong")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_redis_connection_replies(redis_server):
+    connection = RedisConnection("127.0.0.1", redis_server.server_address[1])
+    try:
+        assert connection.execute(("SET", "a", b"1")) == "OK"
+        assert connection.execute(("GET", "a"), ("GET", "b"), ("MGET", "a", "b")) == [b"1", None, [b"1", None]]
+        with pytest.raises(RedisError):
+            connection.execute(("FLUSHALL",))
+    finally:
+        connection.close()
+
+
+def test_unavailable_store_is_skipped_until_retry_interval(redis_server):
+    cache = RedisCache(f"redis://127.0.0.1:{closed_port()}/0", "weather", timeout=0.5)
+    cache.retry_interval = 0.2
+
+    assert cache.get_many([("Pune",), ("Nagpur",)]) == [None, None]
+    assert cache.stats()["errors"] == 1
+    # Within retry_interval the store isn't tried at all: no new error, a skip instead
+    cache.set(("Pune",), 1)
+    assert cache.get(("Pune",)) is None
+    stats = cache.stats()
+    assert (stats["errors"], stats["skipped_while_failing"], stats["misses"]) == (1, 2, 3)
+
+    # After the interval the next call tries again and, with the store back, recovers
+    cache.port = redis_server.server_address[1]
+    time.sleep(0.25)
+    cache.set(("Pune",), 1)
+    assert cache.get(("Pune",)) == 1
+    assert cache.stats()["errors"] == 1
+
+
+def test_dropped_connection_is_reopened(redis_server):
+    cache = RedisCache(redis_server.url, "weather")
+    cache.retry_interval = 0
+    cache.set(("Pune",), 1)
+    cache._local.connection.sock.shutdown(socket.SHUT_RDWR)
+    assert cache.get(("Pune",)) is None  # the failed read counts as a miss
+    assert cache.get(("Pune",)) == 1
+    assert cache.stats()["errors"] == 1
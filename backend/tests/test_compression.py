@@ -0,0 +1,188 @@
+import gzip
+import os
+import types
+
+import pytest
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request, Response
+
+import compression
+from compression import Precompressed, compress_response
+from static_site import IMMUTABLE, REVALIDATE, StaticBuild, write_compressed
+
+BODY = b'{"crop": "Rice", "steps": ["' + b"Transplant seedlings 20-25 days old. " * 200 + b'"]}'
+
+
+def make_request(accept_encoding=None, if_none_match=None):
+    headers = {}
+    if accept_encoding is not None:
+        headers["Accept-Encoding"] = accept_encoding
+    if if_none_match is not None:
+        headers["If-None-Match"] = if_none_match
+    return Request(EnvironBuilder(headers=headers).get_environ())
+
+
+def encodings(accept_encoding):
+    return make_request(accept_encoding).accept_encodings
+
+
+@pytest.fixture
+def payload():
+    # A fake "br" variant smaller than the real gzip one, so the tests don't need the brotli package
+    return Precompressed(BODY, encoded={"br": b"br" * 10}, encodings=("gzip",))
+
+
+def test_variants_and_versions(payload):
+    assert set(payload.variants) == {"identity", "gzip", "br"}
+    assert gzip.decompress(payload.variants["gzip"][0]) == BODY
+    assert payload.variants["gzip"][1] == f"{payload.version}-gzip"
+    assert Precompressed(BODY).version == payload.version  # the version only depends on the body
+    # Variants that don't come out smaller aren't kept
+    assert set(Precompressed(b"{}", encodings=("gzip",)).variants) == {"identity"}
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    (None, "identity"),
+    ("", "identity"),
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),  # same q-value: the smallest
+    ("br;q=0.5, gzip", "gzip"),  # a higher q-value wins over a smaller body
+    ("gzip;q=0.2, br;q=0.8", "br"),
+    ("br;q=0, gzip", "gzip"),  # q=0 means not acceptable
+    ("br;q=0, gzip;q=0", "identity"),
+    ("*", "br"),
+    ("*;q=0.1, gzip", "gzip"),
+    ("deflate, compress", "identity"),
+])
+def test_select_honours_q_values(payload, accept_encoding, expected):
+    encoding, body, etag = payload.select(encodings(accept_encoding))
+    assert encoding == expected
+    assert (body, etag) == payload.variants[expected]
+
+
+def test_response_headers(payload):
+    response = payload.response(make_request("gzip"), "no-cache")
+    assert response.status_code == 200
+    assert response.get_data() == payload.variants["gzip"][0]
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == f'"{payload.version}-gzip"'
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert response.headers["Vary"] == "Accept-Encoding"
+
+    response = payload.response(make_request(), "no-cache")
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data() == BODY
+
+    # With only identity there is nothing to vary on
+    assert "Vary" not in Precompressed(b"{}", encodings=()).response(make_request("gzip"), "no-cache").headers
+
+
+@pytest.mark.parametrize("if_none_match, status", [
+    ('"{version}-gzip"', 304),
+    ('W/"{version}-gzip"', 304),
+    ('"other", "{version}-gzip"', 304),
+    ("*", 304),
+    ('"{version}"', 200),  # the identity ETag doesn't match the gzip variant
+    ('"{version}-br"', 200),
+    ('"stale-gzip"', 200),
+])
+def test_if_none_match_revalidates_per_variant(payload, if_none_match, status):
+    request = make_request("gzip", if_none_match.format(version=payload.version))
+    response = payload.response(request, "no-cache")
+    assert response.status_code == status
+    assert response.headers["ETag"] == f'"{payload.version}-gzip"'
+    if status == 304:
+        assert response.get_data() == b"" and "Content-Encoding" not in response.headers
+
+
+def test_brotli_is_optional(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    assert compression.available_encodings() == ("gzip",)
+    assert set(Precompressed(BODY).variants) == {"identity", "gzip"}
+    with pytest.raises(ValueError):
+        compression.compress(BODY, "br")
+
+
+def api_response(body=BODY, mimetype="application/json", status=200):
+    return Response(body, status=status, mimetype=mimetype)
+
+
+@pytest.mark.parametrize("accept_encoding, expected", [
+    (None, None),
+    ("gzip", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("identity", None),
+])
+def test_compress_response_negotiates(accept_encoding, expected):
+    response = compress_response(api_response(), encodings(accept_encoding), min_bytes=1024)
+    assert response.headers.get("Content-Encoding") == expected
+    assert response.headers["Vary"] == "Accept-Encoding"
+    if expected == "gzip":
+        assert gzip.decompress(response.get_data()) == BODY
+
+
+def test_compress_response_prefers_higher_q_values(monkeypatch):
+    fake_brotli = types.SimpleNamespace(compress=lambda body, quality: b"br")
+    monkeypatch.setattr(compression, "brotli", fake_brotli)
+    for accept_encoding, expected in (("gzip, br", "br"), ("br;q=0.5, gzip", "gzip"), ("gzip;q=0.5, br", "br")):
+        response = compress_response(api_response(), encodings(accept_encoding), min_bytes=1024)
+        assert response.headers["Content-Encoding"] == expected, accept_encoding
+
+
+@pytest.mark.parametrize("response", [
+    api_response(b"{}"),  # below min_bytes
+    api_response(mimetype="image/png"),
+    api_response(status=304),
+])
+def test_compress_response_leaves_some_responses_alone(response):
+    compress_response(response, encodings("gzip"), min_bytes=1024)
+    assert "Content-Encoding" not in response.headers
+
+
+def test_compress_response_leaves_negotiated_responses_alone(payload):
+    # A Precompressed response carries an ETag and picked its own encoding
+    response = payload.response(make_request("identity"), "no-cache")
+    compress_response(response, encodings("gzip"), min_bytes=1024)
+    assert "Content-Encoding" not in response.headers
+    assert response.get_data() == BODY
+
+
+@pytest.fixture
+def build(tmp_path):
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "index.html").write_text("<!doctype html><div id=root></div>" + "<!-- padding -->" * 100)
+    (tmp_path / "static" / "js" / "main.86e6a220.js").write_text("console.log('app');" * 200)
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG" + bytes(range(256)) * 8)
+    return tmp_path
+
+
+def test_static_build_serves_cached_variants(build):
+    site = StaticBuild(str(build))
+    response = site.response(make_request("gzip"), "static/js/main.86e6a220.js")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Cache-Control"] == IMMUTABLE
+    etag = response.headers["ETag"]
+    assert site.response(make_request("gzip", etag), "/static/js/main.86e6a220.js").status_code == 304
+
+    # App routes get index.html; missing files with an extension are not found
+    response = site.response(make_request(), "/result")
+    assert response.headers["Cache-Control"] == REVALIDATE
+    assert response.get_data() == (build / "index.html").read_bytes()
+    assert site.response(make_request(), "/missing.js") is None
+
+    # Images are served as they are
+    assert "Content-Encoding" not in site.response(make_request("gzip"), "logo.png").headers
+
+
+def test_static_build_uses_current_precompressed_files(build):
+    script = build / "static" / "js" / "main.86e6a220.js"
+    assert write_compressed(str(build)) >= 2
+    (build / "index.html.gz").write_bytes(b"stale")
+    os.utime(build / "index.html.gz", (0, 0))  # older than index.html: ignored
+    script.with_name(script.name + ".gz").write_bytes(b"prebuilt")
+
+    site = StaticBuild(str(build))
+    assert site.response(make_request("gzip"), "static/js/main.86e6a220.js").get_data() == b"prebuilt"
+    index = site.response(make_request("gzip"), "index.html").get_data()
+    assert gzip.decompress(index) == (build / "index.html").read_bytes()
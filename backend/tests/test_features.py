@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FeatureAssembler
+
+
+def original_features(artifacts, rainfall, area, district, season, soil, crop):
+    """The pre-FeatureAssembler /predict path: encoders -> DataFrame -> scaler.transform"""
+    encoder_district, encoder_season, encoder_soil = artifacts["encoders"]
+    crop_categories = artifacts["crop_categories"]
+    district_encoded = encoder_district.transform([[district]])[0][0]
+    season_encoded = encoder_season.transform([[season]])[0][0]
+    soil_encoded = encoder_soil.transform([[soil]])[0][0]
+    crop_input = {category: 0 for category in crop_categories}
+    if "Crop_" + crop in crop_input:
+        crop_input["Crop_" + crop] = 1
+    input_features = np.array(
+        [rainfall, area, district_encoded, season_encoded, soil_encoded] + list(crop_input.values())
+    ).reshape(1, -1)
+    feature_names = ["Rainfall", "Area", "District_Name", "Season_Encoded", "Soil_Quality_Encoded"] + crop_categories
+    return artifacts["scaler"].transform(pd.DataFrame(input_features, columns=feature_names))
+
+
+@pytest.fixture(scope="module")
+def assembler(yield_artifacts):
+    return FeatureAssembler(*yield_artifacts["encoders"], yield_artifacts["scaler"], yield_artifacts["crop_categories"])
+
+
+@pytest.fixture(scope="module")
+def records(assembler, yield_artifacts):
+    """Random records plus edge cases: unknown crop, numeric strings, Area 0, zero rainfall"""
+    rng = np.random.default_rng(0)
+    districts = list(assembler.district_codes)
+    seasons = list(assembler.season_codes)
+    soils = list(assembler.soil_codes)
+    crops = [category[len("Crop_"):] for category in yield_artifacts["crop_categories"]] + ["Wheat", ""]
+    records = []
+    for _ in range(1000):
+        decimals = int(rng.integers(0, 4))
+        records.append([
+            round(float(rng.uniform(0, 5000)), decimals),
+            round(float(rng.uniform(0, 500)), decimals),
+            districts[rng.integers(len(districts))],
+            seasons[rng.integers(len(seasons))],
+            soils[rng.integers(len(soils))],
+            crops[rng.integers(len(crops))],
+        ])
+    records += [
+        [1200.5, 0, districts[0], seasons[0], soils[0], "Rice"],
+        [0, 0.0, districts[-1], seasons[-1], soils[-1], "Wheat"],
+        ["850", "7", districts[1], seasons[1], soils[1], "Cotton"],
+        ["1234.56", "0", districts[2], seasons[2], soils[2], "Unknown crop"],
+        [1e-6, 1e6, districts[3], seasons[0], soils[2], "Sugarcane"],
+    ]
+    return records
+
+
+def test_row_matches_original(assembler, yield_artifacts, records):
+    for record in records:
+        expected = original_features(yield_artifacts, *record)
+        assert assembler.row(*record).tobytes() == expected.tobytes(), record
+
+
+def test_matrix_matches_original(assembler, yield_artifacts, records):
+    rainfall = np.array([float(record[0]) for record in records])
+    area = np.array([float(record[1]) for record in records])
+    codes = [assembler.encode(*record[2:]) for record in records]
+    expected = np.vstack([original_features(yield_artifacts, *record) for record in records])
+    assert assembler.matrix(rainfall, area, codes).tobytes() == expected.tobytes()
+
+
+def test_crop_variants_match_original(assembler, yield_artifacts, records):
+    for record in records[::50] + records[-5:]:
+        crops, features = assembler.crop_variants(*record[:5])
+        assert crops == [category[len("Crop_"):] for category in yield_artifacts["crop_categories"]]
+        expected = np.vstack([original_features(yield_artifacts, *record[:5], crop) for crop in crops])
+        assert features.tobytes() == expected.tobytes(), record
+
+
+def test_booster_predictions_match_original(assembler, yield_artifacts, records):
+    model = yield_artifacts["model"]
+    booster = model.get_booster()
+    expected = np.concatenate([model.predict(original_features(yield_artifacts, *record)) for record in records])
+
+    single = np.concatenate([
+        booster.inplace_predict(assembler.row(*record), validate_features=False) for record in records
+    ])
+    assert single.tobytes() == expected.tobytes()
+
+    rainfall = np.array([float(record[0]) for record in records])
+    area = np.array([float(record[1]) for record in records])
+    codes = [assembler.encode(*record[2:]) for record in records]
+    batch = booster.inplace_predict(assembler.matrix(rainfall, area, codes), validate_features=False)
+    assert batch.tobytes() == expected.tobytes()
+
+
+@pytest.mark.parametrize("field, value", [("Rainfall", "nan"), ("Area", float("inf")), ("Rainfall", "abc")])
+def test_row_rejects_non_finite_and_non_numeric(assembler, records, field, value):
+    record = list(records[0])
+    record[0 if field == "Rainfall" else 1] = value
+    with pytest.raises(ValueError):
+        assembler.row(*record)
+
+
+def test_encode_rejects_unknown_categories(assembler, records):
+    district, season, soil = records[0][2:5]
+    for bad in (("Nowhere", season, soil), (district, "Monsoon", soil), (district, season, "Excellent")):
+        with pytest.raises(ValueError):
+            assembler.encode(*bad, "Rice")
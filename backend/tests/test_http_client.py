@@ -0,0 +1,177 @@
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+from http_client import CircuitOpenError, UpstreamClient
+from weather import WeatherService, WeatherServiceUnavailable
+
+@pytest.fixture
+def unaccepting_address():
+    """An address whose accept queue is full, so new connections never complete"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(0)
+    fillers = []
+    for _ in range(4):
+        filler = socket.socket()
+        filler.setblocking(False)
+        filler.connect_ex(listener.getsockname())
+        fillers.append(filler)
+    time.sleep(0.1)
+    yield listener.getsockname()
+    for sock in fillers + [listener]:
+        sock.close()
+
+
+def make_client(url, **kwargs):
+    options = dict(connect_timeout=0.3, read_timeout=0.3, failure_threshold=3, reset_timeout=0.3)
+    options.update(kwargs)
+    return UpstreamClient("stub", url, **options)
+
+
+def test_read_timeout_is_separate_from_connect_timeout(upstream):
+    client = make_client(upstream.url, connect_timeout=5, read_timeout=0.3)
+    upstream.delay = 2
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.get()
+    assert time.perf_counter() - start < 1.5
+    stats = client.stats()
+    assert (stats["requests"], stats["errors"], stats["timeouts"]) == (1, 1, 1)
+
+
+def test_connect_timeout_is_separate_from_read_timeout(unaccepting_address):
+    host, port = unaccepting_address
+    client = make_client(f"http://{host}:{port}/", connect_timeout=0.3, read_timeout=10)
+    start = time.perf_counter()
+    with pytest.raises(requests.exceptions.ConnectTimeout):
+        client.get()
+    assert time.perf_counter() - start < 2
+    assert client.stats()["timeouts"] == 1
+
+
+@pytest.mark.parametrize("failure", ["5xx", "timeout"])
+def test_repeated_failures_open_the_circuit(upstream, failure):
+    client = make_client(upstream.url, reset_timeout=30)
+    if failure == "5xx":
+        upstream.status = 503
+    else:
+        upstream.delay = 1
+    for _ in range(3):
+        if failure == "5xx":
+            assert client.get().status_code == 503
+        else:
+            with pytest.raises(requests.exceptions.Timeout):
+                client.get()
+    assert client.breaker.state == "open"
+
+    # Open: calls fail fast without reaching the upstream
+    start = time.perf_counter()
+    with pytest.raises(CircuitOpenError):
+        client.get()
+    assert time.perf_counter() - start < 0.05
+    assert upstream.requests == 3
+    stats = client.stats()
+    assert (stats["circuit"], stats["circuit_opened"], stats["rejected"]) == ("open", 1, 1)
+
+
+def test_4xx_does_not_count_as_failure(upstream):
+    client = make_client(upstream.url)
+    upstream.status = 400
+    for _ in range(5):
+        assert client.get().status_code == 400
+    stats = client.stats()
+    assert (stats["circuit"], stats["errors"], stats["consecutive_failures"]) == ("closed", 0, 0)
+
+
+def test_half_open_lets_one_trial_through(upstream):
+    client = make_client(upstream.url)
+    upstream.status = 500
+    for _ in range(3):
+        client.get()
+    assert client.breaker.state == "open"
+
+    # After the cool-down one trial call goes out; concurrent calls still fail fast
+    time.sleep(0.35)
+    upstream.status, upstream.delay = 200, 0.2
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(client.get().status_code)
+        except CircuitOpenError:
+            outcomes.append("rejected")
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(outcomes, key=str) == [200, "rejected", "rejected", "rejected"]
+    assert upstream.requests == 4
+    # The successful trial closed the circuit
+    assert client.breaker.state == "closed"
+    assert client.get().status_code == 200
+
+
+def test_failed_trial_reopens_the_circuit(upstream):
+    client = make_client(upstream.url)
+    upstream.status = 500
+    for _ in range(3):
+        client.get()
+    time.sleep(0.35)
+    assert client.get().status_code == 500  # the trial
+    assert client.breaker.state == "open"
+    assert client.stats()["circuit_opened"] == 2
+    with pytest.raises(CircuitOpenError):
+        client.get()
+    assert upstream.requests == 4
+
+
+def test_latency_and_error_metrics(upstream):
+    client = make_client(upstream.url, failure_threshold=100)
+    upstream.delay = 0.05
+    for _ in range(8):
+        client.get()
+    upstream.status = 502
+    for _ in range(2):
+        client.get()
+    stats = client.stats()
+    assert (stats["requests"], stats["errors"], stats["timeouts"], stats["rejected"]) == (10, 2, 0, 0)
+    assert stats["error_rate"] == 0.2
+    latency = stats["latency_ms"]
+    assert 50 <= latency["p50"] <= latency["p95"] <= latency["max"] < 1000
+
+
+def test_keep_alive_connection_is_reused(upstream):
+    client = make_client(upstream.url)
+    for _ in range(5):
+        assert client.get().status_code == 200
+    assert (upstream.requests, len(upstream.connections)) == (5, 1)
+
+
+def test_weather_falls_back_to_last_known_while_circuit_is_open(upstream):
+    client = make_client(upstream.url, reset_timeout=30)
+    # ttl 0: every lookup goes upstream, so only the fallback can answer from cache
+    service = WeatherService(ttl=0, stale_ttl=0, client=client)
+    weather = service.current("Pune")
+    assert (weather["temperature"], weather["cache"]) == (31.5, "miss")
+
+    upstream.status = 500
+    for _ in range(3):
+        weather = service.current("Pune")
+        assert (weather["temperature"], weather["cache"]) == (31.5, "last-known")
+    assert client.breaker.state == "open"
+
+    requests_before = upstream.requests
+    weather = service.current("Pune")
+    assert (weather["temperature"], weather["cache"]) == (31.5, "last-known")
+    assert upstream.requests == requests_before  # served without calling out
+
+    # No last-known data for another district: 503 instead of a stalled request
+    with pytest.raises(WeatherServiceUnavailable) as error:
+        service.current("Nagpur")
+    assert error.value.status_code == 503
@@ -0,0 +1,65 @@
+import pytest
+
+from model_store import ArtifactUnavailable, ModelStore
+
+
+class CountingLoader:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_none_result_is_loaded_once():
+    store = ModelStore()
+    loader = CountingLoader(result=None)
+    store.register("optional", loader, required=False)
+    assert store.get("optional") is None
+    assert store.get("optional") is None
+    assert loader.calls == 1
+    assert store.status()["artifacts"]["optional"]["loaded"]
+
+
+def test_failed_load_is_not_retried_within_the_interval(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("model_store.time.monotonic", lambda: now[0])
+    store = ModelStore(retry_interval=30)
+    loader = CountingLoader(error=OSError("missing file"))
+    store.register("broken", loader, required=False)
+
+    with pytest.raises(OSError):
+        store.get("broken")
+    for _ in range(3):
+        with pytest.raises(ArtifactUnavailable, match="missing file"):
+            store.get("broken")
+    assert loader.calls == 1
+    assert store.status()["artifacts"]["broken"]["error"] == "missing file"
+
+    # Retried once the interval has passed, and cached once it succeeds
+    now[0] += 30
+    loader.error, loader.result = None, "model"
+    assert store.get("broken") == "model"
+    assert store.get("broken") == "model"
+    assert loader.calls == 2
+    assert store.status()["artifacts"]["broken"]["error"] is None
+
+
+def test_release_reloads_and_clears_a_failure():
+    store = ModelStore(retry_interval=30)
+    loader = CountingLoader(error=ValueError("bad"))
+    store.register("artifact", loader)
+    with pytest.raises(ValueError):
+        store.get("artifact")
+    loader.error, loader.result = None, 1
+    store.release("artifact")
+    assert store.get("artifact") == 1
+    loader.result = 2
+    store.release("artifact")
+    assert store.get("artifact") == 2
+    assert loader.calls == 3
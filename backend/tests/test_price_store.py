@@ -0,0 +1,221 @@
+import csv
+import os
+import shutil
+import threading
+from datetime import date
+
+import numpy as np
+import pytest
+
+import price_store
+
+from price_store import DAILY_DTYPE, PriceStore, build_daily, ingest, to_day
+
+HEADER = ["State", "District", "Market", "Commodity", "Variety", "Arrival_Date",
+          "Min_x0020_Price", "Max_x0020_Price", "Modal_x0020_Price"]
+
+
+def write_csv(path, rows):
+    """rows: (state, market, commodity, dd/mm/yyyy, min, max, modal)"""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for state, market, commodity, day, low, high, modal in rows:
+            writer.writerow([state, f"{market} district", market, commodity, "Other", day, low, high, modal])
+    return str(path)
+
+
+def versions(store_path):
+    prefix = os.path.basename(store_path) + ".v"
+    return sorted(name for name in os.listdir(os.path.dirname(store_path)) if name.startswith(prefix))
+
+
+def test_ingest_repoints_a_symlink_and_keeps_the_previous_version(tmp_path):
+    store_path = str(tmp_path / "prices")
+    ingest([write_csv(tmp_path / "a.csv", [("Maharashtra", "Pune", "Wheat", "01/01/2024", 2000, 2400, 2200)])], store_path)
+    assert os.path.islink(store_path)
+    first = os.path.realpath(store_path)
+    store = PriceStore(store_path)
+
+    ingest([write_csv(tmp_path / "b.csv", [("Maharashtra", "Pune", "Wheat", "02/01/2024", 2100, 2500, 2300)])], store_path)
+    assert store.changed()
+    assert os.path.isdir(first) and len(versions(store_path)) == 2
+    assert len(PriceStore(store_path)) == 2
+
+    ingest([write_csv(tmp_path / "c.csv", [("Maharashtra", "Pune", "Wheat", "03/01/2024", 2100, 2500, 2300)])], store_path)
+    assert not os.path.exists(first)  # only the current and the previous version are kept
+    assert len(versions(store_path)) == 2
+    assert len(store) == 1  # an open store keeps reading its own version
+
+
+def test_store_from_before_versioning_is_moved_aside(tmp_path):
+    store_path = str(tmp_path / "prices")
+    ingest([write_csv(tmp_path / "a.csv", [("Maharashtra", "Pune", "Wheat", "01/01/2024", 2000, 2400, 2200)])], store_path)
+    legacy = os.path.realpath(store_path)
+    os.remove(store_path)
+    shutil.move(legacy, store_path)
+
+    ingest([write_csv(tmp_path / "b.csv", [("Maharashtra", "Pune", "Wheat", "02/01/2024", 2100, 2500, 2300)])], store_path)
+    assert os.path.islink(store_path)
+    assert len(PriceStore(store_path)) == 2
+    assert versions(store_path)[0] == "prices.v0"
+
+
+def test_store_path_is_never_missing_during_the_swap(tmp_path, monkeypatch):
+    store_path = str(tmp_path / "prices")
+    ingest([write_csv(tmp_path / "a.csv", [("Maharashtra", "Pune", "Wheat", "01/01/2024", 2000, 2400, 2200)])], store_path)
+    replace, seen = os.replace, []
+
+    def checked_replace(src, dst):
+        replace(src, dst)
+        seen.append(len(PriceStore(store_path)))
+
+    monkeypatch.setattr(price_store.os, "replace", checked_replace)
+    ingest([write_csv(tmp_path / "b.csv", [("Maharashtra", "Pune", "Wheat", "02/01/2024", 2100, 2500, 2300)])], store_path)
+    assert seen == [2]
+
+
+def test_stores_opened_while_ingesting_are_complete(tmp_path):
+    store_path = str(tmp_path / "prices")
+    ingest([write_csv(tmp_path / "a.csv", [("Maharashtra", "Pune", "Wheat", "01/01/2024", 2000, 2400, 2200)])], store_path)
+    paths = [
+        write_csv(tmp_path / f"{i}.csv", [("Maharashtra", "Pune", "Wheat", f"{i + 2:02d}/01/2024", 2000, 2400, 2200)])
+        for i in range(25)
+    ]
+    stop, errors, opened = threading.Event(), [], []
+
+    def read():
+        while not stop.is_set():
+            try:
+                opened.append(len(PriceStore(store_path)))
+            except Exception as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    try:
+        for path in paths:
+            ingest([path], store_path)
+    finally:
+        stop.set()
+        reader.join()
+    assert errors == []
+    assert opened == sorted(opened) and opened[-1] <= 26
+
+
+WHEAT = [
+    ("Maharashtra", "Pune", "Wheat", "01/01/2024", 2000, 2400, 2200),
+    ("Madhya Pradesh", "Indore", "Wheat", "01/01/2024", 1900, 2300, 2100),
+    ("Maharashtra", "Pune", "Wheat", "03/01/2024", 2100, 2500, 2300),
+    ("Madhya Pradesh", "Indore", "Wheat", "07/01/2024", 2000, 2400, 2200),  # a Sunday
+    ("Maharashtra", "Pune", "Wheat", "08/01/2024", 2200, 2600, 2400),
+    ("Madhya Pradesh", "Indore", "Wheat", "05/02/2024", 2300, 2700, 2500),
+]
+
+
+@pytest.fixture
+def wheat_store(tmp_path):
+    store_path = str(tmp_path / "prices")
+    ingest([write_csv(tmp_path / "wheat.csv", WHEAT)], store_path)
+    return PriceStore(store_path)
+
+
+def series(result):
+    return [(point["date"], point["price"], point["reports"]) for point in result["series"]]
+
+
+def test_query_buckets_by_day_week_and_month(wheat_store):
+    day = wheat_store.query("Wheat", interval="day")
+    assert series(day) == [
+        ("2024-01-01", 2150, 2), ("2024-01-03", 2300, 1), ("2024-01-07", 2200, 1),
+        ("2024-01-08", 2400, 1), ("2024-02-05", 2500, 1),
+    ]
+    assert (day["reports"], day["markets"], day["minimum_price"], day["maximum_price"]) == (6, 2, 1900.0, 2700.0)
+    assert day["change_percent"] == pytest.approx((2500 - 2150) / 2150 * 100)
+
+    # Weeks start on Monday, so Sunday the 7th is in the week of the 1st
+    week = wheat_store.query("Wheat", interval="week")
+    assert series(week) == [("2024-01-01", 2200, 4), ("2024-01-08", 2400, 1), ("2024-02-05", 2500, 1)]
+    assert week["change_percent"] == pytest.approx((2500 - 2200) / 2200 * 100)
+
+    month = wheat_store.query("Wheat", interval="month")
+    assert series(month) == [("2024-01-01", 2240, 5), ("2024-02-05", 2500, 1)]
+    assert month["change_percent"] == pytest.approx((2500 - 2240) / 2240 * 100)
+
+
+def test_query_filters_by_range_state_and_market(wheat_store):
+    result = wheat_store.query("wheat", start=date(2024, 1, 2), end=date(2024, 1, 8))
+    assert series(result) == [("2024-01-03", 2300, 1), ("2024-01-07", 2200, 1), ("2024-01-08", 2400, 1)]
+
+    result = wheat_store.query("Wheat", state="maharashtra")
+    assert series(result) == [("2024-01-01", 2200, 1), ("2024-01-03", 2300, 1), ("2024-01-08", 2400, 1)]
+    assert result["change_percent"] == pytest.approx((2400 - 2200) / 2200 * 100)
+
+    result = wheat_store.query("Wheat", market="Indore", interval="month")
+    assert series(result) == [("2024-01-01", 2150, 2), ("2024-02-05", 2500, 1)]
+
+    assert wheat_store.query("Wheat", start=date(2025, 1, 1)) is None
+    assert wheat_store.query("Wheat", state="Punjab") is None
+    with pytest.raises(ValueError):
+        wheat_store.query("Wheat", interval="year")
+
+
+def test_change_percent_of_a_single_interval_is_zero(wheat_store):
+    result = wheat_store.query("Wheat", end=date(2024, 1, 7), interval="week")
+    assert len(result["series"]) == 1
+    assert result["change_percent"] == 0.0
+
+
+def assert_daily_equal(actual, expected):
+    assert len(actual) == len(expected)
+    for name in DAILY_DTYPE.names:
+        np.testing.assert_array_equal(actual[name], expected[name], err_msg=name)
+
+
+def full_rebuild(store):
+    return build_daily(store.columns, store.crop_offsets, store.market_state_codes)
+
+
+def test_incremental_daily_aggregates_match_a_full_rebuild(tmp_path):
+    store_path = str(tmp_path / "prices")
+    ingest([write_csv(tmp_path / "wheat.csv", WHEAT)], store_path)
+    before = np.array(PriceStore(store_path).daily)
+
+    # Replaces the Pune report of Jan 3rd, adds a day, and brings in a new crop and state
+    update = [
+        ("Maharashtra", "Pune", "Wheat", "03/01/2024", 2500, 2900, 2700),
+        ("Maharashtra", "Pune", "Wheat", "06/02/2024", 2400, 2800, 2600),
+        ("Punjab", "Khanna", "Paddy(Dhan)(Common)", "03/01/2024", 1800, 2200, 2000),
+    ]
+    ingest([write_csv(tmp_path / "update.csv", update)], store_path)
+    store = PriceStore(store_path)
+    assert os.path.exists(os.path.join(store.version_path, "daily.npy"))
+    assert_daily_equal(store.daily, full_rebuild(store))
+
+    # Days outside the update's range are carried over, not recomputed
+    wheat = store.crop_index["wheat"]
+    outside = (store.daily["crop"] == wheat) & (store.daily["date"] < to_day(date(2024, 1, 3)))
+    kept = (before["crop"] == wheat) & (before["date"] < to_day(date(2024, 1, 3)))
+    assert_daily_equal(store.daily[outside], before[kept])
+
+    summary = store.summary("Wheat", start=date(2024, 1, 3), end=date(2024, 1, 3), state="Maharashtra")
+    assert (summary["reports"], summary["average_price"]) == (1, 2700.0)
+    assert store.summary("Rice")["reports"] == 1
+
+
+def test_summary_matches_a_daily_query(wheat_store):
+    for state in (None, "Maharashtra", "Madhya Pradesh"):
+        for start, end in ((None, None), (date(2024, 1, 2), date(2024, 1, 8)), (date(2024, 1, 8), None)):
+            summary = wheat_store.summary("Wheat", start, end, state)
+            query = wheat_store.query("Wheat", start, end, state)
+            for key in ("start", "end", "reports", "minimum_price", "maximum_price", "series"):
+                assert summary[key] == query[key], (state, start, end, key)
+            assert summary["average_price"] == pytest.approx(query["average_price"])
+            assert summary["change_percent"] == pytest.approx(query["change_percent"])
+    assert wheat_store.summary("Wheat", start=date(2025, 1, 1)) is None
+
+
+def test_store_without_daily_aggregates_builds_them_on_open(tmp_path, wheat_store):
+    expected = np.array(wheat_store.daily)
+    os.remove(os.path.join(wheat_store.version_path, "daily.npy"))
+    assert_daily_equal(PriceStore(wheat_store.path).daily, expected)
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Abort(BaseException):
+    """Stands in for KeyboardInterrupt/SystemExit raised inside a fetch"""
+
+
+def in_flight_waiter(flights, key):
+    """Start a do() for key that joins the flight already running; returns (thread, outcome)"""
+    outcome = {}
+
+    def wait():
+        try:
+            outcome["value"] = flights.do(key, lambda: "fetched by the waiter")
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=wait, daemon=True)
+    thread.start()
+    return thread, outcome
+
+
+def blocking_fetch(flights, waiter_keys, result):
+    """fn for do_many that lets a waiter join each key before returning or raising result"""
+    def fetch(keys):
+        waiters = [in_flight_waiter(flights, key) for key in waiter_keys]
+        while flights.stats()["coalesced"] < len(waiter_keys):
+            time.sleep(0.001)
+        fetch.waiters = waiters
+        if isinstance(result, BaseException):
+            raise result
+        return result
+    return fetch
+
+
+def test_do_many_fetches_claimed_keys_once():
+    flights = SingleFlight()
+    fetch = blocking_fetch(flights, ["a"], {"a": 1, "b": 2})
+    values, errors = flights.do_many(["a", "b", "a"], fetch)
+    assert values == {"a": 1, "b": 2} and errors == {}
+    thread, outcome = fetch.waiters[0]
+    thread.join(5)
+    assert outcome == {"value": 1}
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_do_many_reports_exceptions_per_key():
+    flights = SingleFlight()
+    failure = RuntimeError("upstream down")
+    fetch = blocking_fetch(flights, ["a"], failure)
+    values, errors = flights.do_many(["a", "b"], fetch)
+    assert values == {} and errors == {"a": failure, "b": failure}
+    thread, outcome = fetch.waiters[0]
+    thread.join(5)
+    assert outcome == {"error": failure}
+
+
+@pytest.mark.parametrize("result", [Abort(), None])
+def test_do_many_resolves_waiters_when_the_fetch_does_not_return(result):
+    # A BaseException from fn, or a non-dict result, must still resolve the claimed
+    # futures and release the keys instead of leaving waiters blocked
+    flights = SingleFlight()
+    fetch = blocking_fetch(flights, ["a", "b"], result)
+    expected = Abort if isinstance(result, Abort) else None
+    if expected:
+        with pytest.raises(Abort):
+            flights.do_many(["a", "b"], fetch)
+    else:
+        values, errors = flights.do_many(["a", "b"], fetch)
+        assert values == {} and set(errors) == {"a", "b"}
+    for thread, outcome in fetch.waiters:
+        thread.join(5)
+        assert not thread.is_alive()
+        assert "error" in outcome
+    assert flights.stats()["in_flight"] == 0
+    assert flights.do("a", lambda: 1) == 1
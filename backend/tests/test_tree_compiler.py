@@ -0,0 +1,160 @@
+import numpy as np
+import pytest
+
+from features import FeatureAssembler
+from tree_compiler import (
+    CompiledForest, booster_split_points, compose_affine, fold_scaler_into_booster, fold_scalers_into_forest,
+    forest_split_bounds, random_inputs
+)
+
+# N, P, K, temperature, humidity, pH, rainfall (as in app.py)
+CROP_RECOMMENDER_INPUT_LOW = [0, 5, 5, 8, 14, 3.5, 20]
+CROP_RECOMMENDER_INPUT_HIGH = [140, 145, 205, 44, 100, 10, 300]
+
+
+def scale(scalers, features):
+    for scaler in scalers:
+        features = scaler.transform(features)
+    return features
+
+
+def typed_near(points):
+    """The points rounded to 0-3 decimals, and one unit either side in the last decimal"""
+    values = []
+    for decimals in range(4):
+        rounded = np.round(points, decimals)
+        values += [rounded, rounded - 10.0 ** -decimals, rounded + 10.0 ** -decimals]
+    return np.concatenate(values)
+
+
+def on_split_points(base, split_points):
+    """Rows of base with one feature moved onto each of that feature's given points"""
+    rows = []
+    for feature, points in split_points.items():
+        block = base[np.arange(len(points)) % len(base)].copy()
+        block[:, feature] = points
+        rows.append(block)
+    return np.vstack(rows)
+
+
+def forest_raw_split_points(forest, scalers):
+    """{feature: split thresholds of every tree} mapped back through the scalers to raw units"""
+    mean, scale_ = compose_affine(scalers)
+    mean = np.broadcast_to(mean, forest.n_features_in_)
+    scale_ = np.broadcast_to(scale_, forest.n_features_in_)
+    points = {}
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        internal = tree.children_left != -1
+        for feature, threshold in zip(tree.feature[internal], tree.threshold[internal]):
+            points.setdefault(int(feature), []).append(threshold * scale_[feature] + mean[feature])
+    return {feature: np.unique(values) for feature, values in points.items()}
+
+
+@pytest.fixture(scope="module")
+def folded_forest(crop_recommender):
+    forest, scalers = crop_recommender
+    return fold_scalers_into_forest(forest, scalers)
+
+
+def test_folded_forest_matches_on_random_inputs(crop_recommender, folded_forest):
+    forest, scalers = crop_recommender
+    split_low, split_high = forest_split_bounds(forest, scalers)
+    inputs = np.vstack([
+        random_inputs(CROP_RECOMMENDER_INPUT_LOW, CROP_RECOMMENDER_INPUT_HIGH, 10000, seed=10),
+        random_inputs(split_low - 1, split_high + 1, 10000, seed=11),
+    ])
+    scaled = scale(scalers, inputs)
+    assert np.array_equal(folded_forest.predict_proba(inputs), forest.predict_proba(scaled))
+    assert np.array_equal(folded_forest.predict(inputs), forest.predict(scaled))
+
+
+def test_folded_forest_matches_on_split_thresholds(crop_recommender, folded_forest):
+    # The folded forest compares float64 inputs with float64 thresholds, so it is
+    # exact for any raw value: on each split point, its float64 neighbours, and the
+    # decimals around it
+    forest, scalers = crop_recommender
+    split_points = {
+        feature: np.concatenate([
+            points, np.nextafter(points, -np.inf), np.nextafter(points, np.inf), typed_near(points)
+        ])
+        for feature, points in forest_raw_split_points(forest, scalers).items()
+    }
+    inputs = on_split_points(
+        random_inputs(CROP_RECOMMENDER_INPUT_LOW, CROP_RECOMMENDER_INPUT_HIGH, 64, seed=12), split_points
+    )
+    scaled = scale(scalers, inputs)
+    assert np.array_equal(folded_forest.predict_proba(inputs), forest.predict_proba(scaled))
+    assert np.array_equal(folded_forest.predict(inputs), forest.predict(scaled))
+
+
+# Around CompiledForest.SMALL_BATCH_ROWS and the predict_proba chunk size (256)
+BATCH_SIZES = [1, 2, 16, 17, 255, 256, 257, 1000, 5000]
+
+
+@pytest.mark.parametrize("rows", BATCH_SIZES)
+def test_compiled_forest_matches_sklearn(crop_recommender, rows):
+    # Plain forest on scaled inputs: float32 inputs and thresholds, like sklearn
+    forest, scalers = crop_recommender
+    compiled = CompiledForest(forest)
+    split_low, split_high = forest_split_bounds(forest, scalers)
+    scaled = scale(scalers, random_inputs(split_low - 1, split_high + 1, rows, seed=rows))
+    assert np.array_equal(compiled.predict_proba(scaled), forest.predict_proba(scaled))
+    assert np.array_equal(compiled.predict(scaled), forest.predict(scaled))
+    assert np.array_equal(compiled.apply(scaled), np.stack(
+        [estimator.tree_.apply(scaled.astype(np.float32)) for estimator in forest.estimators_], axis=1
+    ) + compiled.roots)
+
+
+@pytest.mark.parametrize("rows", BATCH_SIZES)
+def test_folded_forest_matches_sklearn_at_batch_sizes(crop_recommender, folded_forest, rows):
+    forest, scalers = crop_recommender
+    inputs = random_inputs(CROP_RECOMMENDER_INPUT_LOW, CROP_RECOMMENDER_INPUT_HIGH, rows, seed=100 + rows)
+    assert np.array_equal(folded_forest.predict(inputs), forest.predict(scale(scalers, inputs)))
+
+
+def test_compiled_forest_rejects_bad_input(folded_forest):
+    with pytest.raises(ValueError):
+        folded_forest.predict(np.zeros((2, 6)))
+    with pytest.raises(ValueError):
+        folded_forest.predict(np.array([[90, 42, 43, 21, 82, np.nan, 203]]))
+
+
+@pytest.fixture(scope="module")
+def yield_models(yield_artifacts):
+    """(scaled assembler, raw assembler, original booster, booster with the scaler folded in)"""
+    encoders = yield_artifacts["encoders"]
+    crop_categories = yield_artifacts["crop_categories"]
+    scaled = FeatureAssembler(*encoders, yield_artifacts["scaler"], crop_categories)
+    raw = FeatureAssembler(*encoders, None, crop_categories)
+    booster = yield_artifacts["model"].get_booster()
+    return scaled, raw, booster, fold_scaler_into_booster(booster, scaled.mean, scaled.scale)
+
+
+def test_folded_booster_matches_on_random_inputs(yield_models):
+    scaled, raw, booster, compiled = yield_models
+    inputs = raw.random_matrix(20000, seed=20)
+    expected = booster.inplace_predict(scaled.transform(inputs), validate_features=False)
+    assert compiled.inplace_predict(inputs, validate_features=False).tobytes() == expected.tobytes()
+
+
+def test_folded_booster_matches_on_split_thresholds(yield_models):
+    # XGBoost sees float32(x), so every raw input is covered as the decimal that
+    # rounds to its float32: the decimals around each split point, and the shortest
+    # decimals of the two float32s either side of it (see fold_affine_thresholds)
+    scaled, raw, booster, compiled = yield_models
+    split_points = {}
+    for feature, thresholds in booster_split_points(booster).items():
+        points = thresholds.astype(np.float64) * scaled.scale[feature] + scaled.mean[feature]
+        points32 = points.astype(np.float32)
+        below = np.nextafter(points32, np.float32(-np.inf))
+        above = np.nextafter(points32, np.float32(np.inf))
+        float32s = [
+            np.nextafter(below, np.float32(-np.inf)), below, points32, above, np.nextafter(above, np.float32(np.inf))
+        ]
+        split_points[feature] = np.concatenate(
+            [typed_near(points)] + [values.astype(str).astype(np.float64) for values in float32s]
+        )
+    inputs = on_split_points(raw.random_matrix(64, seed=21), split_points)
+    expected = booster.inplace_predict(scaled.transform(inputs), validate_features=False)
+    assert compiled.inplace_predict(inputs, validate_features=False).tobytes() == expected.tobytes()
@@ -0,0 +1,53 @@
+import time
+
+from http_client import UpstreamClient
+from weather import WeatherService
+
+POINTS = {"Pune": (18.52, 73.86), "Nagpur": (21.15, 79.09), "Nashik": (20.0, 73.79)}
+
+
+def make_service(upstream, **kwargs):
+    client = UpstreamClient("stub", upstream.url, connect_timeout=1, read_timeout=1)
+    return WeatherService(POINTS, ttl=60, client=client, **kwargs)
+
+
+def age_entries(service, seconds, names=POINTS):
+    for name in names:
+        key = service.key(*POINTS[name])
+        value, loaded_at = service.cache.store.get(key)
+        service.cache.store.set(key, (value, loaded_at - seconds))
+
+
+def test_prewarm_counts_only_missing_or_stale_points(upstream):
+    service = make_service(upstream)
+    assert service.prewarm() == (3, 3)
+    assert upstream.requests == 1  # one bulk request for all of them
+
+    assert service.prewarm() == (0, 0)  # all fresh: nothing attempted, no request
+    assert upstream.requests == 1
+
+    age_entries(service, 120, ["Nagpur"])
+    assert service.prewarm() == (1, 1)
+    assert upstream.requests == 2
+
+    upstream.status = 500
+    age_entries(service, 120)
+    assert service.prewarm() == (3, 0)
+    assert service.cache.stats()["refresh_errors"] == 1
+
+
+def test_prewarm_dedupes_points_sharing_a_key(upstream):
+    service = make_service(upstream, reference_points={"Pune city": (18.521, 73.859)})
+    assert len(service.reference_points) == 4
+    assert service.prewarm() == (3, 3)
+
+
+def test_prewarm_log_line(upstream, capsys):
+    service = make_service(upstream)
+    service.start_prewarm(interval=60)
+    output = ""
+    deadline = time.monotonic() + 5
+    while "Pre-warmed" not in output and time.monotonic() < deadline:
+        time.sleep(0.01)
+        output += capsys.readouterr().out
+    assert "[Weather Cache] Pre-warmed 3/3 missing or stale reference points" in output
@@ -0,0 +1,408 @@
+import gc
+import json
+
+import numpy as np
+
+
+def fold_affine_thresholds(thresholds, features, mean, scale, compare):
+    """
+    Rewrite split thresholds learned on z = (x - mean) / scale so the same splits
+    apply to raw x.
+
+    thresholds/features are per-node arrays; compare is "lt" (XGBoost: go left if
+    float32(z) < t) or "le" (sklearn: go left if float32(z) <= t). Each new
+    threshold is the float32 boundary v on the raw scale, found by stepping from
+    float32(t * scale + mean) to the exact crossing point, so that float32(x)
+    compared with v picks the same side the original split picked for the scaled
+    value. Requires scale > 0 (a monotone increasing map).
+
+    The model only sees float32(x), so the one float32 whose rounding interval
+    contains the original boundary can't send every raw x in it the way the
+    original did. It follows the interval's shortest decimal (what that float32
+    prints as): typed inputs, and the training values split points come from,
+    are such decimals.
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    mean = np.asarray(mean, dtype=np.float64)[features]
+    scale = np.asarray(scale, dtype=np.float64)[features]
+    if np.any(scale <= 0):
+        raise ValueError("Only increasing affine maps (scale > 0) can be folded into thresholds")
+
+    def goes_right(x32):
+        # Does the shortest decimal that rounds to x32 go right in the original split?
+        x = x32.astype(str).astype(np.float64)
+        z = ((x - mean) / scale).astype(np.float32)
+        return z >= thresholds if compare == "lt" else z > thresholds
+
+    # Candidate, then move it to the smallest float32 x that goes right
+    folded = (thresholds * scale + mean).astype(np.float32)
+    for _ in range(64):
+        below = np.nextafter(folded, np.float32(-np.inf))
+        step_down = goes_right(below)
+        step_up = ~goes_right(folded)
+        if not (step_down.any() or step_up.any()):
+            break
+        folded = np.where(step_down, below, np.where(step_up, np.nextafter(folded, np.float32(np.inf)), folded))
+    else:
+        raise ValueError("Folded thresholds did not converge")
+
+    if compare == "lt":
+        # x < v  <=>  x goes left
+        return folded
+    # x <= v' <=> x goes left, with v' the float32 just below the first x that goes right
+    return np.nextafter(folded, np.float32(-np.inf))
+
+
+def fold_scaler_into_booster(booster, mean, scale):
+    """
+    Return a copy of an XGBoost booster whose numerical split thresholds operate on
+    raw features instead of features standardized as (x - mean) / scale.
+    """
+    import xgboost
+
+    model = json.loads(bytes(booster.save_raw("json")))
+    mean = np.zeros(int(model["learner"]["learner_model_param"]["num_feature"])) if mean is None else mean
+    scale = np.ones(len(mean)) if scale is None else scale
+
+    for tree in model["learner"]["gradient_booster"]["model"]["trees"]:
+        if any(tree["split_type"]):
+            raise ValueError("Categorical splits cannot be folded")
+        left = np.asarray(tree["left_children"])
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+        features = np.asarray(tree["split_indices"])
+        internal = left != -1  # leaves store their value in split_conditions
+        conditions[internal] = fold_affine_thresholds(
+            conditions[internal], features[internal], mean, scale, compare="lt"
+        )
+        tree["split_conditions"] = [float(value) for value in conditions]
+
+    compiled = xgboost.Booster()
+    compiled.load_model(bytearray(json.dumps(model).encode()))
+    return compiled
+
+
+def scaler_affine_params(scaler):
+    """
+    (mean, scale) such that scaler.transform(x) == (x - mean) / scale, for a fitted
+    sklearn StandardScaler or MinMaxScaler (without clipping).
+    """
+    if hasattr(scaler, "data_min_"):
+        if getattr(scaler, "clip", False):
+            raise ValueError("A clipping MinMaxScaler is not affine")
+        # x * scale_ + min_
+        return -scaler.min_ / scaler.scale_, 1 / scaler.scale_
+    n_features = scaler.n_features_in_
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+def compose_affine(scalers):
+    """Single (mean, scale) equivalent to applying the scalers one after another"""
+    mean, scale = 0.0, 1.0
+    for scaler in scalers:
+        step_mean, step_scale = scaler_affine_params(scaler)
+        # ((x - mean) / scale - step_mean) / step_scale
+        mean, scale = mean + step_mean * scale, scale * step_scale
+    return mean, scale
+
+
+def fold_affine_thresholds_float64(thresholds, features, mean, scale):
+    """
+    Rewrite split thresholds of a model that goes left if float32(z) <= t, with
+    z = (x - mean) / scale, into float64 thresholds T on raw x: x goes left iff
+    x <= T. (A float32 threshold can't do this exactly when float32 is coarser in
+    raw units than in scaled units, e.g. rainfall ~200mm scaled to ~0.)
+    """
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    mean = np.asarray(mean, dtype=np.float64)[features]
+    scale = np.asarray(scale, dtype=np.float64)[features]
+    if np.any(scale <= 0):
+        raise ValueError("Only increasing affine maps (scale > 0) can be folded into thresholds")
+
+    def goes_left(x):
+        return ((x - mean) / scale).astype(np.float32) <= thresholds
+
+    # float32(z) <= t holds up to half-way between the largest float32 <= t and the
+    # next float32; map that edge back to raw units, then move to the exact last x
+    below = thresholds.astype(np.float32)
+    below = np.where(below > thresholds, np.nextafter(below, np.float32(-np.inf)), below)
+    edge = (below.astype(np.float64) + np.nextafter(below, np.float32(np.inf)).astype(np.float64)) / 2
+    folded = edge * scale + mean
+    for _ in range(64):
+        above = np.nextafter(folded, np.inf)
+        step_up = goes_left(above)
+        step_down = ~goes_left(folded)
+        if not (step_up.any() or step_down.any()):
+            break
+        folded = np.where(step_up, above, np.where(step_down, np.nextafter(folded, -np.inf), folded))
+    else:
+        raise ValueError("Folded thresholds did not converge")
+    return folded
+
+
+class CompiledForest:
+    """
+    Compact NumPy evaluator for a fitted sklearn random forest classifier.
+
+    Every tree's nodes are concatenated into flat arrays: int16 split features,
+    thresholds, int32 children (interleaved left/right; leaves loop back to
+    themselves) and one float64 class-probability row per leaf. All rows walk all
+    trees in lockstep, one level per step, dropping paths once they reach a leaf.
+
+    A plain forest is evaluated like sklearn, on float32 inputs with float32
+    thresholds (each rounded down, so x <= t is unchanged). Thresholds folded by
+    fold_scalers_into_forest need float64 inputs and thresholds to compare exactly.
+    Probabilities are summed over trees in estimator order and averaged, so they
+    match RandomForestClassifier.predict_proba bit for bit.
+    """
+
+    # Rows at or below this are summed with one cumsum instead of a loop over trees
+    SMALL_BATCH_ROWS = 16
+
+    def __init__(self, forest, thresholds=None):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        if forest.n_features_in_ > np.iinfo(np.int16).max:
+            raise ValueError("Too many features for int16 split indices")
+        self.input_dtype = np.float32 if thresholds is None else np.float64
+        thresholds = thresholds or [tree.threshold for tree in trees]
+        offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+        n_nodes = int(offsets[-1])
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+        self.n_trees = len(trees)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.roots = offsets[:-1].astype(np.int32)
+
+        self.feature = np.zeros(n_nodes, dtype=np.int16)
+        self.threshold = np.zeros(n_nodes, dtype=self.input_dtype)
+        # children[2 * node] is the left child, children[2 * node + 1] the right one
+        self.children = np.repeat(np.arange(n_nodes, dtype=np.int32), 2)
+        self.leaf_index = np.full(n_nodes, -1, dtype=np.int32)
+        leaf_values = []
+        for tree, tree_thresholds, offset in zip(trees, thresholds, offsets):
+            internal = tree.children_left != -1
+            index = np.flatnonzero(internal) + offset
+            self.feature[index] = tree.feature[internal]
+            self.threshold[index] = self._round_down(tree_thresholds[internal])
+            self.children[2 * index] = tree.children_left[internal] + offset
+            self.children[2 * index + 1] = tree.children_right[internal] + offset
+            # Per-leaf class probabilities, normalized like DecisionTreeClassifier.predict_proba
+            value = tree.value[~internal, 0, :]
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0] = 1
+            self.leaf_index[np.flatnonzero(~internal) + offset] = np.arange(len(value)) + sum(map(len, leaf_values))
+            leaf_values.append(value / normalizer)
+        self.leaf_values = np.concatenate(leaf_values)
+        self.is_leaf = self.leaf_index >= 0
+
+    def _round_down(self, thresholds):
+        # Largest threshold of input_dtype <= the original (a no-op for float64)
+        rounded = thresholds.astype(self.input_dtype)
+        return np.where(rounded > thresholds, np.nextafter(rounded, self.input_dtype(-np.inf)), rounded)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (
+            self.roots, self.feature, self.threshold, self.children, self.leaf_index, self.is_leaf, self.leaf_values
+        ))
+
+    def apply(self, X):
+        """Leaf node index reached in each tree, shape (n_rows, n_trees)"""
+        X = np.ascontiguousarray(X, dtype=self.input_dtype)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected {self.n_features_in_} features per row")
+        if not np.isfinite(X).all():
+            raise ValueError("Input contains NaN or infinity")
+        # Flat (row, tree) layout: each path reads its row's feature from the raveled input
+        values = X.ravel()
+        row_offsets = np.repeat(np.arange(len(X)) * X.shape[1], self.n_trees)
+        leaves = np.tile(self.roots, len(X))
+        active = np.arange(len(leaves))
+        nodes = leaves
+        for _ in range(self.max_depth):
+            go_right = values.take(row_offsets.take(active) + self.feature.take(nodes)) > self.threshold.take(nodes)
+            nodes = self.children.take(2 * nodes + go_right)
+            leaves[active] = nodes
+            pending = ~self.is_leaf.take(nodes)
+            if not pending.all():
+                active, nodes = active[pending], nodes[pending]
+                if not len(active):
+                    break
+        return leaves.reshape(len(X), self.n_trees)
+
+    def predict_proba(self, X, chunk_rows=256):
+        # Chunked so the per-level (row, tree) arrays stay cache-sized
+        proba = np.zeros((len(X), len(self.classes_)))
+        for start in range(0, len(X), chunk_rows):
+            leaves = self.leaf_index[self.apply(X[start:start + chunk_rows])]
+            chunk = proba[start:start + chunk_rows]
+            if len(chunk) <= self.SMALL_BATCH_ROWS:
+                # Sequential over trees, same order as the loop below
+                chunk[...] = np.cumsum(self.leaf_values[leaves], axis=1)[:, -1]
+                continue
+            leaves = np.ascontiguousarray(leaves.T)
+            tree_values = np.empty_like(chunk)
+            for tree_leaves in leaves:
+                np.take(self.leaf_values, tree_leaves, axis=0, out=tree_values)
+                chunk += tree_values
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def fold_scalers_into_forest(forest, scalers):
+    """
+    CompiledForest for a fitted sklearn forest classifier whose split thresholds
+    operate on raw features instead of features passed through scalers (in order).
+    """
+    mean, scale = compose_affine(scalers)
+    thresholds = []
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        internal = tree.children_left != -1
+        tree_thresholds = tree.threshold.copy()
+        tree_thresholds[internal] = fold_affine_thresholds_float64(
+            tree.threshold[internal], tree.feature[internal], mean, scale
+        )
+        thresholds.append(tree_thresholds)
+    return CompiledForest(forest, thresholds)
+
+
+def forest_split_bounds(forest, scalers=()):
+    """Per-feature (low, high) range of a forest's split points, in raw feature units"""
+    mean, scale = compose_affine(scalers)
+    low = np.full(forest.n_features_in_, np.inf)
+    high = np.full(forest.n_features_in_, -np.inf)
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        internal = tree.children_left != -1
+        features = tree.feature[internal]
+        raw = tree.threshold[internal] * np.broadcast_to(scale, low.shape)[features] \
+            + np.broadcast_to(mean, low.shape)[features]
+        np.minimum.at(low, features, raw)
+        np.maximum.at(high, features, raw)
+    return low, high
+
+
+def random_inputs(low, high, n, seed=0):
+    """
+    n rows uniform in [low, high] per feature, rounded to 0-3 decimals so values
+    typed into a form (and the training values splits sit between) are covered.
+    """
+    rng = np.random.default_rng(seed)
+    low = np.asarray(low, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    decimals = rng.integers(0, 4, size=(n, len(low)))
+    return np.round(rng.uniform(low, high, size=(n, len(low))) * 10.0 ** decimals) / 10.0 ** decimals
+
+
+def booster_split_points(booster):
+    """
+    {feature index: sorted unique float32 thresholds} over every numerical split of
+    an XGBoost booster. Two inputs with the same count of thresholds <= each
+    feature's value take the same path through every tree.
+    """
+    model = json.loads(bytes(booster.save_raw("json")))
+    split_points = {}
+    for tree in model["learner"]["gradient_booster"]["model"]["trees"]:
+        internal = np.asarray(tree["left_children"]) != -1
+        features = np.asarray(tree["split_indices"])[internal]
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32)[internal]
+        for feature in np.unique(features):
+            split_points.setdefault(int(feature), []).append(conditions[features == feature])
+    return {feature: np.unique(np.concatenate(values)) for feature, values in split_points.items()}
+
+
+def time_forest(forest, scalers, batch_sizes, repeat):
+    """Print median latency of the scalers + forest against the folded forest per batch size"""
+    import time
+
+    def median_ms(fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings)) * 1000
+
+    compiled = fold_scalers_into_forest(forest, scalers)
+    high = np.max([forest_split_bounds(forest, scalers)[1] * 2, np.ones(forest.n_features_in_)], axis=0)
+    inputs = random_inputs(np.zeros(forest.n_features_in_), high, max(batch_sizes))
+    print(f"{'rows':>6} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8}")
+    for rows in batch_sizes:
+        batch = inputs[:rows]
+
+        def original():
+            features = batch
+            for scaler in scalers:
+                features = scaler.transform(features)
+            return forest.predict(features)
+
+        if not np.array_equal(original(), compiled.predict(batch)):
+            raise AssertionError(f"Compiled forest disagrees with the original on {rows} rows")
+        sklearn_ms = median_ms(original)
+        compiled_ms = median_ms(lambda: compiled.predict(batch))
+        print(f"{rows:>6} {sklearn_ms:>11.3f} {compiled_ms:>12.3f} {sklearn_ms / compiled_ms:>7.1f}x")
+
+
+def forest_memory(load_forest, scalers):
+    """Bytes held by a freshly loaded forest and by its folded form (Python objects + NumPy buffers)"""
+    import tracemalloc
+
+    gc.collect()
+    tracemalloc.start()
+    forest = load_forest()
+    gc.collect()
+    # sklearn allocates tree buffers with malloc, out of tracemalloc's sight
+    forest_bytes = tracemalloc.get_traced_memory()[0] + sum(
+        estimator.tree_.__getstate__()["nodes"].nbytes + estimator.tree_.value.nbytes
+        for estimator in forest.estimators_
+    )
+    compiled = fold_scalers_into_forest(forest, scalers)
+    del forest
+    gc.collect()
+    compiled_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del compiled
+    return forest_bytes, compiled_bytes
+
+
+def benchmark_forest(model_path, scaler_paths, batch_sizes, repeat=50):
+    """Latency and memory of a pickled forest + scalers versus its compiled form"""
+    import pickle
+
+    def load_forest():
+        with open(model_path, "rb") as f:
+            return pickle.load(f)
+
+    scalers = []
+    for path in scaler_paths:
+        with open(path, "rb") as f:
+            scalers.append(pickle.load(f))
+
+    time_forest(load_forest(), scalers, batch_sizes, repeat)
+    # Measured on a second load, once the timed forest is gone, so module imports
+    # and the first copy aren't counted
+    forest_bytes, compiled_bytes = forest_memory(load_forest, scalers)
+    print(f"Memory held: {forest_bytes / 2**20:.2f} MiB sklearn forest, "
+          f"{compiled_bytes / 2**20:.2f} MiB compiled")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Model compilation utilities")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    benchmark = subparsers.add_parser("benchmark-forest", help="Compare the crop recommender with its compiled form")
+    benchmark.add_argument("--model", default="model/modelrandclf.pkl")
+    benchmark.add_argument("--scalers", nargs="*", default=["model/minmaxscaler.pkl", "model/standscaler.pkl"],
+                           help="Scalers applied before the forest, in order")
+    benchmark.add_argument("--rows", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    benchmark.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == "benchmark-forest":
+        benchmark_forest(args.model, args.scalers, args.rows, args.repeat)
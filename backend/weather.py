@@ -0,0 +1,366 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+from cache import StaleWhileRevalidateCache
+from geo import ReferencePointIndex, haversine_km
+from http_client import CircuitOpenError, UpstreamClient
+
+
+# District coordinates mapping for Maharashtra
+DISTRICT_COORDS = {
+    "Pune": (18.5204, 73.8567),
+    "Mumbai": (19.0760, 72.8777),
+    "Nagpur": (21.1458, 79.0882),
+    "Aurangabad": (19.8762, 75.3433),
+    "Nashik": (19.9975, 73.7898),
+    "Ahmednagar": (19.0841, 74.7421),
+    "Solapur": (17.6599, 75.9064),
+    "Kolhapur": (16.7050, 73.7331),
+    "Ratnagiri": (16.9891, 73.3128),
+    "Sindhudurg": (16.3975, 73.6675),
+    "Sangli": (16.8507, 74.5627),
+    "Satara": (17.6761, 73.9197),
+    "Yavatmal": (20.4248, 78.1357),
+    "Wardha": (20.7468, 78.6006),
+    "Akola": (20.7136, 77.0066),
+    "Amravati": (20.9517, 77.7597),
+    "Buldhana": (20.5544, 76.1797),
+    "Washim": (20.1033, 76.8157),
+    "Jalgaon": (21.1781, 75.5597),
+    "Dhule": (21.1975, 74.7742),
+    "Nandurbar": (21.3803, 74.2453),
+    "Gondia": (21.4515, 80.1925),
+    "Bhandara": (21.1768, 79.2502),
+    "Chandrapur": (19.2841, 79.3057),
+    "Latur": (18.4088, 76.3764),
+    "Parbhani": (19.2683, 76.7597),
+    "Hingoli": (19.7271, 77.1453),
+    "Vikarabad": (19.2783, 75.1385),
+    "Kannada": (19.2241, 75.5250),
+    "Beed": (19.2183, 75.7597),
+    "Usmanabad": (18.3706, 76.7597),
+    "Indore": (22.7196, 75.8577),
+}
+
+# Open-Meteo forecast endpoint (free, no API key needed)
+OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
+OPEN_METEO_CURRENT_FIELDS = "temperature_2m,relative_humidity_2m,weather_code,wind_speed_10m,pressure_msl"
+
+# Map WMO weather codes to descriptions
+WMO_CODES = {
+    0: "Clear sky", 1: "Partly cloudy", 2: "Partly cloudy", 3: "Overcast",
+    45: "Foggy", 48: "Foggy", 51: "Light drizzle", 53: "Moderate drizzle", 55: "Heavy drizzle",
+    61: "Slight rain", 63: "Moderate rain", 65: "Heavy rain", 71: "Slight snow",
+    73: "Moderate snow", 75: "Heavy snow", 77: "Snow grains", 80: "Slight rain showers",
+    81: "Moderate rain showers", 82: "Violent rain showers", 85: "Slight snow showers",
+    86: "Heavy snow showers", 95: "Thunderstorm", 96: "Thunderstorm with hail",
+    99: "Thunderstorm with hail"
+}
+
+
+class WeatherError(Exception):
+    """Weather could not be retrieved; status_code is the HTTP status to report"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class WeatherAPIError(WeatherError):
+    """Open-Meteo answered with a non-200 status"""
+
+    def __init__(self, status_code):
+        super().__init__(f"Weather API unavailable (status {status_code})", status_code)
+
+
+class WeatherServiceUnavailable(WeatherError):
+    """Open-Meteo's circuit breaker is open and there is no last-known data"""
+
+    def __init__(self, retry_in):
+        super().__init__(f"Weather service temporarily unavailable, retry in {retry_in:.0f}s", 503)
+
+
+class LocationNotFound(WeatherError):
+    """District is not in the coordinates table and no coordinates were given"""
+
+    def __init__(self, district):
+        super().__init__(f"District '{district}' not found", 400)
+
+
+def _error_status(error):
+    """HTTP status to report for a failed upstream lookup"""
+    if isinstance(error, WeatherError):
+        return error.status_code
+    if isinstance(error, requests.exceptions.Timeout):
+        return 504
+    return 503
+
+
+def load_reference_points(path):
+    """Extra weather reference points from a JSON file of {"name": [lat, lon]}; {} when path is empty"""
+    if not path:
+        return {}
+    with open(path) as f:
+        return {name: (float(lat), float(lon)) for name, (lat, lon) in json.load(f).items()}
+
+
+def get_current_season():
+    """Determine current season for Maharashtra"""
+    month = datetime.now().month
+    
+    # Maharashtra farming seasons
+    if month in [6, 7, 8, 9]:  # June-September
+        return "Monsoon (Kharif)"
+    elif month in [10, 11, 12, 1]:  # October-January
+        return "Winter (Rabi)"
+    else:  # February-May
+        return "Summer"
+
+
+class WeatherService:
+    """
+    In-process weather retrieval shared by every route that needs current conditions.
+
+    Locations resolve to coordinates (explicit lat/lon, else the district table).
+    Coordinates within snap_radius_km of a reference point (the district table plus
+    any extra reference_points) use that point's weather, so GPS fixes around a
+    town share one entry; farther ones use their coord_decimals grid cell. Entries
+    are cached by those rounded coordinates, in store when given (e.g. a
+    make_cache() backend shared by all workers) or in process memory. Entries are fresh for
+    ttl seconds and then served stale for up to stale_ttl seconds while a background
+    thread refreshes them; only a true miss waits on Open-Meteo. When that upstream
+    call fails (or its circuit breaker is open), the last-known entry is served
+    regardless of age if there is one.
+    """
+
+    def __init__(self, district_coords=DISTRICT_COORDS, ttl=600, stale_ttl=3600,
+                 max_size=1024, coord_decimals=2, client=None, max_locations_per_request=100, store=None,
+                 reference_points=None, snap_radius_km=0):
+        self.district_coords = district_coords
+        self.reference_points = dict(district_coords, **(reference_points or {}))
+        self.index = ReferencePointIndex(self.reference_points, snap_radius_km) if snap_radius_km > 0 else None
+        self.coord_decimals = coord_decimals
+        self.max_locations_per_request = max_locations_per_request
+        self.client = client or UpstreamClient("open-meteo", OPEN_METEO_URL)
+        self.cache = StaleWhileRevalidateCache(
+            self.fetch, ttl=ttl, stale_ttl=stale_ttl, max_size=max_size, name="Weather Cache", store=store
+        )
+
+    def key(self, lat, lon):
+        """Cache key for a location: coordinates rounded to coord_decimals"""
+        return (round(float(lat), self.coord_decimals), round(float(lon), self.coord_decimals))
+
+    def locate(self, lat, lon):
+        """
+        (key, location) for coordinates: the nearest reference point within
+        snap_radius_km, else the grid cell; location describes where the weather is from
+        """
+        nearest = self.index.nearest(lat, lon) if self.index is not None else None
+        if nearest is not None:
+            name, (point_lat, point_lon), distance = nearest
+            key = self.key(point_lat, point_lon)
+        else:
+            name, key = None, self.key(lat, lon)
+            distance = haversine_km(lat, lon, *key)
+        return key, {"name": name, "latitude": key[0], "longitude": key[1], "distance_km": round(distance, 2)}
+
+    def resolve(self, district='', latitude=None, longitude=None):
+        """Coordinates for a request: explicit lat/lon win, else the district table"""
+        if latitude and longitude:
+            return float(latitude), float(longitude)
+        district_name = (district or '').strip().title()
+        if district_name in self.district_coords:
+            return self.district_coords[district_name]
+        print(f"[Weather API] District not found: {district}")
+        raise LocationNotFound(district)
+
+    def fetch(self, key):
+        """Fetch current conditions for a key() location from Open-Meteo"""
+        lat, lon = key
+
+        print(f"[Weather API] Fetching from Open-Meteo: lat={lat}, lon={lon}")
+        response = self.client.get(params={
+            "latitude": lat,
+            "longitude": lon,
+            "current": OPEN_METEO_CURRENT_FIELDS,
+            "timezone": "Asia/Kolkata",
+        })
+
+        if response.status_code != 200:
+            print(f"[Weather API] API request failed with status {response.status_code}")
+            raise WeatherAPIError(response.status_code)
+        return self._parse(response.json())
+
+    def fetch_many(self, keys):
+        """
+        Fetch several key() locations from Open-Meteo in one request per
+        max_locations_per_request chunk (comma-separated latitude/longitude).
+        Returns {key: weather}.
+        """
+        results = {}
+        for start in range(0, len(keys), self.max_locations_per_request):
+            chunk = keys[start:start + self.max_locations_per_request]
+            print(f"[Weather API] Bulk fetch from Open-Meteo: {len(chunk)} locations")
+            response = self.client.get(params={
+                "latitude": ",".join(str(lat) for lat, _ in chunk),
+                "longitude": ",".join(str(lon) for _, lon in chunk),
+                "current": OPEN_METEO_CURRENT_FIELDS,
+                "timezone": "Asia/Kolkata",
+            })
+            if response.status_code != 200:
+                print(f"[Weather API] Bulk request failed with status {response.status_code}")
+                raise WeatherAPIError(response.status_code)
+
+            # Open-Meteo returns a list for several locations, a single object for one
+            payload = response.json()
+            locations = payload if isinstance(payload, list) else [payload]
+            for key, weather in zip(chunk, locations):
+                results[key] = self._parse(weather)
+        return results
+
+    def _fetch_and_store_many(self, keys):
+        fetched = self.fetch_many(keys)
+        for key, weather in fetched.items():
+            self.cache.put(key, weather)
+        return fetched
+
+    def _parse(self, weather):
+        """Extract the fields we serve from one Open-Meteo location object"""
+        current = weather.get('current', {})
+        weather_code = current.get('weather_code', 0)
+        return {
+            "temperature": round(current.get('temperature_2m', 0), 1),
+            "humidity": current.get('relative_humidity_2m', 0),
+            "wind_speed": round(current.get('wind_speed_10m', 0), 2),
+            "pressure": round(current.get('pressure_msl', 1013), 1),
+            "description": WMO_CODES.get(weather_code, "Unknown"),
+            "weather_code": weather_code,
+            "timezone": weather.get('timezone', 'Asia/Kolkata'),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def current(self, district='', latitude=None, longitude=None):
+        """
+        Current weather payload for a district and/or coordinates, as returned by /api/weather.
+        Raises WeatherError (or requests exceptions on network failure).
+        """
+        lat, lon = self.resolve(district, latitude, longitude)
+        key, location = self.locate(lat, lon)
+        try:
+            weather, cache_status = self.cache.get(key)
+        except (WeatherError, CircuitOpenError, requests.exceptions.RequestException) as e:
+            # Fail fast to last-known data rather than erroring out
+            weather, cache_status = self.cache.peek(key), "last-known"
+            if weather is None:
+                if isinstance(e, CircuitOpenError):
+                    raise WeatherServiceUnavailable(e.retry_in)
+                raise
+        return self._payload(weather, district, lat, lon, cache_status, location)
+
+    def current_many(self, locations):
+        """
+        Current weather for a list of {"district", "latitude", "longitude"} dicts.
+        Cached entries are served from memory and every miss is fetched in a single
+        upstream request. Returns one item per location, in request order; items
+        that could not be served carry "error" and "status_code" instead.
+        """
+        results = [None] * len(locations)
+        pending = {}  # key -> [(index, district, lat, lon), ...]
+        for i, location in enumerate(locations):
+            district = location.get('district', '') if isinstance(location, dict) else ''
+            try:
+                if not isinstance(location, dict):
+                    raise LocationNotFound(location)
+                lat, lon = self.resolve(district, location.get('latitude'), location.get('longitude'))
+                key, weather_location = self.locate(lat, lon)
+            except (TypeError, ValueError) as e:
+                results[i] = {"district": district, "error": f"Invalid coordinates: {e}", "status_code": 400}
+                continue
+            except WeatherError as e:
+                results[i] = {"district": district, "error": str(e), "status_code": e.status_code}
+                continue
+
+            weather, cache_status = self.cache.lookup(key)
+            if weather is not None:
+                results[i] = self._payload(weather, district, lat, lon, cache_status, weather_location)
+            else:
+                pending.setdefault(key, []).append((i, district, lat, lon, weather_location))
+
+        if pending:
+            # Locations another request is already fetching are waited on, not refetched
+            fetched, errors = self.cache.flights.do_many(list(pending), self._fetch_and_store_many)
+            for error in errors.values():
+                if not isinstance(error, (WeatherError, CircuitOpenError, requests.exceptions.RequestException)):
+                    raise error
+
+            for key, requests_for_key in pending.items():
+                weather, cache_status, error = fetched.get(key), "miss", errors.get(key)
+                if weather is None:
+                    # Fail fast to last-known data rather than erroring out
+                    weather, cache_status = self.cache.peek(key), "last-known"
+                for i, district, lat, lon, weather_location in requests_for_key:
+                    if weather is not None:
+                        results[i] = self._payload(weather, district, lat, lon, cache_status, weather_location)
+                    else:
+                        results[i] = {
+                            "district": district,
+                            "error": str(error) if error else "No data returned for location",
+                            "status_code": _error_status(error),
+                        }
+        return results
+
+    def _payload(self, weather, district, lat, lon, cache_status, location):
+        return dict(
+            weather,
+            status="success",
+            district=district,
+            latitude=lat,
+            longitude=lon,
+            weather_location=location,
+            season=get_current_season(),
+            cache=cache_status
+        )
+
+    def prewarm(self):
+        """
+        Load every reference point (districts and extra points) that is missing or past
+        its ttl, in one bulk upstream request. Returns (attempted, fetched): how many
+        points needed loading and how many of those were loaded.
+        """
+        keys = {}
+        for lat, lon in self.reference_points.values():
+            key = self.key(lat, lon)
+            if key in keys:
+                continue
+            age = self.cache.age(key)
+            if age is None or age >= self.cache.ttl:
+                keys[key] = None
+        keys = list(keys)
+        if not keys:
+            return 0, 0
+        fetched, errors = self.cache.flights.do_many(keys, self._fetch_and_store_many)
+        if errors:
+            self.cache.record_refresh_error()
+            print(f"[Weather Cache] Pre-warm failed: {next(iter(errors.values()))}")
+        return len(keys), len(fetched)
+
+    def start_prewarm(self, interval, delay=0.0):
+        """Pre-warm all districts after delay seconds and then every interval seconds, in a daemon thread"""
+        def loop():
+            time.sleep(delay)
+            while True:
+                attempted, fetched = self.prewarm()
+                if attempted:
+                    print(f"[Weather Cache] Pre-warmed {fetched}/{attempted} missing or stale reference points")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return dict(self.cache.stats(), snapping=self.index.stats() if self.index is not None else None)